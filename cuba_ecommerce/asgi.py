@@ -10,7 +10,19 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from django.core.exceptions import ImproperlyConfigured
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cuba_ecommerce.settings')
+# Sin conexiones persistentes: ver DATABASE_CONN_MAX_AGE en settings.py
+os.environ['DJANGO_SERVER_INTERFACE'] = 'asgi'
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+for _alias, _database in settings.DATABASES.items():
+    if _database.get('CONN_MAX_AGE'):
+        raise ImproperlyConfigured(
+            f"La base '{_alias}' tiene CONN_MAX_AGE={_database['CONN_MAX_AGE']}: "
+            "bajo ASGI las conexiones persistentes dejan archivos SQLite abiertos"
+        )
@@ -0,0 +1,239 @@
+"""
+Registro (logging) sin bloqueos y en JSON.
+
+Las vistas solo ponen cada registro en una cola acotada; un hilo de fondo
+(QueueListener) lo escribe en un archivo que rota por tamaño y por tiempo.
+Si la cola se llena el registro se descarta en lugar de esperar, y el número
+de descartados se anota en cuanto vuelve a haber sitio.
+
+Cada petición recibe un identificador (la cabecera X-Request-ID del proxy,
+o uno nuevo) que acompaña a todos sus registros y se devuelve en la
+respuesta. SamplingFilter conserva solo una fracción de los registros INFO
+y DEBUG, eligiendo por petición para que se guarden todos los de una misma
+petición o ninguno.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{8,64}$')
+
+# Petición en curso (None fuera de una petición)
+_request = ContextVar('current_request', default=None)
+
+request_logger = logging.getLogger('cuba_ecommerce.requests')
+
+# Atributos propios de LogRecord: lo demás viene de `extra` y va al JSON
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'request_id'}
+
+
+def get_request():
+    return _request.get()
+
+
+def get_request_id():
+    return getattr(_request.get(), 'request_id', None)
+
+
+class RequestIdFilter(logging.Filter):
+    """Añade `request_id` a los registros (para formatos de texto)"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = get_request_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Deja pasar solo `rate` de los registros por debajo de WARNING"""
+
+    def __init__(self, rate=1.0, name=''):
+        super().__init__(name)
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        request_id = getattr(record, 'request_id', None) or get_request_id()
+        if request_id:
+            return zlib.crc32(request_id.encode()) % 10000 < self.rate * 10000
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea con hora, nivel, logger, mensaje, request_id y los campos de `extra`"""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SizeAndTimeRotatingFileHandler(TimedRotatingFileHandler):
+    """Rota cada `when` o al superar `max_bytes`, lo que ocurra antes"""
+
+    def __init__(self, filename, max_bytes=0, **kwargs):
+        self.max_bytes = max_bytes
+        super().__init__(filename, **kwargs)
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes and self.stream is not None:
+            self.stream.seek(0, os.SEEK_END)
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+    def rotation_filename(self, default_name):
+        # Varias rotaciones por tamaño en el mismo periodo: django.log.2024-05-01.1, .2, ...
+        name = super().rotation_filename(default_name)
+        if not os.path.exists(name):
+            return name
+        index = 1
+        while os.path.exists(f"{name}.{index}"):
+            index += 1
+        return f"{name}.{index}"
+
+
+class QueueFileHandler(QueueHandler):
+    """
+    Encola los registros (sin esperar nunca) y los escribe en JSON en un
+    archivo rotativo desde un hilo de fondo.
+    """
+
+    def __init__(self, filename, max_bytes=20 * 1024 * 1024, when='midnight', backup_count=14,
+                 queue_size=10000, encoding='utf-8'):
+        super().__init__(queue.Queue(queue_size))
+        os.makedirs(os.path.dirname(os.fspath(filename)), exist_ok=True)
+        self.file_handler = SizeAndTimeRotatingFileHandler(
+            filename, max_bytes=max_bytes, when=when, backupCount=backup_count,
+            encoding=encoding, delay=True,
+        )
+        self.file_handler.setFormatter(JsonFormatter())
+        # Lo modifican a la vez los hilos de las peticiones
+        self.dropped = 0
+        self.dropped_lock = threading.Lock()
+        self.listener = QueueListener(self.queue, self.file_handler, respect_handler_level=False)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def prepare(self, record):
+        # Se resuelve en el hilo de la petición lo que depende de ella; el
+        # formateo a JSON queda para el hilo de fondo
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if not hasattr(record, 'request_id'):
+            record.request_id = get_request_id()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # put_nowait no espera: el bloqueo solo dura lo que tarda en encolar
+        with self.dropped_lock:
+            try:
+                if self.dropped:
+                    self.queue.put_nowait(self._dropped_record(self.dropped))
+                    self.dropped = 0
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+
+    def _dropped_record(self, dropped):
+        return logging.makeLogRecord({
+            'name': __name__,
+            'levelno': logging.WARNING,
+            'levelname': 'WARNING',
+            'msg': f"Cola de registro llena: se descartaron {dropped} mensajes",
+            'dropped': dropped,
+        })
+
+    def close(self):
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            # Escribe lo que quede en la cola antes de terminar
+            listener.stop()
+            self.file_handler.close()
+        super().close()
+
+
+class RequestLogMiddleware:
+    """Asigna un identificador a cada petición y registra método, ruta, estado y duración"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.start(request)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            self.finish(request, response, time.perf_counter() - start)
+        finally:
+            _request.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            self.finish(request, response, time.perf_counter() - start)
+        finally:
+            _request.reset(token)
+        return response
+
+    def start(self, request):
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        if not REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        return _request.set(request)
+
+    def finish(self, request, response, duration):
+        response[REQUEST_ID_HEADER] = request.request_id
+        match = getattr(request, 'resolver_match', None)
+        request_logger.info(
+            "%s %s %s", request.method, request.path, response.status_code,
+            extra={
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'view': match.view_name if match else None,
+                'duration_ms': round(duration * 1000, 1),
+            },
+        )
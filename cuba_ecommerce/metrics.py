@@ -0,0 +1,236 @@
+"""
+Métricas de peticiones: tiempo total, tiempo y número de consultas SQL y
+tiempo de renderizado de plantillas por vista.
+
+Los datos se guardan en histogramas en la memoria de cada proceso, se envían
+al navegador en la cabecera Server-Timing y se publican en formato de texto
+de Prometheus en /metrics (solo personal, o con METRICS_TOKEN).
+
+El costo por petición es un par de perf_counter() y una búsqueda binaria por
+histograma; las consultas se cuentan con un execute_wrapper instalado una sola
+vez por conexión.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+from django.utils.crypto import constant_time_compare
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Mediciones de la petición en curso (None fuera de una petición)
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Acumuladores de una petición"""
+    __slots__ = ('db_time', 'queries', 'template_time')
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = 0
+        self.template_time = 0.0
+
+
+class Histogram:
+    """Histograma acumulativo con los cubos fijos de Prometheus"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Histogramas y contadores por vista de este proceso"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.responses = {}
+
+    def observe(self, view, method, status, duration, metrics):
+        with self.lock:
+            for name, buckets, value in (
+                ('request_duration_seconds', DURATION_BUCKETS, duration),
+                ('request_db_seconds', DURATION_BUCKETS, metrics.db_time),
+                ('request_queries', QUERY_BUCKETS, metrics.queries),
+                ('request_template_seconds', DURATION_BUCKETS, metrics.template_time),
+            ):
+                key = (name, view, method)
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(buckets)
+                histogram.observe(value)
+            key = (view, method, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def render(self):
+        """Todas las métricas en formato de texto de Prometheus"""
+        lines = []
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            responses = sorted(self.responses.items())
+        current = None
+        for (name, view, method), histogram in histograms:
+            metric = f"django_{name}"
+            if metric != current:
+                lines.append(f"# TYPE {metric} histogram")
+                current = metric
+            labels = f'view="{_escape(view)}",method="{method}"'
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{metric}_sum{{{labels}}} {histogram.sum:.6f}")
+            lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+        lines.append("# TYPE django_responses_total counter")
+        for (view, method, status), count in responses:
+            lines.append(
+                f'django_responses_total{{view="{_escape(view)}",method="{method}",status="{status}"}} {count}'
+            )
+        lines.extend(_reference_cache_lines())
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _reference_cache_lines():
+    from store.cache import reference_cache
+
+    stats = reference_cache.stats()
+    return [
+        "# TYPE refcache_lookups_total counter",
+        f'refcache_lookups_total{{result="local_hit"}} {stats["local_hits"]}',
+        f'refcache_lookups_total{{result="shared_hit"}} {stats["shared_hits"]}',
+        f'refcache_lookups_total{{result="miss"}} {stats["misses"]}',
+    ]
+
+
+registry = Registry()
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper que suma el tiempo de cada consulta a la petición en curso"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_wrapper)
+
+
+class TimedTemplate:
+    """Plantilla del backend de Django que mide su renderizado"""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Backend DjangoTemplates que mide el renderizado de cada plantilla principal"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class RequestMetricsMiddleware:
+    """Mide cada petición, añade Server-Timing y lo registra por vista"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', True)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    def finish(self, request, response, metrics, duration):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        registry.observe(view, request.method, response.status_code, duration, metrics)
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'app;dur={duration * 1000:.1f}, '
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} consultas", '
+                f'tpl;dur={metrics.template_time * 1000:.1f}'
+            )
+        return response
+
+
+def metrics_view(request):
+    """Métricas en formato Prometheus, para el personal o con el token configurado"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    if token and constant_time_compare(authorization, f'Bearer {token}'):
+        allowed = True
+    else:
+        allowed = request.user.is_active and request.user.is_staff
+    if not allowed:
+        return HttpResponseForbidden("Acceso restringido al personal")
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,277 @@
+"""
+Perfilado bajo demanda de peticiones en producción.
+
+Se perfila una petición cuando trae un token firmado (generado por el
+personal desde el admin) en la cabecera X-Profile o en el parámetro
+?profile= y la hace el mismo usuario del personal que lo generó, o al azar una de cada SAMPLE_EVERY peticiones (0 lo desactiva).
+Alrededor de la vista corren a la vez cProfile (tiempos por función, en
+formato pstats) y un muestreador que cada INTERVAL_MS anota la pila del
+hilo de la petición (pilas colapsadas, el formato de flamegraph.pl y
+speedscope).
+
+Solo se perfila una petición a la vez por proceso; si ya hay otra en curso
+la petición sigue sin perfilar. Los resultados se guardan en DIR y se
+conservan los MAX_PROFILES más recientes; si no se pueden guardar (disco
+lleno, permisos) se registra el error y la respuesta sale igual. Se consultan en el admin
+(Perfiles de peticiones).
+
+En las vistas async el perfil es aproximado: el bucle de eventos atiende
+otras peticiones mientras tanto, y el trabajo que se hace en el pool de
+hilos (las consultas del ORM) aparece como espera.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+DEFAULTS = {
+    'SAMPLE_EVERY': 0,
+    'DIR': None,
+    'MAX_PROFILES': 100,
+    'INTERVAL_MS': 5,
+    'TOKEN_MAX_AGE': 60 * 60,
+}
+
+TOKEN_HEADER = 'X-Profile'
+TOKEN_PARAM = 'profile'
+TOKEN_SALT = 'cuba_ecommerce.profiling'
+PROFILE_ID_RE = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$')
+
+# Un solo perfil a la vez por proceso
+_profiling_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def get_options():
+    options = {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+    options['DIR'] = Path(options['DIR'] or settings.BASE_DIR / 'profiles')
+    return options
+
+
+def make_token(user):
+    """Token firmado que habilita el perfilado durante TOKEN_MAX_AGE segundos"""
+    return signing.dumps({'user': user.pk}, salt=TOKEN_SALT, compress=True)
+
+
+def check_token(token, max_age):
+    """Id del usuario que generó el token, o None si no es válido o caducó"""
+    try:
+        return signing.loads(token, salt=TOKEN_SALT, max_age=max_age)['user']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+def collapse_stack(frame):
+    """Pila de un frame en formato colapsado: raíz;...;función"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})".replace(';', ':'))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """Anota cada `interval` segundos la pila de un hilo"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profiling-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class ProfileStore:
+    """Perfiles en disco: <id>.json (datos), <id>.prof (pstats) y <id>.folded (pilas)"""
+
+    def __init__(self, directory, max_profiles):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def path(self, profile_id, extension):
+        if not PROFILE_ID_RE.match(profile_id):
+            raise ValueError(f"Id de perfil inválido: {profile_id}")
+        return self.directory / f"{profile_id}.{extension}"
+
+    def save(self, meta, profiler, stacks):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_id = meta['id']
+        pstats.Stats(profiler).dump_stats(self.path(profile_id, 'prof'))
+        self.path(profile_id, 'folded').write_text(
+            ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        )
+        # El .json se escribe al final: un perfil sin .json está incompleto
+        self.path(profile_id, 'json').write_text(json.dumps(meta, ensure_ascii=False))
+        self.prune()
+
+    def list(self):
+        """Datos de los perfiles guardados, del más reciente al más antiguo"""
+        profiles = []
+        for path in sorted(self.directory.glob('*.json'), reverse=True):
+            try:
+                profiles.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def get(self, profile_id):
+        try:
+            return json.loads(self.path(profile_id, 'json').read_text())
+        except (OSError, ValueError):
+            return None
+
+    def stats_text(self, profile_id, sort='cumulative', limit=60):
+        """Informe de pstats ordenado por `sort` con las `limit` funciones principales"""
+        stream = io.StringIO()
+        stats = pstats.Stats(str(self.path(profile_id, 'prof')), stream=stream)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def delete(self, profile_id):
+        for extension in ('json', 'prof', 'folded'):
+            self.path(profile_id, extension).unlink(missing_ok=True)
+
+    def prune(self):
+        """Borra los perfiles más antiguos por encima de MAX_PROFILES"""
+        ids = sorted(path.stem for path in self.directory.glob('*.json'))
+        for profile_id in ids[:max(len(ids) - self.max_profiles, 0)]:
+            self.delete(profile_id)
+
+    def clear(self):
+        for path in self.directory.glob('*.json'):
+            self.delete(path.stem)
+
+
+def get_store():
+    options = get_options()
+    return ProfileStore(options['DIR'], options['MAX_PROFILES'])
+
+
+class ProfilingMiddleware:
+    """Perfila la vista cuando la petición trae un token válido o sale sorteada"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.options = get_options()
+        self.store = ProfileStore(self.options['DIR'], self.options['MAX_PROFILES'])
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        user_id = self.token_user_id(request)
+        trigger = self.trigger(user_id, request.user if user_id is not None else None)
+        if trigger is None or not _profiling_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            sampler, profiler, start = self.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                duration = self.stop(sampler, profiler, start)
+            self.save(self.meta(request, response, trigger, duration), profiler, sampler.stacks)
+        finally:
+            _profiling_lock.release()
+        return response
+
+    async def __acall__(self, request):
+        user_id = self.token_user_id(request)
+        trigger = self.trigger(user_id, await request.auser() if user_id is not None else None)
+        if trigger is None or not _profiling_lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            sampler, profiler, start = self.start()
+            try:
+                response = await self.get_response(request)
+            finally:
+                duration = self.stop(sampler, profiler, start)
+            await sync_to_async(self.save)(
+                self.meta(request, response, trigger, duration), profiler, sampler.stacks,
+            )
+        finally:
+            _profiling_lock.release()
+        return response
+
+    def token_user_id(self, request):
+        """Id del usuario que generó el token de la petición, o None si no trae uno válido"""
+        token = request.headers.get(TOKEN_HEADER) or request.GET.get(TOKEN_PARAM)
+        if not token:
+            return None
+        return check_token(token, self.options['TOKEN_MAX_AGE'])
+
+    def trigger(self, user_id, user):
+        """Motivo del perfilado ('token:<id de usuario>' o 'muestreo'), o None"""
+        # El token solo vale en manos de quien lo generó, y mientras siga en el personal
+        if user_id is not None and user.is_staff and user.pk == user_id:
+            return f"token:{user_id}"
+        every = self.options['SAMPLE_EVERY']
+        if every and random.randrange(every) == 0:
+            return 'muestreo'
+        return None
+
+    def save(self, meta, profiler, stacks):
+        try:
+            self.store.save(meta, profiler, stacks)
+        except Exception:
+            logger.exception("No se pudo guardar el perfil %s", meta['id'])
+
+    def start(self):
+        sampler = StackSampler(threading.get_ident(), self.options['INTERVAL_MS'] / 1000)
+        sampler.start()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        return sampler, profiler, start
+
+    def stop(self, sampler, profiler, start):
+        profiler.disable()
+        duration = time.perf_counter() - start
+        sampler.stop()
+        return duration
+
+    def meta(self, request, response, trigger, duration):
+        now = timezone.now()
+        match = getattr(request, 'resolver_match', None)
+        # El token no se guarda con la ruta
+        params = request.GET.copy()
+        params.pop(TOKEN_PARAM, None)
+        return {
+            'id': f"{now:%Y%m%d-%H%M%S}-{os.urandom(4).hex()}",
+            'created_at': now.isoformat(),
+            'method': request.method,
+            'path': f"{request.path}?{params.urlencode()}" if params else request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 1),
+            'trigger': trigger,
+            'request_id': getattr(request, 'request_id', None),
+        }
@@ -0,0 +1,129 @@
+"""
+Reparto de consultas entre la base principal y las réplicas de lectura.
+
+Las lecturas de los modelos de REPLICA_READ_MODELS hechas en peticiones de
+solo lectura (GET, HEAD) van a una réplica elegida al azar para toda la
+petición; cualquier escritura, y todo lo demás, va a `default`. Después de
+escribir en un modelo de REPLICA_PIN_MODELS, el cliente lee de `default`
+durante REPLICA_PIN_SECONDS para ver sus propios cambios aunque las réplicas
+vayan atrasadas.
+
+Fuera de una petición (comandos, hilos de fondo) se lee de `default`, salvo
+dentro de `replica_reads()`.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Estado de la petición en curso (ContextVar: vale para hilos y para async)
+_read_alias = ContextVar('replica_read_alias', default=PRIMARY)
+_wrote = ContextVar('replica_wrote', default=False)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def choose_replica():
+    """Una réplica al azar, o `default` si no hay réplicas configuradas"""
+    replicas = replica_aliases()
+    return random.choice(replicas) if replicas else PRIMARY
+
+
+@contextmanager
+def replica_reads():
+    """Lee de una réplica dentro del bloque (para comandos de exportación e informes)"""
+    token = _read_alias.set(choose_replica())
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Envía las lecturas del catálogo a las réplicas y el resto a la base principal"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in getattr(settings, 'REPLICA_READ_MODELS', ()):
+            return PRIMARY
+        # Dentro de una transacción se lee lo que se está escribiendo
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Guardar la sesión o un perfil no obliga a leer de la principal
+        pin_models = getattr(settings, 'REPLICA_PIN_MODELS', None)
+        if pin_models is None:
+            pin_models = getattr(settings, 'REPLICA_READ_MODELS', ())
+        if model._meta.label_lower in pin_models:
+            _wrote.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las réplicas son copias de la principal: las relaciones son válidas entre todas
+        databases = {PRIMARY, *replica_aliases()}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas se copian enteras con replicate_database
+        return db == PRIMARY
+
+
+class ReplicaPinMiddleware:
+    """Elige la base de lectura de cada petición y fija la principal después de escribir"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Bajo ASGI se ejecuta como corrutina para no forzar un hilo por petición
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = self.process_request(request)
+        try:
+            return self.process_response(request, self.get_response(request))
+        finally:
+            self.reset(tokens)
+
+    async def __acall__(self, request):
+        tokens = self.process_request(request)
+        try:
+            return self.process_response(request, await self.get_response(request))
+        finally:
+            self.reset(tokens)
+
+    def process_request(self, request):
+        if request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES:
+            read_alias = choose_replica()
+        else:
+            read_alias = PRIMARY
+        return _read_alias.set(read_alias), _wrote.set(False)
+
+    def process_response(self, request, response):
+        if _wrote.get() and replica_aliases():
+            response.set_cookie(
+                PIN_COOKIE,
+                '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def reset(self, tokens):
+        read_token, wrote_token = tokens
+        _read_alias.reset(read_token)
+        _wrote.reset(wrote_token)
@@ -0,0 +1,117 @@
+"""
+Sesiones en la caché con escritura diferida en la base de datos.
+
+Las lecturas salen de la caché (SESSION_CACHE_ALIAS) y solo van a la tabla
+django_session si la entrada no está. Las escrituras siempre actualizan la
+caché, pero cada sesión se copia a la base como mucho una vez cada
+SESSION_WRITE_BEHIND_SECONDS: una marca en la caché con ese tiempo de vida
+indica que la copia de la base está al día. Crear una sesión y borrarla
+(cerrar sesión) siempre van a la base, y también cualquier cambio del
+usuario autenticado (iniciar sesión, cambiar la contraseña): la marca guarda
+el usuario de la última copia y si no coincide se escribe en el momento.
+
+La copia no se hace en segundo plano, sino en la siguiente escritura de la
+sesión después de que caduque la marca. Si la caché pierde una entrada, la
+sesión se recupera de la base sin los cambios hechos desde la última copia,
+que pueden ser de más de SESSION_WRITE_BEHIND_SECONDS si la sesión no se
+volvió a modificar (por ejemplo, el carrito de un visitante que se fue). El
+inicio de sesión no se pierde nunca.
+
+Las sesiones caducadas se borran con `python manage.py clearsessions`, en
+lotes de SESSION_CLEANUP_BATCH_SIZE filas para no bloquear la base.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.utils import timezone
+
+KEY_PREFIX = 'cuba_ecommerce.sessions'
+
+# Claves de la sesión que se escriben en la base en cuanto cambian
+AUTH_KEYS = (SESSION_KEY, HASH_SESSION_KEY, BACKEND_SESSION_KEY)
+
+logger = logging.getLogger('django.contrib.sessions')
+
+
+def write_behind_seconds():
+    return getattr(settings, 'SESSION_WRITE_BEHIND_SECONDS', 60)
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    @property
+    def persisted_key(self):
+        return f"{self.cache_key}:persisted"
+
+    def auth_state(self, session=None):
+        """Usuario autenticado de la sesión: el valor de la marca de copia en la base"""
+        if session is None:
+            session = self._session
+        return tuple(session.get(key) for key in AUTH_KEYS)
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        state = self.auth_state()
+        ttl = write_behind_seconds()
+        # Sin marca en la creación: la primera escritura con datos (el inicio
+        # de sesión) también va a la base. add() solo tiene éxito si la marca
+        # caducó: un único proceso escribe en la base.
+        if must_create or self._cache.add(self.persisted_key, state, ttl):
+            DBStore.save(self, must_create)
+        elif self._cache.get(self.persisted_key) != state:
+            DBStore.save(self)
+            self._cache.set(self.persisted_key, state, ttl)
+        try:
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+        except Exception:
+            logger.exception("Error saving to cache (%s)", self._cache)
+
+    async def asave(self, must_create=False):
+        if self.session_key is None:
+            return await self.acreate()
+        persisted_key = f"{await self.acache_key()}:persisted"
+        # self._session cargaría la sesión de forma síncrona
+        state = self.auth_state(await self._aget_session())
+        ttl = write_behind_seconds()
+        if must_create or await self._cache.aadd(persisted_key, state, ttl):
+            await DBStore.asave(self, must_create)
+        elif await self._cache.aget(persisted_key) != state:
+            await DBStore.asave(self)
+            await self._cache.aset(persisted_key, state, ttl)
+        try:
+            await self._cache.aset(await self.acache_key(), self._session, await self.aget_expiry_age())
+        except Exception:
+            logger.exception("Error saving to cache (%s)", self._cache)
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        session_key = session_key or self.session_key
+        if session_key:
+            self._cache.delete(f"{self.cache_key_prefix}{session_key}:persisted")
+
+    async def adelete(self, session_key=None):
+        await super().adelete(session_key)
+        session_key = session_key or self.session_key
+        if session_key:
+            await self._cache.adelete(f"{self.cache_key_prefix}{session_key}:persisted")
+
+    @classmethod
+    def clear_expired(cls):
+        """Borra las sesiones caducadas por lotes, cada uno en su propia transacción"""
+        model = cls.get_model_class()
+        batch_size = getattr(settings, 'SESSION_CLEANUP_BATCH_SIZE', 1000)
+        now = timezone.now()
+        deleted = 0
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                return deleted
+            deleted += model.objects.filter(session_key__in=keys).delete()[0]
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,20 +43,29 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Identificador de petición y registro de acceso (ver cuba_ecommerce.logs)
+    'cuba_ecommerce.logs.RequestLogMiddleware',
+    # Antes que el resto, para medir también los demás middlewares
+    'cuba_ecommerce.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'store.lite.LiteModeMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'cuba_ecommerce.routers.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Último, para perfilar solo la vista (ver cuba_ecommerce.profiling)
+    'cuba_ecommerce.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'cuba_ecommerce.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates con medición del tiempo de renderizado (ver cuba_ecommerce.metrics)
+        'BACKEND': 'cuba_ecommerce.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,6 +74,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'store.context_processors.vendor_assets',
             ],
         },
     },
@@ -75,13 +86,81 @@ WSGI_APPLICATION = 'cuba_ecommerce.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Ajustes de SQLite para varias peticiones concurrentes:
+# - WAL: las lecturas no bloquean a la escritura ni al revés
+# - synchronous=NORMAL: seguro con WAL y sin un fsync por transacción
+# - mmap/cache_size: lecturas desde memoria en lugar de llamadas read()
+# - timeout: espera hasta 20 s por el bloqueo en lugar de fallar con "database is locked"
+# - IMMEDIATE: las transacciones toman el bloqueo de escritura al empezar, así
+#   la espera del timeout se aplica (una transacción DEFERRED que pasa de leer a
+#   escribir falla en el acto si otra está escribiendo)
+SQLITE_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=134217728;'
+        'PRAGMA cache_size=-20000;'
+        'PRAGMA temp_store=MEMORY;'
+    ),
+    'timeout': 20,
+    'transaction_mode': 'IMMEDIATE',
+}
+
+# Conexiones persistentes solo bajo WSGI, donde cada hilo de trabajo reutiliza
+# la suya entre peticiones. Bajo ASGI las vistas síncronas corren en hilos de
+# sync_to_async y el cierre de fin de petición no alcanza sus conexiones: con
+# CONN_MAX_AGE > 0 quedarían archivos SQLite abiertos. cuba_ecommerce/asgi.py
+# marca DJANGO_SERVER_INTERFACE=asgi antes de cargar esta configuración.
+SERVER_INTERFACE = os.environ.get('DJANGO_SERVER_INTERFACE', 'wsgi')
+DATABASE_CONN_MAX_AGE = 600 if SERVER_INTERFACE == 'wsgi' else 0
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # DATABASE_FILE apunta a otra base (bench_storefront trabaja sobre una copia)
+        'NAME': os.environ.get('DATABASE_FILE') or BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
+        # Reutilizar la conexión entre peticiones en lugar de abrir una por petición (solo WSGI)
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Réplicas de lectura: DATABASE_REPLICAS=2 crea replica1 y replica2 (db.replica1.sqlite3, ...),
+# que se mantienen al día con `python manage.py replicate_database --interval 5`
+DATABASE_REPLICAS = [f'replica{i}' for i in range(1, int(os.environ.get('DATABASE_REPLICAS', 0)) + 1)]
+for _alias in DATABASE_REPLICAS:
+    DATABASES[_alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db.{_alias}.sqlite3',
+        # Las réplicas solo se leen: sin BEGIN IMMEDIATE
+        'OPTIONS': {key: value for key, value in SQLITE_OPTIONS.items() if key != 'transaction_mode'},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['cuba_ecommerce.routers.PrimaryReplicaRouter']
+
+# Modelos cuyas lecturas pueden ir a una réplica (catálogo, informes y exportaciones)
+REPLICA_READ_MODELS = [
+    'store.category',
+    'store.currency',
+    'store.product',
+    'store.catalogchange',
+    'store.order',
+    'store.orderitem',
+    'store.ordercurrencytotal',
+    'store.dailysales',
+    'store.dailyproductsales',
+]
+
+# Escrituras que fijan la base principal: las de los modelos que se leen de las
+# réplicas y las del carrito, que el cliente vuelve a ver en la página siguiente.
+# Las sesiones, perfiles o alertas no fijan nada.
+REPLICA_PIN_MODELS = [*REPLICA_READ_MODELS, 'store.cart', 'store.cartitem']
+
+# Segundos durante los que un cliente lee de la base principal después de escribir
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -158,3 +237,85 @@ WHATSAPP_MESSAGE_TEMPLATE = """
 
 ⏰ *FECHA:* {date}
 """
+
+# Directorio privado para los reportes de importación de productos
+PRODUCT_IMPORT_DIR = BASE_DIR / 'imports'
+
+# Versiones redimensionadas de las imágenes de productos
+PRODUCT_IMAGE_WIDTHS = [160, 320, 640]
+PRODUCT_IMAGE_ASYNC = False
+
+# Librerías de terceros servidas localmente (ver `python manage.py vendor_static_assets`).
+# Si el archivo local no existe se usa la URL del CDN; `check --deploy` falla
+# si falta alguno (store/checks.py).
+VENDOR_ASSETS = {
+    'bootstrap_css': (
+        'vendor/bootstrap/css/bootstrap.min.css',
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    ),
+    'bootstrap_js': (
+        'vendor/bootstrap/js/bootstrap.bundle.min.js',
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    ),
+    'fontawesome_css': (
+        'vendor/fontawesome/css/all.min.css',
+        'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+    ),
+}
+
+# Caché compartida entre procesos (en desarrollo, memoria local del proceso)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cuba-ecommerce',
+    }
+}
+
+# Sesiones en la caché con escritura diferida en la base (ver cuba_ecommerce.sessions):
+# cada sesión se copia a django_session como mucho una vez cada SESSION_WRITE_BEHIND_SECONDS
+# (el inicio y el cierre de sesión se escriben siempre en el momento)
+SESSION_ENGINE = 'cuba_ecommerce.sessions'
+SESSION_CACHE_ALIAS = 'default'
+SESSION_WRITE_BEHIND_SECONDS = 60
+# Filas borradas por transacción en `clearsessions`
+SESSION_CLEANUP_BATCH_SIZE = 1000
+
+# Mensajes en una cookie firmada: no leen ni escriben la sesión
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Caché de datos de referencia (categorías, monedas): LRU del proceso delante de CACHES
+REFERENCE_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60 * 60,
+    'LOCAL_MAX_ENTRIES': 256,
+    'LOCAL_TTL': 5,
+}
+
+# Métricas de peticiones (/metrics, formato Prometheus). Además del personal,
+# pueden leerlas los clientes que envíen "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_SERVER_TIMING = True
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Registro de consultas lentas (ver cuba_ecommerce.slowqueries; se consulta en el admin)
+SLOW_QUERY_LOG = {
+    'THRESHOLD_MS': int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100)),
+    'MAX_ENTRIES': 200,
+    'EXPLAIN': True,
+}
+
+# Perfilado de peticiones (ver cuba_ecommerce.profiling; tokens y resultados en el admin).
+# PROFILE_SAMPLE_EVERY=N perfila además una de cada N peticiones al azar
+PROFILING = {
+    'SAMPLE_EVERY': int(os.environ.get('PROFILE_SAMPLE_EVERY', 0)),
+    'DIR': BASE_DIR / 'profiles',
+    'MAX_PROFILES': 100,
+    'INTERVAL_MS': 5,
+    'TOKEN_MAX_AGE': 60 * 60,
+}
+
+# Presupuesto de peso (bytes: HTML más recursos locales) de las páginas en modo
+# ligero; check_page_weight falla si alguna lo supera
+LITE_PAGE_BUDGETS = {
+    'home': 24 * 1024,
+    'product_list': 32 * 1024,
+}
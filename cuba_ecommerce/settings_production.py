@@ -30,6 +30,19 @@ X_FRAME_OPTIONS = 'DENY'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATIC_URL = '/static/'
 
+# Nombres con hash (caché inmutable) y versiones .gz/.br generadas en collectstatic
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'cuba_ecommerce.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Servir los estáticos desde Django cuando no hay un mapeo en el servidor web
+SERVE_STATIC = os.environ.get('SERVE_STATIC', '') == '1'
+
 # Configuración de archivos de media
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
@@ -38,19 +51,43 @@ MEDIA_URL = '/media/'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # DATABASE_FILE apunta a otra base (bench_storefront trabaja sobre una copia)
+        'NAME': os.environ.get('DATABASE_FILE') or BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
+for _alias in DATABASE_REPLICAS:
+    DATABASES[_alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db.{_alias}.sqlite3',
+        'OPTIONS': {key: value for key, value in SQLITE_OPTIONS.items() if key != 'transaction_mode'},
+        'TEST': {'MIRROR': 'default'},
+    }
 
-# Configuración de logging para producción
+# Configuración de logging para producción: JSON por líneas, escrito desde un hilo
+# de fondo (ver cuba_ecommerce.logs). Si la cola se llena se descartan mensajes en
+# lugar de bloquear la petición. De los INFO se guarda solo LOG_INFO_SAMPLE_RATE.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'sample_info': {
+            '()': 'cuba_ecommerce.logs.SamplingFilter',
+            'rate': float(os.environ.get('LOG_INFO_SAMPLE_RATE', '0.1')),
+        },
+    },
     'handlers': {
         'file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            'class': 'cuba_ecommerce.logs.QueueFileHandler',
             'filename': BASE_DIR / 'logs' / 'django.log',
+            'max_bytes': 20 * 1024 * 1024,
+            'when': 'midnight',
+            'backup_count': 14,
+            'queue_size': 10000,
+            'filters': ['sample_info'],
         },
     },
     'loggers': {
@@ -59,15 +96,48 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'cuba_ecommerce': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'store': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
-# Configuración de caché (opcional para mejorar rendimiento)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Configuración de caché: compartida por todos los procesos del servidor.
+# Con REDIS_URL se usa Redis (requiere el paquete redis); si no, archivos en disco.
+# Las sesiones van en su propio alias para que no desplacen al resto de la caché.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'sessions',
+        },
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache' / 'sessions',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        },
+    }
+SESSION_CACHE_ALIAS = 'sessions'
 
 # Configuración de sesiones
 SESSION_COOKIE_SECURE = False  # Cambiar a True si usas HTTPS
@@ -99,4 +169,6 @@ WHATSAPP_MESSAGE_TEMPLATE = """
 {notes}
 
 ⏰ *FECHA:* {date}
-""" 
\ No newline at end of file
+""" 
+# Generar las versiones de las imágenes en un hilo de fondo
+PRODUCT_IMAGE_ASYNC = True
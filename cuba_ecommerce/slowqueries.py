@@ -0,0 +1,225 @@
+"""
+Registro de consultas SQL lentas.
+
+Un execute_wrapper mide cada consulta; las que superan THRESHOLD_MS se
+guardan en un búfer circular de MAX_ENTRIES entradas (SQL, parámetros,
+duración, vista e identificador de la petición, y la línea del código del
+proyecto que la lanzó) y se agregan por huella: el SQL normalizado, sin
+literales y con las listas de IN colapsadas, de modo que la misma consulta
+con otros valores cuenta como una sola. El plan de ejecución (EXPLAIN QUERY
+PLAN en SQLite) se obtiene una única vez por huella.
+
+Como las métricas, los datos viven en la memoria de cada proceso. Se
+consultan en el admin (Consultas lentas).
+"""
+import functools
+import hashlib
+import os
+import re
+import threading
+import time
+import traceback
+from collections import deque
+
+from django.apps import apps
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from .logs import get_request
+
+DEFAULTS = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 100,
+    'MAX_ENTRIES': 200,
+    'MAX_FINGERPRINTS': 500,
+    'EXPLAIN': True,
+}
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST_RE = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+SPACE_RE = re.compile(r'\s+')
+
+# Métodos de los middlewares: no son quienes lanzan la consulta
+MIDDLEWARE_METHODS = {'__call__', '__acall__', 'process_request', 'process_view', 'process_response'}
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'SLOW_QUERY_LOG', {})}
+
+
+def normalize_sql(sql):
+    """SQL sin literales ni espacios repetidos y con las listas de IN colapsadas"""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = PLACEHOLDER_LIST_RE.sub('(...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.md5(normalized.encode()).hexdigest()[:12]
+
+
+def calling_code():
+    """
+    Primera línea de las apps del proyecto (fuera de Django, las librerías y
+    los middlewares) en la pila. En las vistas async la vista no está en la
+    pila del hilo que ejecuta la consulta: queda solo el nombre de la vista.
+    """
+    app_dirs = project_app_dirs()
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(app_dirs) and frame.name not in MIDDLEWARE_METHODS:
+            filename = os.path.relpath(frame.filename, settings.BASE_DIR)
+            return f"{filename}:{frame.lineno} en {frame.name}"
+    return None
+
+
+@functools.cache
+def project_app_dirs():
+    """Directorios de las apps instaladas que forman parte del proyecto"""
+    base_dir = str(settings.BASE_DIR)
+    return tuple(
+        config.path + os.sep for config in apps.get_app_configs()
+        if config.path.startswith(base_dir) and 'site-packages' not in config.path
+    )
+
+
+class SlowQueryLog:
+    """Búfer circular de consultas lentas y totales por huella, seguro entre hilos"""
+
+    def __init__(self, max_entries, max_fingerprints):
+        self.lock = threading.Lock()
+        self.entries = deque(maxlen=max_entries)
+        self.fingerprints = {}
+        self.max_fingerprints = max_fingerprints
+
+    def record(self, entry):
+        """Guarda la entrada; devuelve True si su huella es nueva (falta el plan)"""
+        with self.lock:
+            self.entries.append(entry)
+            stats = self.fingerprints.get(entry['fingerprint'])
+            if stats is None:
+                if len(self.fingerprints) >= self.max_fingerprints:
+                    # Se olvida la huella que menos tiempo ha sumado
+                    smallest = min(self.fingerprints, key=lambda key: self.fingerprints[key]['total_ms'])
+                    del self.fingerprints[smallest]
+                stats = self.fingerprints[entry['fingerprint']] = {
+                    'fingerprint': entry['fingerprint'],
+                    'sql': entry['normalized'],
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'views': {},
+                    'plan': None,
+                    'last_seen': None,
+                }
+                is_new = True
+            else:
+                is_new = False
+            stats['count'] += 1
+            stats['total_ms'] += entry['duration_ms']
+            stats['max_ms'] = max(stats['max_ms'], entry['duration_ms'])
+            view = entry['view'] or '-'
+            stats['views'][view] = stats['views'].get(view, 0) + 1
+            stats['last_seen'] = entry['time']
+            return is_new
+
+    def resize(self, max_entries, max_fingerprints):
+        """Ajusta los límites a las opciones vigentes; conserva las entradas más recientes"""
+        with self.lock:
+            if self.entries.maxlen != max_entries:
+                self.entries = deque(self.entries, maxlen=max_entries)
+            self.max_fingerprints = max_fingerprints
+
+    def set_plan(self, key, plan):
+        with self.lock:
+            if key in self.fingerprints:
+                self.fingerprints[key]['plan'] = plan
+
+    def summary(self):
+        """Huellas ordenadas por tiempo total y entradas de la más reciente a la más antigua"""
+        with self.lock:
+            fingerprints = [
+                {**stats, 'views': sorted(stats['views'].items(), key=lambda item: -item[1])}
+                for stats in self.fingerprints.values()
+            ]
+            entries = list(reversed(self.entries))
+        for stats in fingerprints:
+            stats['avg_ms'] = stats['total_ms'] / stats['count']
+        fingerprints.sort(key=lambda stats: -stats['total_ms'])
+        return fingerprints, entries
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.fingerprints.clear()
+
+
+# Los límites se ajustan a SLOW_QUERY_LOG al guardar cada consulta (ver _record)
+slow_query_log = SlowQueryLog(DEFAULTS['MAX_ENTRIES'], DEFAULTS['MAX_FINGERPRINTS'])
+
+
+def explain(connection, sql, params):
+    """Plan de ejecución de la consulta como texto, o None si no se puede obtener"""
+    prefix = connection.ops.explain_query_prefix()
+    # Fuera de SQLite, un error dentro de una transacción la dejaría inservible
+    if connection.vendor != 'sqlite' and connection.in_atomic_block:
+        return None
+    try:
+        # Cursor del backend, sin los execute_wrappers: no se mide ni cuenta en la petición
+        cursor = connection.create_cursor()
+        try:
+            cursor.execute(f"{prefix} {sql}", params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    except Exception as e:
+        return f"(no se pudo obtener el plan: {e})"
+    if connection.vendor == 'sqlite':
+        # (id, padre, sin uso, detalle)
+        return "\n".join(row[3] for row in rows)
+    return "\n".join(" ".join(str(value) for value in row) for row in rows)
+
+
+def record_slow_query(execute, sql, params, many, context):
+    """execute_wrapper que guarda las consultas que superan el umbral"""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        options = get_options()
+        if duration_ms >= options['THRESHOLD_MS']:
+            _record(sql, params, many, context['connection'], duration_ms, options)
+
+
+def _record(sql, params, many, connection, duration_ms, options):
+    request = get_request()
+    match = getattr(request, 'resolver_match', None)
+    normalized = normalize_sql(sql)
+    key = fingerprint(normalized)
+    entry = {
+        'time': timezone.now(),
+        'duration_ms': duration_ms,
+        'fingerprint': key,
+        'normalized': normalized,
+        'sql': sql,
+        'params': repr(params)[:500] if not many else '(executemany)',
+        'view': match.view_name if match else None,
+        'request_id': getattr(request, 'request_id', None),
+        'caller': calling_code(),
+        'database': connection.alias,
+    }
+    slow_query_log.resize(options['MAX_ENTRIES'], options['MAX_FINGERPRINTS'])
+    if slow_query_log.record(entry) and options['EXPLAIN'] and not many:
+        slow_query_log.set_plan(key, explain(connection, sql, params))
+
+
+def install_slow_query_wrapper(sender, connection, **kwargs):
+    if get_options()['ENABLED'] and record_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_slow_query)
+
+
+connection_created.connect(install_slow_query_wrapper)
@@ -0,0 +1,50 @@
+"""
+Servidor de archivos estáticos para producción cuando no hay un servidor web
+delante (por ejemplo, sin mapeo de estáticos en PythonAnywhere).
+"""
+import mimetypes
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_safe
+
+# Nombres generados por ManifestStaticFilesStorage: nombre.<hash de 12>.ext
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+DEFAULT_MAX_AGE = 60 * 60
+
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+@require_safe
+def serve_static(request, path):
+    """Sirve un archivo de STATIC_ROOT con su variante precomprimida y cabeceras de caché"""
+    try:
+        full_path = Path(safe_join(settings.STATIC_ROOT, path))
+    except ValueError:
+        raise Http404
+    if not full_path.is_file():
+        raise Http404
+
+    content_type, _ = mimetypes.guess_type(str(full_path))
+    accept_encoding = request.headers.get('Accept-Encoding', '')
+    served_path, encoding = full_path, None
+    for name, suffix in ENCODINGS:
+        candidate = full_path.with_name(full_path.name + suffix)
+        if name in accept_encoding and candidate.is_file():
+            served_path, encoding = candidate, name
+            break
+
+    response = FileResponse(open(served_path, 'rb'), content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if HASHED_NAME_RE.search(path):
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={DEFAULT_MAX_AGE}'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
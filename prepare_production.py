@@ -7,11 +7,13 @@ import subprocess
 import sys
 from pathlib import Path
 
-def run_command(command, description):
+PRODUCTION_ENV = dict(os.environ, DJANGO_SETTINGS_MODULE='cuba_ecommerce.settings_production')
+
+def run_command(command, description, env=None):
     """Ejecuta un comando y muestra el resultado"""
     print(f"\n🔄 {description}...")
     try:
-        result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
+        result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True, env=env)
         print(f"✅ {description} completado exitosamente")
         return True
     except subprocess.CalledProcessError as e:
@@ -21,7 +23,7 @@ def run_command(command, description):
 
 def create_directories():
     """Crea directorios necesarios para producción"""
-    directories = ['logs', 'staticfiles', 'media']
+    directories = ['logs', 'staticfiles', 'media', 'cache']
     for directory in directories:
         Path(directory).mkdir(exist_ok=True)
         print(f"📁 Directorio '{directory}' creado/verificado")
@@ -33,17 +35,20 @@ def main():
     # Crear directorios necesarios
     create_directories()
     
-    # Comandos para preparar producción
+    # Comandos para preparar producción; solo los de archivos estáticos y la
+    # verificación usan la configuración de producción
     commands = [
-        ("python manage.py collectstatic --noinput", "Recolectando archivos estáticos"),
-        ("python manage.py check --deploy", "Verificando configuración de producción"),
-        ("python manage.py makemigrations", "Creando migraciones"),
-        ("python manage.py migrate", "Aplicando migraciones"),
+        # Copiar Bootstrap y Font Awesome a static/ (check --deploy falla si faltan)
+        ("python manage.py vendor_static_assets", "Copiando librerías de terceros", None),
+        ("python manage.py collectstatic --noinput", "Recolectando archivos estáticos", PRODUCTION_ENV),
+        ("python manage.py check --deploy", "Verificando configuración de producción", PRODUCTION_ENV),
+        ("python manage.py makemigrations", "Creando migraciones", None),
+        ("python manage.py migrate", "Aplicando migraciones", None),
     ]
     
     # Ejecutar comandos
-    for command, description in commands:
-        if not run_command(command, description):
+    for command, description, env in commands:
+        if not run_command(command, description, env):
             print(f"\n❌ Error durante la preparación. Revisa los errores arriba.")
             sys.exit(1)
     
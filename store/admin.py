@@ -1,6 +1,63 @@
+import io
+from pathlib import Path
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Category, Product, Cart, CartItem, Order, OrderItem, Currency
+from cuba_ecommerce.profiling import get_options as profiling_options, get_store as profile_store, make_token
+from cuba_ecommerce.slowqueries import get_options as slow_query_options, slow_query_log
+from .models import (
+    Category, Product, Cart, CartItem, Order, OrderItem, Currency, OrderCurrencyTotal,
+    DailySales, DailyProductSales, LowStockAlert, PriceChangeBatch, ImageBlob, SlowQuery,
+    RequestProfile,
+)
+from .exports import order_item_rows, streaming_csv_response
+from .forms import BulkAdjustmentForm
+from .importers import ImportFileError, ProductImporter
+from .paginators import EstimatedCountPaginator
+from .pricing import apply_adjustment, preview_adjustment, undo_adjustment
+from .reports import category_sales, monthly_sales, period_start, replenishment_report
+
+class StockStatusFilter(admin.SimpleListFilter):
+    """Filtro por estado del stock calculado en la base de datos"""
+    title = "Estado Stock"
+    parameter_name = 'stock_state'
+
+    def lookups(self, request, model_admin):
+        return [('out', 'Agotado'), ('low', 'Bajo'), ('ok', 'OK')]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(stock_state=self.value())
+        return queryset
+
+class ProfitMarginFilter(admin.SimpleListFilter):
+    """Filtro por rango de margen de ganancia"""
+    title = "Margen"
+    parameter_name = 'margin'
+
+    def lookups(self, request, model_admin):
+        return [
+            ('negative', 'Negativo'),
+            ('low', 'Menor de 20%'),
+            ('high', '20% o más'),
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'negative':
+            return queryset.filter(margin_pct__lt=0)
+        if self.value() == 'low':
+            return queryset.filter(margin_pct__gte=0, margin_pct__lt=20)
+        if self.value() == 'high':
+            return queryset.filter(margin_pct__gte=20)
+        return queryset
 
 @admin.register(Currency)
 class CurrencyAdmin(admin.ModelAdmin):
@@ -40,13 +97,92 @@ class ProductAdmin(admin.ModelAdmin):
     ]
     list_filter = [
         'category', 'currency', 'is_active', 'is_featured', 
+        StockStatusFilter, ProfitMarginFilter,
         'created_at', 'updated_at'
     ]
     search_fields = ['name', 'code', 'description']
     list_editable = ['sale_price', 'stock', 'is_active', 'is_featured']
     readonly_fields = ['profit_margin', 'created_at', 'updated_at']
+    list_select_related = ['category', 'currency']
+    
+    # Evitar el COUNT(*) completo en catálogos grandes
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
-    actions = ['mark_as_inactive', 'mark_as_active']
+    def get_queryset(self, request):
+        """Margen y estado del stock calculados como anotaciones SQL"""
+        return super().get_queryset(request).with_profit_margin().with_stock_status()
+    
+    actions = ['mark_as_inactive', 'mark_as_active', 'bulk_adjust']
+    
+    def get_urls(self):
+        custom_urls = [
+            path(
+                'import/',
+                self.admin_site.admin_view(self.import_view),
+                name='store_product_import',
+            ),
+            path(
+                'import/errors/<str:filename>/',
+                self.admin_site.admin_view(self.import_errors_view),
+                name='store_product_import_errors',
+            ),
+        ]
+        return custom_urls + super().get_urls()
+    
+    def import_view(self, request):
+        """Importación masiva de productos desde CSV o JSON Lines"""
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+        
+        if request.method == 'POST' and request.FILES.get('file'):
+            upload = request.FILES['file']
+            file_format = 'jsonl' if upload.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+            errors_dir = Path(settings.PRODUCT_IMPORT_DIR)
+            errors_dir.mkdir(parents=True, exist_ok=True)
+            errors_name = f"errores-{timezone.now():%Y%m%d-%H%M%S}-{request.user.pk}.csv"
+            
+            try:
+                with open(errors_dir / errors_name, 'w', newline='', encoding='utf-8') as error_stream:
+                    importer = ProductImporter(error_stream=error_stream)
+                    stream = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+                    report = importer.run(stream, file_format)
+            except ImportFileError as e:
+                (errors_dir / errors_name).unlink()
+                self.message_user(
+                    request,
+                    f'Importación interrumpida: {e}. Aplicado hasta entonces: {e.report}',
+                    level='error',
+                )
+                return redirect('admin:store_product_import')
+            
+            self.message_user(request, f'Importación completada: {report}')
+            if report.rejected:
+                errors_url = reverse('admin:store_product_import_errors', args=[errors_name])
+                self.message_user(
+                    request,
+                    format_html('Filas rechazadas: <a href="{}">descargar reporte de errores</a>', errors_url),
+                    level='warning',
+                )
+                return redirect('admin:store_product_import')
+            (errors_dir / errors_name).unlink()
+            return redirect('admin:store_product_changelist')
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importar productos',
+        }
+        return TemplateResponse(request, 'admin/store/product/import_products.html', context)
+    
+    def import_errors_view(self, request, filename):
+        """Descarga el reporte de filas rechazadas de una importación"""
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        errors_path = Path(settings.PRODUCT_IMPORT_DIR) / Path(filename).name
+        if not errors_path.is_file():
+            raise Http404
+        return FileResponse(open(errors_path, 'rb'), as_attachment=True, filename=errors_path.name)
     
     def mark_as_inactive(self, request, queryset):
         """Marcar productos como inactivos en lugar de eliminarlos"""
@@ -60,27 +196,65 @@ class ProductAdmin(admin.ModelAdmin):
         self.message_user(request, f'{updated} productos marcados como activos.')
     mark_as_active.short_description = "Marcar como activos"
     
+    def bulk_adjust(self, request, queryset):
+        """Ajuste masivo de precios o stock con vista previa y posibilidad de deshacer"""
+        form = BulkAdjustmentForm(request.POST if 'operation' in request.POST else None)
+        preview = None
+        if form.is_bound and form.is_valid():
+            operation = form.cleaned_data['operation']
+            value = form.cleaned_data['value']
+            if 'apply' in request.POST:
+                batch = apply_adjustment(queryset, operation, value, user=request.user)
+                self.message_user(
+                    request,
+                    f'Ajuste aplicado a {batch.products_count} productos. '
+                    f'Puede deshacerse desde "Ajustes Masivos" (#{batch.pk}).'
+                )
+                return None
+            preview = preview_adjustment(queryset, operation, value)
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Ajuste masivo de precios y stock',
+            'form': form,
+            'preview': preview,
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/store/product/bulk_adjust.html', context)
+    bulk_adjust.short_description = "Ajustar precios o stock"
+    
     def profit_margin_display(self, obj):
         """Muestra el margen de ganancia con formato"""
-        if obj.profit_margin > 0:
-            margin = f"{obj.profit_margin:.1f}"
+        profit_margin = getattr(obj, 'margin_pct', None)
+        if profit_margin is None:
+            profit_margin = obj.profit_margin
+        if profit_margin > 0:
+            margin = f"{profit_margin:.1f}"
             return format_html('<span style="color: green;">{}%</span>', margin)
-        elif obj.profit_margin < 0:
-            margin = f"{obj.profit_margin:.1f}"
+        elif profit_margin < 0:
+            margin = f"{profit_margin:.1f}"
             return format_html('<span style="color: red;">{}%</span>', margin)
         else:
             return format_html('<span style="color: gray;">0%</span>')
     profit_margin_display.short_description = "Margen"
+    profit_margin_display.admin_order_field = 'margin_pct'
     
     def stock_status(self, obj):
         """Muestra el estado del stock con colores"""
-        if obj.is_out_of_stock:
+        state = getattr(obj, 'stock_state', None)
+        if state is None:
+            state = 'out' if obj.is_out_of_stock else 'low' if obj.is_low_stock else 'ok'
+        if state == 'out':
             return format_html('<span style="color: red;">Agotado</span>')
-        elif obj.is_low_stock:
+        elif state == 'low':
             return format_html('<span style="color: orange;">Bajo</span>')
         else:
             return format_html('<span style="color: green;">OK</span>')
     stock_status.short_description = "Estado Stock"
+    stock_status.admin_order_field = 'stock_state'
     
     fieldsets = (
         ('Información Básica', {
@@ -119,6 +293,15 @@ class OrderItemInline(admin.TabularInline):
     extra = 0
     readonly_fields = ['subtotal']
 
+class OrderCurrencyTotalInline(admin.TabularInline):
+    model = OrderCurrencyTotal
+    extra = 0
+    can_delete = False
+    readonly_fields = ['currency', 'amount', 'settlement_amount', 'created_at']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = [
@@ -131,8 +314,9 @@ class OrderAdmin(admin.ModelAdmin):
     ]
     search_fields = ['order_number', 'user__username', 'phone', 'shipping_address']
     readonly_fields = ['order_number', 'created_at', 'updated_at', 'whatsapp_message']
+    inlines = [OrderCurrencyTotalInline]
     
-    actions = ['mark_as_whatsapp_sent', 'mark_as_whatsapp_not_sent']
+    actions = ['mark_as_whatsapp_sent', 'mark_as_whatsapp_not_sent', 'mark_as_cancelled', 'export_as_csv']
     
     def mark_as_whatsapp_sent(self, request, queryset):
         """Marcar órdenes como WhatsApp enviado"""
@@ -146,9 +330,21 @@ class OrderAdmin(admin.ModelAdmin):
         self.message_user(request, f'{updated} órdenes marcadas como WhatsApp no enviado.')
     mark_as_whatsapp_not_sent.short_description = "Marcar WhatsApp como no enviado"
     
+    def mark_as_cancelled(self, request, queryset):
+        """Cancelar órdenes (los resúmenes de ventas de sus días se recalculan)"""
+        updated = queryset.update(status='cancelled')
+        self.message_user(request, f'{updated} órdenes canceladas.')
+    mark_as_cancelled.short_description = "Cancelar órdenes seleccionadas"
+    
+    def export_as_csv(self, request, queryset):
+        """Exportar las órdenes seleccionadas y sus items a CSV en flujo"""
+        filename = f"ordenes-{timezone.now():%Y%m%d-%H%M%S}.csv"
+        return streaming_csv_response(order_item_rows(orders=queryset), filename)
+    export_as_csv.short_description = "Exportar a CSV (órdenes e items)"
+    
     fieldsets = (
         ('Información Básica', {
-            'fields': ('order_number', 'user', 'status', 'total_amount')
+            'fields': ('order_number', 'user', 'status', 'total_amount', 'settlement_currency')
         }),
         ('Información de Entrega', {
             'fields': ('delivery_type', 'shipping_address', 'phone', 'notes')
@@ -169,6 +365,305 @@ class OrderAdmin(admin.ModelAdmin):
             obj.whatsapp_message = obj.generate_whatsapp_message()
         super().save_model(request, obj, form, change)
 
+class ReadOnlyRollupAdmin(admin.ModelAdmin):
+    """Las tablas de resumen solo se modifican desde el checkout o el comando de recálculo"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(DailySales)
+class DailySalesAdmin(ReadOnlyRollupAdmin):
+    list_display = ['date', 'currency', 'orders', 'units', 'revenue', 'cost', 'margin']
+    list_filter = ['currency', 'date']
+    list_select_related = ['currency']
+    date_hierarchy = 'date'
+    
+    def get_urls(self):
+        custom_urls = [
+            path(
+                'dashboard/',
+                self.admin_site.admin_view(self.dashboard_view),
+                name='store_dailysales_dashboard',
+            ),
+        ]
+        return custom_urls + super().get_urls()
+    
+    def dashboard_view(self, request):
+        """Panel de ventas de los últimos 12 meses (solo lee los resúmenes)"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        
+        months = monthly_sales(12)
+        charts = {}
+        for row in months:
+            charts.setdefault(row['currency'], []).append(row)
+        for rows in charts.values():
+            top = max(row['revenue'] for row in rows) or 1
+            for row in rows:
+                row['percent'] = round(row['revenue'] * 100 / top, 1)
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Panel de ventas',
+            'charts': charts.items(),
+            'categories': category_sales(period_start(12)),
+        }
+        return TemplateResponse(request, 'admin/store/dailysales/dashboard.html', context)
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(ReadOnlyRollupAdmin):
+    list_display = ['date', 'product', 'category', 'currency', 'units', 'revenue', 'cost', 'margin']
+    list_filter = ['currency', 'category', 'date']
+    list_select_related = ['product', 'category', 'currency']
+    search_fields = ['product__name', 'product__code']
+    date_hierarchy = 'date'
+
+class OpenAlertFilter(admin.SimpleListFilter):
+    title = "Estado"
+    parameter_name = 'open'
+
+    def lookups(self, request, model_admin):
+        return [('1', 'Abiertas'), ('0', 'Resueltas')]
+
+    def queryset(self, request, queryset):
+        if self.value() == '1':
+            return queryset.filter(resolved_at__isnull=True)
+        if self.value() == '0':
+            return queryset.filter(resolved_at__isnull=False)
+        return queryset
+
+@admin.register(LowStockAlert)
+class LowStockAlertAdmin(admin.ModelAdmin):
+    list_display = ['product', 'stock', 'min_stock', 'current_stock', 'created_at', 'resolved_at']
+    list_filter = [OpenAlertFilter, 'created_at']
+    list_select_related = ['product']
+    search_fields = ['product__name', 'product__code']
+    readonly_fields = ['product', 'stock', 'min_stock', 'created_at']
+    actions = ['mark_as_resolved']
+    
+    def get_urls(self):
+        custom_urls = [
+            path(
+                'replenishment/',
+                self.admin_site.admin_view(self.replenishment_view),
+                name='store_lowstockalert_replenishment',
+            ),
+        ]
+        return custom_urls + super().get_urls()
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def current_stock(self, obj):
+        return obj.product.stock
+    current_stock.short_description = "Stock Actual"
+    
+    def mark_as_resolved(self, request, queryset):
+        """Marcar alertas como resueltas"""
+        updated = queryset.filter(resolved_at__isnull=True).update(resolved_at=timezone.now())
+        self.message_user(request, f'{updated} alertas marcadas como resueltas.')
+    mark_as_resolved.short_description = "Marcar como resueltas"
+    
+    def replenishment_view(self, request):
+        """Reporte de reposición ordenado por velocidad de venta"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            days = max(int(request.GET.get('days', 30)), 1)
+        except ValueError:
+            days = 30
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Reporte de reposición',
+            'days': days,
+            'rows': replenishment_report(days=days, limit=200),
+        }
+        return TemplateResponse(request, 'admin/store/lowstockalert/replenishment.html', context)
+
+@admin.register(PriceChangeBatch)
+class PriceChangeBatchAdmin(admin.ModelAdmin):
+    list_display = ['id', 'operation', 'value', 'products_count', 'user', 'created_at', 'undone_at']
+    list_filter = ['operation', 'created_at']
+    list_select_related = ['user']
+    readonly_fields = ['operation', 'value', 'products_count', 'user', 'created_at', 'undone_at']
+    actions = ['undo_batches']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def undo_batches(self, request, queryset):
+        """Restaurar los valores anteriores a los ajustes seleccionados"""
+        # Deshacer del más reciente al más antiguo
+        restored = skipped = 0
+        for batch in queryset.filter(undone_at__isnull=True).order_by('-created_at'):
+            batch_restored, batch_skipped = undo_adjustment(batch)
+            restored += batch_restored
+            skipped += batch_skipped
+        self.message_user(request, f'{restored} productos restaurados.')
+        if skipped:
+            self.message_user(
+                request,
+                f'{skipped} productos omitidos: su precio cambió después del ajuste.',
+                level='warning',
+            )
+    undo_batches.short_description = "Deshacer ajustes seleccionados"
+
+@admin.register(ImageBlob)
+class ImageBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'ref_count', 'created_at', 'updated_at']
+    list_filter = ['created_at']
+    search_fields = ['name']
+    
+    # Los contadores los mantiene Product.save() y los corrige gc_product_images
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Consultas lentas de este proceso, agregadas por huella (no hay tabla detrás)"""
+
+    def get_urls(self):
+        return [
+            path('', self.admin_site.admin_view(self.changelist_view), name='store_slowquery_changelist'),
+        ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        if request.method == 'POST' and request.user.is_superuser:
+            slow_query_log.clear()
+            self.message_user(request, 'Registro de consultas lentas vaciado.')
+            return redirect('admin:store_slowquery_changelist')
+
+        fingerprints, entries = slow_query_log.summary()
+        view = request.GET.get('view')
+        if view:
+            fingerprints = [stats for stats in fingerprints if view in dict(stats['views'])]
+            entries = [entry for entry in entries if entry['view'] == view]
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Consultas lentas',
+            'options': slow_query_options(),
+            'view': view,
+            'fingerprints': fingerprints,
+            'entries': entries,
+        }
+        return TemplateResponse(request, 'admin/store/slowquery/slow_queries.html', context)
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Perfiles de peticiones guardados en disco (no hay tabla detrás)"""
+    SORT_CHOICES = [
+        ('cumulative', 'Tiempo acumulado'),
+        ('tottime', 'Tiempo propio'),
+        ('calls', 'Llamadas'),
+    ]
+
+    def get_urls(self):
+        return [
+            path('', self.admin_site.admin_view(self.changelist_view), name='store_requestprofile_changelist'),
+            path(
+                '<str:profile_id>/',
+                self.admin_site.admin_view(self.profile_view),
+                name='store_requestprofile_detail',
+            ),
+            path(
+                '<str:profile_id>/<str:kind>/',
+                self.admin_site.admin_view(self.download_view),
+                name='store_requestprofile_download',
+            ),
+        ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        store = profile_store()
+        token = None
+        if request.method == 'POST':
+            if 'clear' in request.POST and request.user.is_superuser:
+                store.clear()
+                self.message_user(request, 'Perfiles borrados.')
+                return redirect('admin:store_requestprofile_changelist')
+            token = make_token(request.user)
+
+        options = profiling_options()
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Perfiles de peticiones',
+            'options': options,
+            'token': token,
+            'token_minutes': options['TOKEN_MAX_AGE'] // 60,
+            'profiles': store.list(),
+        }
+        return TemplateResponse(request, 'admin/store/requestprofile/profiles.html', context)
+
+    def profile_view(self, request, profile_id):
+        """Informe de pstats de un perfil"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        store = profile_store()
+        try:
+            profile = store.get(profile_id)
+        except ValueError:
+            raise Http404
+        if profile is None:
+            raise Http404
+        sort = request.GET.get('sort')
+        if sort not in dict(self.SORT_CHOICES):
+            sort = 'cumulative'
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f"Perfil {profile_id}",
+            'profile': profile,
+            'sort': sort,
+            'sort_choices': self.SORT_CHOICES,
+            'stats': store.stats_text(profile_id, sort),
+        }
+        return TemplateResponse(request, 'admin/store/requestprofile/profile.html', context)
+
+    def download_view(self, request, profile_id, kind):
+        """Descarga el .prof (pstats, snakeviz) o el .folded (flamegraph.pl, speedscope)"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        if kind not in ('prof', 'folded'):
+            raise Http404
+        try:
+            profile_path = profile_store().path(profile_id, kind)
+        except ValueError:
+            raise Http404
+        if not profile_path.exists():
+            raise Http404
+        return FileResponse(open(profile_path, 'rb'), as_attachment=True, filename=profile_path.name)
+
 # Configuración del sitio admin
 admin.site.site_header = "Administración de Cuba E-Commerce"
 admin.site.site_title = "Cuba E-Commerce Admin"
@@ -0,0 +1,277 @@
+"""
+API JSON de solo lectura del catálogo (productos, categorías y monedas).
+
+Las respuestas se construyen con proyecciones values() en lugar de
+instancias de los modelos, solo con los campos pedidos en `fields`, y se
+serializan sin espacios y con las claves siempre en el mismo orden (se
+comprimen mejor con gzip). Cada respuesta lleva un ETag: si el cliente ya
+tiene esa versión recibe un 304 sin cuerpo.
+
+Los productos se paginan por clave (`after` = último id recibido), de modo
+que pedir la página 1000 cuesta lo mismo que pedir la primera.
+
+/api/sync/ devuelve solo lo que cambió desde un cursor, a partir del
+registro CatalogChange: el estado actual de cada objeto modificado y
+lápidas (ids) de los borrados o desactivados.
+"""
+import hashlib
+import json
+
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_safe
+
+from .models import CatalogChange, Category, Currency, Product
+from .storage import product_image_storage
+
+API_CACHE_SECONDS = 60
+API_DEFAULT_LIMIT = 100
+API_MAX_LIMIT = 500
+SYNC_DEFAULT_LIMIT = 500
+SYNC_MAX_LIMIT = 5000
+
+
+def _image_url(name):
+    return product_image_storage().url(name) if name else None
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+# Campo público -> (campo de values(), conversión a JSON)
+PRODUCT_FIELDS = {
+    'id': ('id', None),
+    'code': ('code', None),
+    'name': ('name', None),
+    'description': ('description', None),
+    'category': ('category_id', None),
+    'currency': ('currency__code', None),
+    'price': ('sale_price', str),
+    'stock': ('stock', None),
+    'featured': ('is_featured', None),
+    'image': ('image', _image_url),
+    'updated_at': ('updated_at', _isoformat),
+}
+PRODUCT_DEFAULT_FIELDS = ['id', 'code', 'name', 'category', 'currency', 'price', 'stock']
+
+CATEGORY_FIELDS = {
+    'id': ('id', None),
+    'name': ('name', None),
+    'description': ('description', None),
+}
+
+CURRENCY_FIELDS = {
+    'id': ('id', None),
+    'code': ('code', None),
+    'name': ('name', None),
+    'symbol': ('symbol', None),
+    'exchange_rate': ('exchange_rate', str),
+    'default': ('is_default', None),
+}
+
+
+class ApiError(ValueError):
+    """Parámetro inválido en una petición a la API"""
+
+
+def parse_fields(request, available, default):
+    """Campos pedidos en ?fields=a,b,c (en el orden de `available`)"""
+    value = request.GET.get('fields')
+    if not value:
+        return list(default)
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested - set(available)
+    if unknown:
+        raise ApiError(f"Campos desconocidos: {', '.join(sorted(unknown))}")
+    return [name for name in available if name in requested]
+
+
+def _parse_int(request, name, default=None, minimum=0, maximum=None):
+    value = request.GET.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ApiError(f"{name}: entero inválido '{value}'")
+    if number < minimum or (maximum is not None and number > maximum):
+        raise ApiError(f"{name}: fuera de rango")
+    return number
+
+
+def serialize_rows(rows, fields, spec):
+    """Convierte filas de values() en diccionarios con los nombres públicos"""
+    columns = [(name, spec[name][0], spec[name][1]) for name in fields]
+    return [
+        {
+            name: convert(row[column]) if convert else row[column]
+            for name, column, convert in columns
+        }
+        for row in rows
+    ]
+
+
+def json_response(request, data):
+    """Respuesta JSON compacta con ETag; 304 si el cliente ya la tiene"""
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=API_CACHE_SECONDS)
+    return response
+
+
+def _error(error, status=400):
+    return JsonResponse({'error': str(error)}, status=status)
+
+
+def _product_rows(fields):
+    # El id siempre se lee: es la clave de la paginación
+    columns = {PRODUCT_FIELDS[name][0] for name in fields} | {'id'}
+    return Product.objects.filter(is_active=True).values(*sorted(columns))
+
+
+@gzip_page
+@require_safe
+async def product_list(request):
+    """Productos activos por orden de id, paginados con ?after=<último id>"""
+    try:
+        fields = parse_fields(request, PRODUCT_FIELDS, PRODUCT_DEFAULT_FIELDS)
+        after = _parse_int(request, 'after')
+        limit = _parse_int(request, 'limit', API_DEFAULT_LIMIT, minimum=1, maximum=API_MAX_LIMIT)
+        category = _parse_int(request, 'category')
+    except ApiError as e:
+        return _error(e)
+
+    rows = _product_rows(fields)
+    if after is not None:
+        rows = rows.filter(id__gt=after)
+    if category is not None:
+        rows = rows.filter(category_id=category)
+    if request.GET.get('currency'):
+        rows = rows.filter(currency__code=request.GET['currency'].upper())
+    # Una fila de más indica si hay otra página
+    rows = [row async for row in rows.order_by('id')[:limit + 1]]
+
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        params = request.GET.copy()
+        params['after'] = rows[-1]['id']
+        next_url = f"{request.path}?{params.urlencode()}"
+    return json_response(request, {
+        'results': serialize_rows(rows, fields, PRODUCT_FIELDS),
+        'next': next_url,
+    })
+
+
+@gzip_page
+@require_safe
+async def product_detail(request, product_id):
+    try:
+        fields = parse_fields(request, PRODUCT_FIELDS, list(PRODUCT_FIELDS))
+    except ApiError as e:
+        return _error(e)
+    row = await _product_rows(fields).filter(id=product_id).afirst()
+    if row is None:
+        return _error("Producto no encontrado", status=404)
+    return json_response(request, serialize_rows([row], fields, PRODUCT_FIELDS)[0])
+
+
+@gzip_page
+@require_safe
+async def category_list(request):
+    categories = await Category.aget_cached_list()
+    return json_response(request, {
+        'results': [
+            {'id': category.id, 'name': category.name, 'description': category.description}
+            for category in categories
+        ],
+    })
+
+
+@gzip_page
+@require_safe
+async def currency_list(request):
+    try:
+        fields = parse_fields(request, CURRENCY_FIELDS, list(CURRENCY_FIELDS))
+    except ApiError as e:
+        return _error(e)
+    rows = Currency.objects.filter(is_active=True).order_by('code').values(
+        *[CURRENCY_FIELDS[name][0] for name in fields]
+    )
+    return json_response(request, {
+        'results': serialize_rows([row async for row in rows], fields, CURRENCY_FIELDS),
+    })
+
+
+@gzip_page
+@require_safe
+async def catalog_changes(request):
+    """
+    Cambios del catálogo desde ?since=<cursor> (0 o vacío: catálogo completo).
+    El cliente aplica la respuesta y repite con el `cursor` devuelto mientras
+    `more` sea verdadero. Si el cursor es posterior al último cambio conocido
+    (la base se restauró) responde `reset` y el cliente descarga todo de nuevo.
+    """
+    try:
+        fields = parse_fields(request, PRODUCT_FIELDS, PRODUCT_DEFAULT_FIELDS)
+        since = _parse_int(request, 'since', 0)
+        limit = _parse_int(request, 'limit', SYNC_DEFAULT_LIMIT, minimum=1, maximum=SYNC_MAX_LIMIT)
+    except ApiError as e:
+        return _error(e)
+
+    entries = [
+        entry async for entry in CatalogChange.objects.filter(id__gt=since)
+        .order_by('id').values_list('id', 'kind', 'object_id')[:limit + 1]
+    ]
+    more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries and since:
+        last = await CatalogChange.objects.order_by('-id').values_list('id', flat=True).afirst()
+        if last is None or since > last:
+            return json_response(request, {'reset': True, 'cursor': 0, 'more': False})
+
+    changed = {'product': set(), 'category': set(), 'currency': set()}
+    for _, kind, object_id in entries:
+        changed[kind].add(object_id)
+
+    # Se envía el estado actual: lo que ya no existe (o está inactivo) es una lápida
+    products = await _changed_rows(
+        _product_rows(fields).filter(is_active=True), changed['product'],
+    )
+    categories = await _changed_rows(
+        Category.objects.values(*[CATEGORY_FIELDS[name][0] for name in CATEGORY_FIELDS]),
+        changed['category'],
+    )
+    currencies = await _changed_rows(
+        Currency.objects.filter(is_active=True).values(*[CURRENCY_FIELDS[name][0] for name in CURRENCY_FIELDS]),
+        changed['currency'],
+    )
+    deleted = {
+        'products': sorted(changed['product'] - {row['id'] for row in products}),
+        'categories': sorted(changed['category'] - {row['id'] for row in categories}),
+        'currencies': sorted(changed['currency'] - {row['id'] for row in currencies}),
+    }
+    if not since:
+        # En una descarga completa no hace falta enviar lo que el cliente nunca tuvo
+        deleted = {key: [] for key in deleted}
+
+    return json_response(request, {
+        'cursor': entries[-1][0] if entries else since,
+        'more': more,
+        'products': serialize_rows(products, fields, PRODUCT_FIELDS),
+        'categories': serialize_rows(categories, list(CATEGORY_FIELDS), CATEGORY_FIELDS),
+        'currencies': serialize_rows(currencies, list(CURRENCY_FIELDS), CURRENCY_FIELDS),
+        'deleted': deleted,
+    })
+
+
+async def _changed_rows(rows, ids):
+    if not ids:
+        return []
+    return [row async for row in rows.filter(id__in=sorted(ids)).order_by('id')]
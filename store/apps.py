@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        # Registrar los receptores de señales
+        from . import signals  # noqa: F401
+        # Comprobaciones de `check --deploy`
+        from . import checks  # noqa: F401
+        # Instalar el registro de consultas lentas en cada conexión
+        from cuba_ecommerce import slowqueries  # noqa: F401
+        # Recrear los triggers de CatalogChange que borre una migración (SQLite)
+        from .triggers import ensure_triggers
+        post_migrate.connect(ensure_triggers, sender=self)
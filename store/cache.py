@@ -0,0 +1,190 @@
+"""
+Caché de dos niveles para datos de referencia (categorías, monedas).
+
+El primer nivel es un LRU en la memoria del proceso; el segundo es un
+backend de caché de Django compartido entre procesos (archivo, memoria
+local o Redis según CACHES). Las claves llevan la versión de su espacio de
+nombres: invalidar un espacio solo incrementa su versión, y las entradas
+anteriores caducan solas.
+
+Los demás procesos ven una invalidación como mucho LOCAL_TTL segundos
+después, que es lo que dura la versión guardada en el primer nivel.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+MISSING = object()
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60 * 60,
+    'LOCAL_MAX_ENTRIES': 256,
+    'LOCAL_TTL': 5,
+    'LOCK_TIMEOUT': 5,
+}
+
+
+class LocalLRU:
+    """LRU en memoria con caducidad, seguro entre hilos"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete_prefix(self, prefix):
+        with self.lock:
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class ReferenceCache:
+    """LRU del proceso delante de un backend compartido, con claves versionadas"""
+
+    def __init__(self, **options):
+        self.options = {**DEFAULTS, **getattr(settings, 'REFERENCE_CACHE', {}), **options}
+        self.local = LocalLRU(self.options['LOCAL_MAX_ENTRIES'])
+        # Candados repartidos por clave: un solo hilo recalcula cada valor
+        self.locks = [threading.Lock() for _ in range(32)]
+        self.counters = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    @property
+    def backend(self):
+        return caches[self.options['ALIAS']]
+
+    def _version_key(self, namespace):
+        return f"refcache:{namespace}:version"
+
+    def version(self, namespace):
+        """Versión actual de un espacio de nombres"""
+        key = self._version_key(namespace)
+        version = self.local.get(key)
+        if version is MISSING:
+            version = self.backend.get(key)
+            if version is None:
+                self.backend.add(key, 1, None)
+                version = self.backend.get(key, 1)
+            self.local.set(key, version, self.options['LOCAL_TTL'])
+        return version
+
+    def make_key(self, namespace, key):
+        return f"refcache:{namespace}:v{self.version(namespace)}:{key}"
+
+    def get_or_set(self, namespace, key, builder, timeout=None):
+        """Devuelve el valor cacheado o lo calcula con `builder` una sola vez"""
+        full_key = self.make_key(namespace, key)
+        value = self.local.get(full_key)
+        if value is not MISSING:
+            self.counters['local_hits'] += 1
+            return value
+
+        with self.locks[hash(full_key) % len(self.locks)]:
+            value = self.local.get(full_key)
+            if value is not MISSING:
+                self.counters['local_hits'] += 1
+                return value
+            value = self._get_shared(full_key)
+            if value is MISSING:
+                value = self._build(full_key, builder, timeout)
+            self.local.set(full_key, value, self.options['LOCAL_TTL'])
+            return value
+
+    async def aget_or_set(self, namespace, key, builder, timeout=None):
+        """
+        Versión async de get_or_set: los aciertos del primer nivel se resuelven
+        en memoria sin salir del bucle de eventos; el resto va a un hilo.
+        """
+        version = self.local.get(self._version_key(namespace))
+        if version is not MISSING:
+            value = self.local.get(f"refcache:{namespace}:v{version}:{key}")
+            if value is not MISSING:
+                self.counters['local_hits'] += 1
+                return value
+        return await sync_to_async(self.get_or_set)(namespace, key, builder, timeout)
+
+    def _get_shared(self, full_key):
+        value = self.backend.get(full_key, MISSING)
+        if value is not MISSING:
+            self.counters['shared_hits'] += 1
+        return value
+
+    def _build(self, full_key, builder, timeout):
+        """Recalcula el valor; entre procesos solo lo hace quien obtiene el candado"""
+        lock_key = f"{full_key}:lock"
+        lock_timeout = self.options['LOCK_TIMEOUT']
+        acquired = self.backend.add(lock_key, 1, lock_timeout)
+        if not acquired:
+            # Otro proceso lo está calculando: esperar su resultado un tiempo acotado
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                value = self._get_shared(full_key)
+                if value is not MISSING:
+                    return value
+        try:
+            value = builder()
+            self.counters['misses'] += 1
+            self.backend.set(
+                full_key, value, self.options['TIMEOUT'] if timeout is None else timeout
+            )
+        finally:
+            if acquired:
+                self.backend.delete(lock_key)
+        return value
+
+    def invalidate(self, namespace):
+        """Descarta todas las entradas de un espacio de nombres"""
+        key = self._version_key(namespace)
+        try:
+            self.backend.incr(key)
+        except ValueError:
+            # Sin versión guardada: usar una que no pueda coincidir con una anterior
+            self.backend.set(key, time.time_ns(), None)
+        self.local.delete_prefix(f"refcache:{namespace}:")
+
+    def invalidate_on_commit(self, namespace, using=None):
+        """
+        Invalida cuando la transacción en curso confirma (al momento si no hay
+        ninguna): antes, otra petición podría volver a cachear los datos viejos.
+        """
+        transaction.on_commit(lambda: self.invalidate(namespace), using=using)
+
+    def stats(self):
+        """Contadores de aciertos de este proceso"""
+        counters = dict(self.counters)
+        lookups = sum(counters.values())
+        hits = counters['local_hits'] + counters['shared_hits']
+        counters['hit_rate'] = hits / lookups if lookups else 0
+        return counters
+
+
+reference_cache = ReferenceCache()
@@ -0,0 +1,21 @@
+"""Comprobaciones del sistema para el despliegue"""
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.staticfiles, deploy=True)
+def check_vendor_assets(app_configs, **kwargs):
+    """
+    En producción las librerías de VENDOR_ASSETS deben estar copiadas en
+    static/: si faltan, las plantillas caen en silencio al CDN.
+    """
+    errors = []
+    for name, (local_path, cdn_url) in getattr(settings, 'VENDOR_ASSETS', {}).items():
+        if not finders.find(local_path):
+            errors.append(Error(
+                f"Falta la copia local de '{name}' ({local_path}).",
+                hint="Ejecute `python manage.py vendor_static_assets` antes de collectstatic.",
+                id='store.E001',
+            ))
+    return errors
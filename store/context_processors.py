@@ -0,0 +1,25 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+
+@lru_cache(maxsize=None)
+def _vendor_asset_url(local_path, cdn_url):
+    """URL local (con hash en producción) del recurso, o la del CDN si no está copiado"""
+    if settings.DEBUG:
+        found = finders.find(local_path)
+    else:
+        found = staticfiles_storage.exists(local_path)
+    return staticfiles_storage.url(local_path) if found else cdn_url
+
+
+def vendor_assets(request):
+    """URLs de las librerías de terceros para las plantillas"""
+    return {
+        'vendor': {
+            name: _vendor_asset_url(local_path, cdn_url)
+            for name, (local_path, cdn_url) in getattr(settings, 'VENDOR_ASSETS', {}).items()
+        }
+    }
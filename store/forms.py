@@ -0,0 +1,24 @@
+from django import forms
+
+from .models import PriceChangeBatch
+
+
+class BulkAdjustmentForm(forms.Form):
+    """Parámetros de un ajuste masivo de precios o stock"""
+    operation = forms.ChoiceField(choices=PriceChangeBatch.OPERATION_CHOICES, label="Operación")
+    value = forms.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        label="Valor",
+        help_text="Porcentaje (10 = +10%), monto, margen objetivo en % o unidades de stock (puede ser negativo)"
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        operation = cleaned_data.get('operation')
+        value = cleaned_data.get('value')
+        if operation == 'stock' and value is not None and value != value.to_integral_value():
+            self.add_error('value', "El ajuste de stock debe ser un número entero.")
+        if operation in ('percent', 'margin') and value is not None and value <= -100:
+            self.add_error('value', "El porcentaje debe ser mayor que -100.")
+        return cleaned_data
@@ -0,0 +1,125 @@
+"""
+Versiones redimensionadas (JPEG y WebP) de las imágenes de productos.
+
+Cada versión se guarda con un nombre derivado del hash del contenido de la
+imagen original, de modo que se puede cachear indefinidamente y no se
+regenera si la misma imagen se sube de nuevo.
+"""
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = getattr(settings, 'PRODUCT_IMAGE_WIDTHS', [160, 320, 640])
+RENDITION_DIR = 'products/renditions'
+RENDITION_FORMATS = {
+    'jpg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 75, 'method': 4}),
+}
+
+_executor = None
+
+
+def content_hash(file):
+    """SHA-256 del contenido de un archivo, leído por bloques"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(64 * 1024), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def build_renditions(image_field):
+    """
+    Genera las versiones de una imagen y devuelve sus metadatos:
+    {'source': nombre, 'width': w, 'height': h, 'sizes': {ancho: {...}}}
+    """
+    from PIL import Image, ImageOps
+
+    with image_field.open('rb') as source:
+        digest = content_hash(source)[:20]
+        with Image.open(source) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ('RGB', 'L'):
+                background = Image.new('RGB', original.size, (255, 255, 255))
+                if original.mode in ('RGBA', 'LA', 'P'):
+                    original = original.convert('RGBA')
+                    background.paste(original, mask=original.split()[-1])
+                else:
+                    background.paste(original.convert('RGB'))
+                original = background
+            elif original.mode == 'L':
+                original = original.convert('RGB')
+
+            sizes = {}
+            for width in sorted(RENDITION_WIDTHS):
+                if width > original.width and sizes:
+                    break
+                target_width = min(width, original.width)
+                target_height = max(round(original.height * target_width / original.width), 1)
+                resized = original.resize((target_width, target_height), Image.LANCZOS)
+                rendition = {'width': target_width, 'height': target_height}
+                for extension, (image_format, options) in RENDITION_FORMATS.items():
+                    name = f"{RENDITION_DIR}/{digest}-{target_width}.{extension}"
+                    if not default_storage.exists(name):
+                        buffer = io.BytesIO()
+                        resized.save(buffer, image_format, **options)
+                        name = default_storage.save(name, ContentFile(buffer.getvalue()))
+                    rendition[extension] = name
+                sizes[str(target_width)] = rendition
+
+            return {
+                'source': image_field.name,
+                'width': original.width,
+                'height': original.height,
+                'sizes': sizes,
+            }
+
+
+def generate_renditions(product_id):
+    """Genera y guarda las versiones de la imagen de un producto"""
+    from PIL import Image
+
+    from .models import Product
+
+    product = Product.objects.filter(pk=product_id).only('id', 'image').first()
+    if product is None or not product.image:
+        return None
+    try:
+        renditions = build_renditions(product.image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Una imagen dañada o demasiado grande no debe tumbar el guardado ya confirmado
+        logger.exception("No se pudieron generar las versiones de la imagen del producto %s", product_id)
+        return None
+    # update() evita volver a disparar Product.save()
+    Product.objects.filter(pk=product_id, image=product.image.name).update(image_renditions=renditions)
+    return renditions
+
+
+def _generate_in_background(product_id):
+    try:
+        generate_renditions(product_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_renditions(product_id):
+    """
+    Genera las versiones en el acto o, si PRODUCT_IMAGE_ASYNC está activo,
+    en un hilo de fondo para no retrasar la respuesta.
+    """
+    global _executor
+    if not getattr(settings, 'PRODUCT_IMAGE_ASYNC', False):
+        return generate_renditions(product_id)
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='renditions')
+    _executor.submit(_generate_in_background, product_id)
+    return None
@@ -0,0 +1,305 @@
+"""
+Importación masiva de productos desde CSV o JSON Lines.
+
+El archivo se lee como un flujo y se procesa en bloques de tamaño fijo,
+de modo que la memoria usada no depende del número de filas.
+"""
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Category, Currency, Product
+
+REQUIRED_FIELDS = ['code', 'name', 'category', 'currency', 'purchase_price', 'sale_price']
+OPTIONAL_FIELDS = ['description', 'stock', 'min_stock', 'is_active', 'is_featured']
+IMPORT_FIELDS = REQUIRED_FIELDS + OPTIONAL_FIELDS
+
+TRUE_VALUES = {'1', 'true', 'si', 'sí', 'yes', 'y', 's'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', ''}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Precios con max_digits=10 y 2 decimales
+MAX_PRICE = Decimal('99999999.99')
+# Mayor valor de un PositiveIntegerField en todas las bases que soporta Django
+MAX_INT = 2147483647
+
+
+class RowError(ValueError):
+    """Error de validación de una fila del archivo de importación"""
+
+
+class ImportFileError(Exception):
+    """
+    El archivo no se puede seguir leyendo (codificación que no es UTF-8, CSV
+    mal formado). Los bloques ya aplicados se conservan; `report` dice cuántos.
+    """
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+def iter_records(stream, file_format='csv'):
+    """
+    Recorre el archivo como un flujo de diccionarios.
+    Devuelve tuplas (número de fila, datos).
+    """
+    if file_format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, RowError(f"JSON inválido: {e}")
+                continue
+            if not isinstance(record, dict):
+                yield line_number, RowError("Cada línea debe ser un objeto JSON")
+                continue
+            yield line_number, record
+    else:
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+
+
+def _parse_decimal(value, field):
+    try:
+        number = Decimal(str(value).strip().replace(',', '.'))
+    except (InvalidOperation, AttributeError):
+        raise RowError(f"{field}: número inválido '{value}'")
+    # NaN e Infinity no se pueden comparar ni redondear
+    if not number.is_finite():
+        raise RowError(f"{field}: número inválido '{value}'")
+    if number < 0:
+        raise RowError(f"{field}: debe ser un número positivo")
+    try:
+        number = number.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise RowError(f"{field}: número demasiado grande '{value}'")
+    if number > MAX_PRICE:
+        raise RowError(f"{field}: número demasiado grande '{value}'")
+    return number
+
+
+def _parse_int(value, field):
+    try:
+        number = int(str(value).strip())
+    except ValueError:
+        raise RowError(f"{field}: entero inválido '{value}'")
+    if number < 0:
+        raise RowError(f"{field}: debe ser un entero positivo")
+    if number > MAX_INT:
+        raise RowError(f"{field}: entero demasiado grande '{value}'")
+    return number
+
+
+def _parse_bool(value, field):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise RowError(f"{field}: valor booleano inválido '{value}'")
+
+
+class ImportReport:
+    """Resultado y progreso de una importación"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.rejected = 0
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0
+
+    def __str__(self):
+        return (
+            f"{self.rows} filas: {self.created} creadas, {self.updated} actualizadas, "
+            f"{self.rejected} rechazadas en {self.elapsed:.1f}s ({self.rows_per_second:.0f} filas/s)"
+        )
+
+
+class ProductImporter:
+    """
+    Importa productos por código creando y actualizando por bloques.
+
+    Las categorías se resuelven por nombre y las monedas por código a partir
+    de mapas cargados una sola vez en memoria.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, error_stream=None, progress=None):
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.categories = {
+            name.strip().lower(): pk for pk, name in Category.objects.values_list('id', 'name')
+        }
+        self.currencies = {
+            code.upper(): pk for pk, code in Currency.objects.values_list('id', 'code')
+        }
+        self.error_writer = None
+        if error_stream is not None:
+            self.error_writer = csv.writer(error_stream)
+            self.error_writer.writerow(['fila', 'error'] + IMPORT_FIELDS)
+
+    def run(self, stream, file_format='csv'):
+        """Procesa el archivo completo y devuelve un ImportReport"""
+        report = ImportReport()
+        try:
+            self._process(stream, file_format, report)
+        except UnicodeDecodeError as e:
+            raise ImportFileError(
+                f"El archivo no está en UTF-8 ({e.reason}; se leyeron {report.rows} filas): "
+                "guárdelo con codificación UTF-8 y vuelva a importarlo",
+                report,
+            )
+        except csv.Error as e:
+            raise ImportFileError(f"CSV mal formado después de la fila {report.rows}: {e}", report)
+        report.finished_at = time.perf_counter()
+        return report
+
+    def _process(self, stream, file_format, report):
+        chunk = {}
+        for line_number, record in iter_records(stream, file_format):
+            report.rows += 1
+            try:
+                if isinstance(record, RowError):
+                    raise record
+                product = self.build_product(record)
+            except RowError as e:
+                self.reject(report, line_number, record, e)
+                continue
+            # Si un código se repite dentro del bloque, gana la última fila
+            chunk[product.code] = product
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk, report)
+                chunk = {}
+        if chunk:
+            self.flush(chunk, report)
+
+    def build_product(self, record):
+        """Valida una fila y construye la instancia (sin guardar)"""
+        # Un campo opcional vacío en JSON (null) cuenta como ausente
+        record = {key.strip(): value for key, value in record.items() if key and value is not None}
+        for field in REQUIRED_FIELDS:
+            if field not in record or not str(record[field]).strip():
+                raise RowError(f"{field}: campo obligatorio")
+
+        code = str(record['code']).strip()
+        name = str(record['name']).strip()
+        if len(code) > 50:
+            raise RowError("code: máximo 50 caracteres")
+        if len(name) > 200:
+            raise RowError("name: máximo 200 caracteres")
+
+        category_id = self.categories.get(str(record['category']).strip().lower())
+        if category_id is None:
+            raise RowError(f"category: categoría desconocida '{record['category']}'")
+        currency_id = self.currencies.get(str(record['currency']).strip().upper())
+        if currency_id is None:
+            raise RowError(f"currency: moneda desconocida '{record['currency']}'")
+
+        product = Product(
+            code=code,
+            name=name,
+            category_id=category_id,
+            currency_id=currency_id,
+            purchase_price=_parse_decimal(record['purchase_price'], 'purchase_price'),
+            sale_price=_parse_decimal(record['sale_price'], 'sale_price'),
+        )
+        if 'description' in record:
+            product.description = str(record['description'] or '')
+        if 'stock' in record:
+            product.stock = _parse_int(record['stock'], 'stock')
+        if 'min_stock' in record:
+            product.min_stock = _parse_int(record['min_stock'], 'min_stock')
+        if 'is_active' in record:
+            product.is_active = _parse_bool(record['is_active'], 'is_active')
+        if 'is_featured' in record:
+            product.is_featured = _parse_bool(record['is_featured'], 'is_featured')
+        # Al actualizar solo se tocan las columnas que trae la fila
+        product.import_fields = tuple(
+            field for field in IMPORT_FIELDS if field in record and field != 'code'
+        )
+        return product
+
+    def reject(self, report, line_number, record, error):
+        report.rejected += 1
+        if self.error_writer is not None:
+            values = record if isinstance(record, dict) else {}
+            self.error_writer.writerow(
+                [line_number, str(error)] + [values.get(field, '') for field in IMPORT_FIELDS]
+            )
+
+    def flush(self, chunk, report):
+        """Aplica un bloque: crea los códigos nuevos y actualiza los existentes"""
+        existing = dict(
+            Product.objects.filter(code__in=list(chunk)).values_list('code', 'id')
+        )
+        to_create = []
+        to_update = []
+        now = timezone.now()
+        for code, product in chunk.items():
+            if code in existing:
+                product.pk = existing[code]
+                product.updated_at = now
+                to_update.append(product)
+            else:
+                to_create.append(product)
+
+        with transaction.atomic():
+            if to_create:
+                Product.objects.bulk_create(to_create, batch_size=self.chunk_size)
+            if to_update:
+                self.update_existing(to_update)
+        report.created += len(to_create)
+        report.updated += len(to_update)
+        if self.progress:
+            self.progress(report)
+
+    def update_existing(self, products):
+        """
+        Actualiza los productos existentes con un UPDATE parametrizado por cada
+        conjunto de columnas presentes, ejecutado con executemany. bulk_update
+        construye una expresión CASE por campo y fila, y su costo en Python
+        domina en bloques grandes.
+        """
+        groups = {}
+        for product in products:
+            groups.setdefault(product.import_fields, []).append(product)
+        for field_names, group in groups.items():
+            self._update_columns(list(field_names) + ['updated_at'], group)
+
+    def _update_columns(self, field_names, products):
+        fields = [Product._meta.get_field(name) for name in field_names]
+        assignments = ', '.join(
+            f"{connection.ops.quote_name(field.column)} = %s" for field in fields
+        )
+        sql = (
+            f"UPDATE {connection.ops.quote_name(Product._meta.db_table)} "
+            f"SET {assignments} WHERE {connection.ops.quote_name(Product._meta.pk.column)} = %s"
+        )
+        params = [
+            [field.get_db_prep_save(getattr(product, field.attname), connection) for field in fields]
+            + [product.pk]
+            for product in products
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
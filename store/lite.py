@@ -0,0 +1,125 @@
+"""
+Modo ligero de la tienda para conexiones lentas o de pago por consumo.
+
+Se activa con ?lite=1 (que queda guardado en una cookie, ?lite=0 lo quita)
+o cuando el navegador envía la cabecera `Save-Data: on`. En ese modo las
+vistas del catálogo usan las plantillas de templates/lite/: CSS mínimo en
+línea, sin Bootstrap, fuentes de iconos ni JavaScript, y miniaturas
+pequeñas solo cuando el producto tiene foto.
+
+page_weight() mide lo que descarga el navegador para una página (HTML y
+recursos locales); LITE_PAGE_BUDGETS fija el máximo de las páginas ligeras
+(lo comprueban los tests y lo informa check_page_weight).
+"""
+import gzip
+import re
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import default_storage
+from django.utils.cache import patch_vary_headers
+
+LITE_PARAM = 'lite'
+LITE_COOKIE = 'lite'
+LITE_COOKIE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Recursos que descarga el navegador al cargar la página
+RESOURCE_RE = re.compile(
+    r'<(?:link[^>]+rel="(?:stylesheet|preload|icon)"[^>]*href|script[^>]+src|img[^>]+src|source[^>]+srcset)="([^"]+)"'
+)
+
+
+def is_lite(request):
+    value = request.GET.get(LITE_PARAM)
+    if value is not None:
+        return value == '1'
+    if request.COOKIES.get(LITE_COOKIE) == '1':
+        return True
+    return request.headers.get('Save-Data', '').lower() == 'on'
+
+
+def lite_template(request, template_name):
+    """Nombre de plantilla para render(): la versión ligera primero si corresponde"""
+    # La respuesta depende del modo ligero: LiteModeMiddleware añade Vary
+    request.lite_varies = True
+    if getattr(request, 'lite', False):
+        return [f'lite/{template_name}', template_name]
+    return template_name
+
+
+class LiteModeMiddleware:
+    """Marca request.lite y guarda la elección explícita del usuario en una cookie"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.lite = is_lite(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        request.lite = is_lite(request)
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        choice = request.GET.get(LITE_PARAM)
+        if choice == '1':
+            response.set_cookie(LITE_COOKIE, '1', max_age=LITE_COOKIE_MAX_AGE, samesite='Lax')
+        elif choice == '0':
+            response.delete_cookie(LITE_COOKIE, samesite='Lax')
+        # Las cachés intermedias deben distinguir las dos versiones de la página
+        # (solo en las vistas con versión ligera: la API o sw.js no cambian)
+        if getattr(request, 'lite_varies', False):
+            patch_vary_headers(response, ['Save-Data', 'Cookie'])
+        return response
+
+
+def resource_size(url):
+    """Tamaño en bytes de un estático o archivo media local, o None si no es local"""
+    path = urlsplit(url).path
+    if path.startswith(settings.STATIC_URL):
+        name = path[len(settings.STATIC_URL):]
+        if settings.DEBUG:
+            found = finders.find(name)
+            if found:
+                with open(found, 'rb') as file:
+                    return len(file.read())
+        elif staticfiles_storage.exists(name):
+            return staticfiles_storage.size(name)
+        return 0
+    if path.startswith(settings.MEDIA_URL):
+        name = path[len(settings.MEDIA_URL):]
+        return default_storage.size(name) if default_storage.exists(name) else 0
+    return None
+
+
+def page_weight(html):
+    """Bytes del HTML (sin comprimir y con gzip), de sus recursos locales y URLs externas que carga"""
+    resources = 0
+    external = []
+    for url in sorted(set(RESOURCE_RE.findall(html.decode('utf-8')))):
+        # srcset: solo cuenta la primera versión listada
+        url = url.split(',')[0].split()[0]
+        if url.startswith('data:'):
+            continue
+        size = resource_size(url)
+        if size is None:
+            external.append(url)
+        else:
+            resources += size
+    return {
+        'html': len(html),
+        'html_gzip': len(gzip.compress(html)),
+        'resources': resources,
+        'total': len(html) + resources,
+        'external': external,
+    }
@@ -0,0 +1,281 @@
+"""
+Herramientas para las pruebas de carga: un cliente HTTP concurrente mínimo
+sobre asyncio y el arranque de la aplicación en un servidor WSGI o ASGI local.
+"""
+import asyncio
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+
+SERVER_COMMANDS = {
+    # Servidor WSGI con un hilo por petición (el mismo de runserver)
+    'wsgi': lambda port: [
+        sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload', '--skip-checks',
+    ],
+    # Servidor ASGI de un solo proceso (requiere el paquete uvicorn)
+    'asgi': lambda port: [
+        sys.executable, '-m', 'uvicorn', 'cuba_ecommerce.asgi:application',
+        '--host', '127.0.0.1', '--port', str(port), '--no-access-log', '--log-level', 'warning',
+    ],
+}
+
+
+class Response:
+    """Respuesta HTTP leída por completo"""
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def header(self, name):
+        for key, value in self.headers:
+            if key == name:
+                return value
+        return None
+
+    def cookies(self):
+        """Cookies de las cabeceras Set-Cookie como {nombre: valor}"""
+        cookies = {}
+        for key, value in self.headers:
+            if key == 'set-cookie':
+                name, _, cookie_value = value.split(';', 1)[0].partition('=')
+                cookies[name.strip()] = cookie_value.strip().strip('"')
+        return cookies
+
+
+async def http_request(host, port, method, path, headers=None, body=b''):
+    """Hace una petición HTTP/1.1 con una conexión nueva y devuelve la Response"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", "Connection: close"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if body:
+            lines.append(f"Content-Length: {len(body)}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+        raw = await reader.read()
+    finally:
+        writer.close()
+    head, _, content = raw.partition(b"\r\n\r\n")
+    head_lines = head.decode('latin-1').split("\r\n")
+    status = int(head_lines[0].split()[1]) if head_lines and head_lines[0] else 0
+    response_headers = []
+    for line in head_lines[1:]:
+        name, _, value = line.partition(':')
+        response_headers.append((name.strip().lower(), value.strip()))
+    return Response(status, response_headers, content)
+
+
+class ClientSession:
+    """Usuario simulado: guarda sus cookies y envía el token CSRF en los POST"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.cookies = {}
+
+    async def request(self, method, path, data=None):
+        headers = {}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f"{name}={value}" for name, value in self.cookies.items())
+        body = b''
+        if method == 'POST':
+            body = urlencode(data or {}).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            if 'csrftoken' in self.cookies:
+                headers['X-CSRFToken'] = self.cookies['csrftoken']
+        response = await http_request(self.host, self.port, method, path, headers, body)
+        for name, value in response.cookies().items():
+            # Django borra una cookie enviándola vacía y caducada
+            if value:
+                self.cookies[name] = value
+            else:
+                self.cookies.pop(name, None)
+        return response
+
+    async def login(self, path, username, password):
+        await self.request('GET', path)
+        response = await self.request('POST', path, {'username': username, 'password': password})
+        return response.status == 302
+
+
+SERVER_TIMING_QUERIES_RE = re.compile(r'desc="(\d+) consultas"')
+
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class Recorder:
+    """
+    Latencias, errores y consultas SQL agrupados por nombre de URL.
+
+    Los formularios de la tienda también redirigen cuando fallan (sin stock,
+    carrito vacío): una redirección solo cuenta como éxito si va a la ruta
+    esperada (`expect_redirect`), y cualquier otra redirección es un error.
+    """
+
+    def __init__(self, resolve_name):
+        self.resolve_name = resolve_name
+        self.entries = {}
+        self.started_at = None
+        self.finished_at = None
+
+    def record(self, path, response, latency, expect_redirect=None):
+        name = self.resolve_name(urlsplit(path).path)
+        entry = self.entries.setdefault(name, {'latencies': [], 'errors': 0, 'queries': []})
+        if not is_success(response, expect_redirect):
+            entry['errors'] += 1
+            return
+        entry['latencies'].append(latency)
+        match = SERVER_TIMING_QUERIES_RE.search(response.header('server-timing') or '')
+        if match:
+            entry['queries'].append(int(match.group(1)))
+
+    async def timed(self, session, method, path, data=None, expect_redirect=None):
+        """Hace la petición con la sesión y la registra"""
+        start = time.perf_counter()
+        try:
+            response = await session.request(method, path, data)
+        except OSError:
+            response = None
+        self.record(path, response, time.perf_counter() - start, expect_redirect)
+        return response
+
+    def summary(self):
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        urls = {}
+        all_latencies = []
+        all_queries = []
+        errors = 0
+        for name, entry in sorted(self.entries.items()):
+            result = summarize(entry['latencies'], entry['errors'], elapsed)
+            queries = entry['queries']
+            result['queries_avg'] = sum(queries) / len(queries) if queries else None
+            result['queries_max'] = max(queries) if queries else None
+            urls[name] = result
+            all_latencies.extend(entry['latencies'])
+            all_queries.extend(queries)
+            errors += entry['errors']
+        total = summarize(all_latencies, errors, elapsed)
+        total['queries_avg'] = sum(all_queries) / len(all_queries) if all_queries else None
+        total['queries_max'] = max(all_queries) if all_queries else None
+        return {'total': total, 'urls': urls}
+
+
+def is_success(response, expect_redirect=None):
+    """Respuesta sin error y, si se espera una redirección, hacia `expect_redirect`"""
+    if response is None or response.status >= 400:
+        return False
+    if response.status in REDIRECT_STATUSES:
+        location = urlsplit(response.header('location') or '').path
+        return expect_redirect is not None and location == expect_redirect
+    return expect_redirect is None
+
+
+def percentile(sorted_values, pct):
+    """Percentil por el método del rango más cercano sobre valores ordenados"""
+    if not sorted_values:
+        return 0
+    index = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def summarize(latencies, errors, elapsed):
+    """Resumen de una serie de latencias (en segundos)"""
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed if elapsed else 0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': latencies[-1] * 1000 if latencies else 0,
+    }
+
+
+async def run_load(host, port, paths, concurrency, duration, headers=None, seed=0):
+    """
+    Lanza `concurrency` clientes que piden rutas de `paths` al azar durante
+    `duration` segundos. Las respuestas 4xx/5xx y los fallos de conexión
+    cuentan como errores.
+    """
+    rng = random.Random(seed)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            path = rng.choice(paths)
+            start = time.perf_counter()
+            try:
+                response = await http_request(host, port, 'GET', path, headers)
+            except OSError:
+                errors += 1
+                continue
+            if response.status >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """Arranca la aplicación en un servidor local ('wsgi' o 'asgi') mientras dura el bloque"""
+
+    def __init__(self, kind, port=None, startup_timeout=30):
+        self.kind = kind
+        self.host = '127.0.0.1'
+        self.port = port or free_port()
+        self.startup_timeout = startup_timeout
+        self.process = None
+
+    def __enter__(self):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+        self.process = subprocess.Popen(
+            SERVER_COMMANDS[self.kind](self.port),
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"El servidor {self.kind} terminó al arrancar")
+            try:
+                with socket.create_connection((self.host, self.port), timeout=0.5):
+                    return self
+            except OSError:
+                time.sleep(0.1)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"El servidor {self.kind} no respondió en {self.startup_timeout}s")
+
+    def __exit__(self, *exc_info):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
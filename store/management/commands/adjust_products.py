@@ -0,0 +1,77 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.models import PriceChangeBatch, Product
+from store.pricing import apply_adjustment, preview_adjustment, undo_adjustment
+
+
+class Command(BaseCommand):
+    help = "Ajusta precios o stock de un conjunto filtrado de productos con un único UPDATE"
+
+    def add_arguments(self, parser):
+        operation = parser.add_mutually_exclusive_group()
+        operation.add_argument('--percent', help="Cambio porcentual del precio de venta (ej. 10 o -5)")
+        operation.add_argument('--amount', help="Monto a sumar al precio de venta (puede ser negativo)")
+        operation.add_argument('--margin', help="Margen objetivo (%%) sobre el precio de compra")
+        operation.add_argument('--stock', help="Unidades a sumar al stock (puede ser negativo)")
+        operation.add_argument('--undo', type=int, metavar='ID', help="Deshacer el ajuste con este ID")
+
+        parser.add_argument('--category', help="Nombre de la categoría")
+        parser.add_argument('--currency', help="Código de la moneda")
+        parser.add_argument('--codes', help="Códigos de producto separados por coma")
+        parser.add_argument('--include-inactive', action='store_true')
+        parser.add_argument('--dry-run', action='store_true', help="Mostrar los cambios sin aplicarlos")
+
+    def handle(self, *args, **options):
+        if options['undo']:
+            batch = PriceChangeBatch.objects.filter(pk=options['undo']).first()
+            if batch is None:
+                raise CommandError(f"No existe el ajuste {options['undo']}")
+            if batch.undone_at:
+                raise CommandError(f"El ajuste {batch.pk} ya fue deshecho")
+            restored, skipped = undo_adjustment(batch)
+            if not batch.undone_at:
+                raise CommandError(f"El ajuste {batch.pk} ya fue deshecho")
+            self.stdout.write(self.style.SUCCESS(f"{restored} productos restaurados"))
+            if skipped:
+                self.stdout.write(self.style.WARNING(
+                    f"{skipped} productos omitidos: su precio cambió después del ajuste"
+                ))
+            return
+
+        operation = next(
+            (name for name in ('percent', 'amount', 'margin', 'stock') if options[name] is not None),
+            None,
+        )
+        if operation is None:
+            raise CommandError("Indique --percent, --amount, --margin, --stock o --undo")
+        try:
+            value = Decimal(options[operation])
+        except InvalidOperation:
+            raise CommandError(f"Valor inválido: {options[operation]}")
+        if operation == 'stock' and value != value.to_integral_value():
+            raise CommandError("El ajuste de stock debe ser un número entero")
+
+        products = Product.objects.all()
+        if not options['include_inactive']:
+            products = products.filter(is_active=True)
+        if options['category']:
+            products = products.filter(category__name=options['category'])
+        if options['currency']:
+            products = products.filter(currency__code=options['currency'].upper())
+        if options['codes']:
+            products = products.filter(code__in=[code.strip() for code in options['codes'].split(',')])
+
+        if options['dry_run']:
+            preview = preview_adjustment(products, operation, value, limit=20)
+            self.stdout.write(f"{preview['count']} productos afectados ({preview['field']})")
+            for row in preview['rows']:
+                self.stdout.write(f"  {row['code']:<20} {row['old_value']} -> {row['new_value']}")
+            return
+
+        batch = apply_adjustment(products, operation, value)
+        self.stdout.write(self.style.SUCCESS(
+            f"Ajuste #{batch.pk} aplicado a {batch.products_count} productos "
+            f"(deshacer con --undo {batch.pk})"
+        ))
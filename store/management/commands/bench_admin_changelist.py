@@ -0,0 +1,79 @@
+import secrets
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from store.models import Category, Currency, Product
+
+
+class Command(BaseCommand):
+    help = "Mide el tiempo de renderizado del listado de productos del admin según el tamaño del catálogo"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,10000,100000',
+            help="Tamaños de catálogo separados por coma"
+        )
+        parser.add_argument('--repeat', type=int, default=3, help="Repeticiones por tamaño")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        # Todo se ejecuta dentro de una transacción que se revierte al final
+        with transaction.atomic():
+            self._run(sizes, options['repeat'], options['batch_size'])
+            transaction.set_rollback(True)
+
+    def _run(self, sizes, repeat, batch_size):
+        currency = Currency.objects.create(code='BCH', name='Benchmark', symbol='B', exchange_rate=1)
+        category = Category.objects.create(name='Benchmark')
+        # Usuario desechable sin contraseña utilizable: solo entra con force_login
+        admin_user = User.objects.create_superuser(f"bench_admin_{secrets.token_hex(8)}", None, None)
+        client = Client()
+        client.force_login(admin_user)
+        try:
+            self._measure(client, currency, category, sizes, repeat, batch_size)
+        finally:
+            # Borra la sesión de la caché (no se revierte con la transacción) y el usuario
+            client.logout()
+            admin_user.delete()
+
+    def _measure(self, client, currency, category, sizes, repeat, batch_size):
+        self.stdout.write(f"{'productos':>10} {'mejor (ms)':>12} {'media (ms)':>12} {'consultas':>10}")
+        created = 0
+        for size in sizes:
+            while created < size:
+                count = min(batch_size, size - created)
+                Product.objects.bulk_create([
+                    Product(
+                        name=f"Producto {created + i}",
+                        description="Producto de prueba",
+                        code=f"BENCH-{created + i}",
+                        category=category,
+                        currency=currency,
+                        purchase_price=Decimal('10.00') + (created + i) % 50,
+                        sale_price=Decimal('15.00') + (created + i) % 70,
+                        stock=(created + i) % 20,
+                        min_stock=5,
+                    )
+                    for i in range(count)
+                ])
+                created += count
+
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = client.get('/admin/store/product/', HTTP_HOST='localhost')
+                    timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    self.stderr.write(f"Respuesta inesperada: {response.status_code}")
+                    return
+            self.stdout.write(
+                f"{size:>10} {min(timings):>12.1f} {sum(timings) / len(timings):>12.1f} {len(queries):>10}"
+            )
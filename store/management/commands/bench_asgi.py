@@ -0,0 +1,43 @@
+import asyncio
+import importlib.util
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.loadtest import LocalServer, run_load
+
+DEFAULT_PATHS = '/,/products/,/products/?search=ar,/products/autocomplete/?q=ar'
+
+
+class Command(BaseCommand):
+    help = "Compara latencia y concurrencia de las vistas del catálogo bajo WSGI y ASGI"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', default='wsgi,asgi', help="Servidores a medir separados por coma")
+        parser.add_argument('--concurrency', default='1,10,50', help="Clientes concurrentes separados por coma")
+        parser.add_argument('--duration', type=float, default=10, help="Segundos por medición")
+        parser.add_argument('--paths', default=DEFAULT_PATHS, help="Rutas a pedir separadas por coma")
+
+    def handle(self, *args, **options):
+        servers = options['servers'].split(',')
+        if 'asgi' in servers and importlib.util.find_spec('uvicorn') is None:
+            raise CommandError("La medición ASGI necesita el paquete uvicorn (pip install uvicorn)")
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        paths = options['paths'].split(',')
+
+        self.stdout.write(
+            f"{'servidor':>8} {'clientes':>8} {'pet/s':>8} {'p50 (ms)':>9} "
+            f"{'p95 (ms)':>9} {'p99 (ms)':>9} {'máx (ms)':>9} {'errores':>8}"
+        )
+        for kind in servers:
+            with LocalServer(kind) as server:
+                # Calentar cachés y conexiones antes de medir
+                asyncio.run(run_load(server.host, server.port, paths, 2, 1))
+                for level in levels:
+                    result = asyncio.run(
+                        run_load(server.host, server.port, paths, level, options['duration'])
+                    )
+                    self.stdout.write(
+                        f"{kind:>8} {level:>8} {result['rps']:>8.0f} {result['p50_ms']:>9.1f} "
+                        f"{result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['max_ms']:>9.1f} "
+                        f"{result['errors']:>8}"
+                    )
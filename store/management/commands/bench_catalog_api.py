@@ -0,0 +1,86 @@
+import gzip
+import json
+import time
+
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from store.api import PRODUCT_FIELDS, serialize_rows
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara formas de serializar productos a JSON (serializador de Django, "
+        "instancias, proyección values() de la API) en tiempo y tamaño"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help="Productos a serializar")
+        parser.add_argument('--repeat', type=int, default=5, help="Repeticiones por método")
+
+    def handle(self, *args, **options):
+        count = options['count']
+        ids = list(Product.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)[:count])
+        if len(ids) < count:
+            raise CommandError(
+                f"Solo hay {len(ids)} productos activos (ver generate_synthetic_data)"
+            )
+        last_id = ids[-1]
+        fields = list(PRODUCT_FIELDS)
+        products = Product.objects.filter(is_active=True, id__lte=last_id).order_by('id')
+
+        def django_serializer():
+            return serializers.serialize('json', products.all()).encode()
+
+        def instances():
+            rows = [
+                {
+                    'id': product.id,
+                    'code': product.code,
+                    'name': product.name,
+                    'description': product.description,
+                    'category': product.category_id,
+                    'currency': product.currency.code,
+                    'price': str(product.sale_price),
+                    'stock': product.stock,
+                    'featured': product.is_featured,
+                    'image': product.image.url if product.image else None,
+                    'updated_at': product.updated_at.isoformat(),
+                }
+                for product in products.select_related('currency')
+            ]
+            return json.dumps({'results': rows}, cls=DjangoJSONEncoder).encode()
+
+        def projection(selected):
+            def serialize():
+                columns = {PRODUCT_FIELDS[name][0] for name in selected} | {'id'}
+                rows = products.values(*sorted(columns))
+                data = {'results': serialize_rows(rows, selected, PRODUCT_FIELDS)}
+                return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+            return serialize
+
+        methods = [
+            ('serializers.serialize', django_serializer),
+            ('instancias + dict', instances),
+            ('values() todos los campos', projection(fields)),
+            ('values() id,name,price', projection(['id', 'name', 'price'])),
+        ]
+        self.stdout.write(
+            f"{count} productos, mejor de {options['repeat']}\n"
+            f"{'método':<28} {'ms':>8} {'consultas':>10} {'bytes':>10} {'gzip':>9}"
+        )
+        for name, method in methods:
+            timings = []
+            for _ in range(options['repeat']):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    body = method()
+                    timings.append((time.perf_counter() - start) * 1000)
+            compressed = len(gzip.compress(body, compresslevel=6))
+            self.stdout.write(
+                f"{name:<28} {min(timings):>8.1f} {len(queries):>10} {len(body):>10} {compressed:>9}"
+            )
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from store.models import Product
+
+# Configuración anterior (sesiones en la base, mensajes en cookie y sesión) frente a la actual
+CONFIGURATIONS = [
+    ('base de datos', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    }),
+    ('actual', {}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Cuenta las consultas SQL por petición (y cuántas van a django_session) de un "
+        "recorrido de un cliente con sesión, con sesiones en la base y con la configuración actual"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20, help="Repeticiones del recorrido")
+
+    def handle(self, *args, **options):
+        product = Product.objects.filter(is_active=True, stock__gt=0).order_by('id').first()
+        if product is None:
+            raise CommandError("No hay productos activos con stock (ver generate_synthetic_data)")
+
+        self.stdout.write(f"sesiones: {settings.SESSION_ENGINE}  mensajes: {settings.MESSAGE_STORAGE}\n")
+        self.stdout.write(
+            f"{'configuración':<16} {'peticiones':>10} {'consultas':>10} {'por pet.':>9} "
+            f"{'de sesión':>10} {'por pet.':>9}"
+        )
+        results = {}
+        # Todo se ejecuta dentro de una transacción que se revierte al final
+        with transaction.atomic():
+            user = User.objects.create_user('bench_sessions', password='bench')
+            for name, overrides in CONFIGURATIONS:
+                with override_settings(**overrides):
+                    results[name] = self.run(user, product, options['rounds'])
+                requests, queries, session_queries = results[name]
+                self.stdout.write(
+                    f"{name:<16} {requests:>10} {queries:>10} {queries / requests:>9.2f} "
+                    f"{session_queries:>10} {session_queries / requests:>9.2f}"
+                )
+            transaction.set_rollback(True)
+
+        before, after = results['base de datos'], results['actual']
+        saved = (before[1] - after[1]) / before[0]
+        self.stdout.write(self.style.SUCCESS(f"Consultas ahorradas por petición: {saved:.2f}"))
+
+    def run(self, user, product, rounds):
+        """Devuelve (peticiones, consultas, consultas a django_session) del recorrido"""
+        client = Client()
+        client.force_login(user)
+        requests = queries = session_queries = 0
+        steps = [
+            ('get', '/', None),
+            ('get', '/products/', None),
+            ('get', f'/product/{product.id}/', None),
+            ('post', f'/product/{product.id}/add-to-cart/', {'quantity': 1}),
+            ('get', '/cart/', None),
+            ('get', '/orders/', None),
+        ]
+        for _ in range(rounds):
+            for method, path, data in steps:
+                with CaptureQueriesContext(connection) as captured:
+                    response = getattr(client, method)(path, data, HTTP_HOST='localhost')
+                if response.status_code >= 400:
+                    raise CommandError(f"{method.upper()} {path}: respuesta {response.status_code}")
+                requests += 1
+                queries += len(captured)
+                session_queries += sum('django_session' in query['sql'] for query in captured)
+        client.logout()
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        return requests, queries, session_queries
@@ -0,0 +1,140 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Configuración anterior: diario de rollback, timeout por defecto de Django,
+# transacciones DEFERRED y una conexión nueva por petición
+BASELINE_PROFILE = {
+    'init_commands': ['PRAGMA journal_mode=DELETE'],
+    'timeout': 5,
+    'transaction_mode': None,
+    'persistent': False,
+}
+
+
+def tuned_profile():
+    """Perfil con las opciones de DATABASES['default'] de la configuración actual"""
+    database = settings.DATABASES['default']
+    options = database.get('OPTIONS', {})
+    return {
+        'init_commands': [
+            command.strip() for command in options.get('init_command', '').split(';') if command.strip()
+        ],
+        'timeout': options.get('timeout', 5),
+        'transaction_mode': options.get('transaction_mode'),
+        'persistent': bool(database.get('CONN_MAX_AGE')),
+    }
+
+
+def connect(path, profile):
+    # isolation_level=None: autocommit con BEGIN explícito, igual que Django
+    conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None)
+    for command in profile['init_commands']:
+        conn.execute(command)
+    return conn
+
+
+def create_database(path, products):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript(
+        "CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, price REAL, stock INTEGER);"
+        "CREATE INDEX product_name ON product (name);"
+        "CREATE TABLE sale (id INTEGER PRIMARY KEY, product_id INTEGER, quantity INTEGER, created REAL);"
+    )
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO product (name, price, stock) VALUES (?, ?, ?)",
+        ((f"Producto {i:06d}", 10 + i % 90, 1_000_000) for i in range(products)),
+    )
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def worker(path, profile, duration, write_ratio, products, seed):
+    """Simula peticiones: listados de productos (lectura) y checkouts (lectura y escritura)"""
+    rng = random.Random(seed)
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    write_latencies = []
+    conn = connect(path, profile) if profile['persistent'] else None
+    begin = f"BEGIN {profile['transaction_mode']}" if profile['transaction_mode'] else "BEGIN"
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        request_conn = conn or connect(path, profile)
+        is_write = rng.random() < write_ratio
+        start = time.perf_counter()
+        try:
+            if is_write:
+                product_id = rng.randint(1, products)
+                request_conn.execute(begin)
+                try:
+                    request_conn.execute("SELECT stock FROM product WHERE id = ?", (product_id,)).fetchone()
+                    request_conn.execute("UPDATE product SET stock = stock - 1 WHERE id = ?", (product_id,))
+                    request_conn.execute(
+                        "INSERT INTO sale (product_id, quantity, created) VALUES (?, 1, ?)",
+                        (product_id, time.time()),
+                    )
+                    request_conn.execute("COMMIT")
+                except sqlite3.OperationalError:
+                    request_conn.execute("ROLLBACK")
+                    raise
+                counts['writes'] += 1
+                write_latencies.append(time.perf_counter() - start)
+            else:
+                offset = rng.randint(0, max(products - 12, 0))
+                request_conn.execute(
+                    "SELECT id, name, price, stock FROM product ORDER BY name LIMIT 12 OFFSET ?", (offset,)
+                ).fetchall()
+                counts['reads'] += 1
+        except sqlite3.OperationalError:
+            counts['errors'] += 1
+        finally:
+            if conn is None:
+                request_conn.close()
+    if conn is not None:
+        conn.close()
+    return counts, write_latencies
+
+
+class Command(BaseCommand):
+    help = "Compara lecturas y escrituras concurrentes en SQLite con la configuración anterior y la actual"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8, help="Procesos concurrentes")
+        parser.add_argument('--duration', type=float, default=5, help="Segundos por configuración")
+        parser.add_argument('--write-ratio', type=float, default=0.2, help="Proporción de checkouts")
+        parser.add_argument('--products', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        profiles = [('anterior', BASELINE_PROFILE), ('actual', tuned_profile())]
+        self.stdout.write(
+            f"{'perfil':>10} {'lecturas/s':>11} {'escrituras/s':>13} {'errores':>8} {'p95 escritura (ms)':>19}"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for label, profile in profiles:
+                # Cada perfil usa una base nueva (journal_mode=WAL queda guardado en el archivo)
+                path = os.path.join(directory, f"{label}.sqlite3")
+                create_database(path, options['products'])
+                args = [
+                    (path, profile, options['duration'], options['write_ratio'], options['products'], seed)
+                    for seed in range(options['processes'])
+                ]
+                with multiprocessing.Pool(options['processes']) as pool:
+                    results = pool.starmap(worker, args)
+                totals = {'reads': 0, 'writes': 0, 'errors': 0}
+                latencies = []
+                for counts, write_latencies in results:
+                    for key, value in counts.items():
+                        totals[key] += value
+                    latencies.extend(write_latencies)
+                latencies.sort()
+                p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+                self.stdout.write(
+                    f"{label:>10} {totals['reads'] / options['duration']:>11.0f} "
+                    f"{totals['writes'] / options['duration']:>13.0f} {totals['errors']:>8} {p95:>19.1f}"
+                )
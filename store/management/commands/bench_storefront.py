@@ -0,0 +1,259 @@
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from store.loadtest import ClientSession, LocalServer, Recorder
+from store.models import Product
+
+LOGIN_PATH = '/accounts/login/'
+BENCH_PASSWORD = 'bench-password'
+
+# Peso de cada escenario en la mezcla de trabajo
+SCENARIO_WEIGHTS = {
+    'browse': 50,
+    'search': 20,
+    'add_to_cart': 15,
+    'order_list': 10,
+    'checkout': 5,
+}
+
+
+def url_name(path):
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return 'unresolved'
+    return match.view_name
+
+
+class Workload:
+    """Datos de catálogo y escenarios que ejecuta cada usuario simulado"""
+
+    def __init__(self, product_ids, search_terms, pages):
+        self.product_ids = product_ids
+        self.search_terms = search_terms
+        self.pages = pages
+
+    async def browse(self, session, recorder, rng):
+        await recorder.timed(session, 'GET', '/')
+        await recorder.timed(session, 'GET', f'/products/?page={rng.randint(1, self.pages)}')
+        await recorder.timed(session, 'GET', f'/product/{rng.choice(self.product_ids)}/')
+
+    async def search(self, session, recorder, rng):
+        term = rng.choice(self.search_terms)
+        await recorder.timed(session, 'GET', f'/products/?search={term}')
+        await recorder.timed(session, 'GET', f'/products/autocomplete/?q={term[:3]}')
+
+    async def add_to_cart(self, session, recorder, rng):
+        product_id = rng.choice(self.product_ids)
+        await recorder.timed(
+            session, 'POST', f'/product/{product_id}/add-to-cart/', {'quantity': 1}, expect_redirect='/cart/',
+        )
+        await recorder.timed(session, 'GET', '/cart/')
+
+    async def order_list(self, session, recorder, rng):
+        await recorder.timed(session, 'GET', '/orders/')
+
+    async def checkout(self, session, recorder, rng):
+        await self.add_to_cart(session, recorder, rng)
+        await recorder.timed(session, 'GET', '/checkout/')
+        # Con éxito muestra la página de la orden; si falla redirige al carrito
+        await recorder.timed(session, 'POST', '/checkout/', {
+            'delivery_type': 'pickup',
+            'phone': '5350000000',
+            'notes': 'Prueba de carga',
+        })
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de la tienda con una mezcla de escenarios (navegar, buscar, "
+        "carrito, checkout, órdenes) bajo WSGI y ASGI, con resultados en JSON. Trabaja "
+        "sobre una copia de la base: crea usuarios, órdenes y ventas y descuenta stock"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database-file', required=True,
+            help="Archivo nuevo donde copiar la base principal; la prueba solo escribe en la copia",
+        )
+        parser.add_argument('--servers', default='wsgi,asgi', help="Servidores a medir separados por coma")
+        parser.add_argument('--concurrency', type=int, default=20, help="Usuarios simulados")
+        parser.add_argument('--duration', type=float, default=30, help="Segundos por servidor")
+        parser.add_argument('--seed', type=int, default=1, help="Semilla de la mezcla de trabajo")
+        parser.add_argument(
+            '--output',
+            help="Archivo JSON de resultados (por defecto bench_results/storefront-<commit>.json)",
+        )
+        parser.add_argument('--compare', help="JSON de una ejecución anterior para comparar")
+
+    def handle(self, *args, **options):
+        servers = options['servers'].split(',')
+        if 'asgi' in servers and importlib.util.find_spec('uvicorn') is None:
+            raise CommandError("La medición ASGI necesita el paquete uvicorn (pip install uvicorn)")
+        database_file = self.use_database_copy(options['database_file'])
+        workload = self.prepare_workload()
+        usernames = self.prepare_users(options['concurrency'])
+
+        results = {
+            'commit': self.git_commit(),
+            'created_at': timezone.now().isoformat(),
+            'settings': settings.SETTINGS_MODULE,
+            'concurrency': options['concurrency'],
+            'duration': options['duration'],
+            'seed': options['seed'],
+            'weights': SCENARIO_WEIGHTS,
+            'servers': {},
+        }
+        for kind in servers:
+            with LocalServer(kind) as server:
+                summary = asyncio.run(self.run(server, workload, usernames, options))
+            results['servers'][kind] = summary
+            self.print_summary(kind, summary)
+
+        output = Path(options['output'] or settings.BASE_DIR / 'bench_results' / f"storefront-{results['commit']}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {output}"))
+        self.stdout.write(f"La copia de la base ({database_file}) ya no se usa y se puede borrar")
+
+        if options['compare']:
+            self.compare(json.loads(Path(options['compare']).read_text()), results)
+
+    def use_database_copy(self, path):
+        """
+        Copia la base principal a `path` y apunta a la copia este proceso y
+        los servidores que arranca, sin réplicas: la base configurada no se toca.
+        """
+        database = connections['default'].settings_dict
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("La copia de la base solo funciona con SQLite")
+        target = Path(path).resolve()
+        configured = {Path(connections[alias].settings_dict['NAME']).resolve() for alias in connections}
+        if target in configured:
+            raise CommandError(f"{target} es una base configurada: indique un archivo nuevo para la copia")
+        if target.exists():
+            raise CommandError(f"{target} ya existe: bórrelo o indique otro archivo")
+
+        source = sqlite3.connect(database['NAME'], timeout=database.get('OPTIONS', {}).get('timeout', 5))
+        copy = sqlite3.connect(target)
+        try:
+            source.backup(copy)
+        finally:
+            copy.close()
+            source.close()
+
+        connections['default'].close()
+        database['NAME'] = str(target)
+        os.environ['DATABASE_FILE'] = str(target)
+        os.environ['DATABASE_REPLICAS'] = '0'
+        return target
+
+    def prepare_workload(self):
+        products = list(
+            Product.objects.filter(is_active=True, stock__gt=0)
+            .order_by('id')
+            .values_list('id', 'name')[:1000]
+        )
+        if not products:
+            raise CommandError("No hay productos activos con stock (ver create_sample_data.py)")
+        terms = sorted({name.split()[0].lower() for _, name in products if name.split()})
+        pages = max((Product.objects.filter(is_active=True).count() + 11) // 12, 1)
+        return Workload([pk for pk, _ in products], terms or ['a'], min(pages, 50))
+
+    def prepare_users(self, count):
+        """Crea en la copia de la base los usuarios de la prueba con la misma contraseña"""
+        usernames = [f"bench_user_{i}" for i in range(count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        password = make_password(BENCH_PASSWORD)
+        User.objects.bulk_create([
+            User(username=username, password=password)
+            for username in usernames if username not in existing
+        ])
+        return usernames
+
+    async def run(self, server, workload, usernames, options):
+        recorder = Recorder(url_name)
+        sessions = []
+        # El login no se mide: el hash de la contraseña dominaría los resultados
+        for username in usernames:
+            session = ClientSession(server.host, server.port)
+            if not await session.login(LOGIN_PATH, username, BENCH_PASSWORD):
+                raise CommandError(f"No se pudo iniciar sesión como {username}")
+            sessions.append(session)
+
+        scenarios = list(SCENARIO_WEIGHTS)
+        weights = [SCENARIO_WEIGHTS[name] for name in scenarios]
+        deadline = time.perf_counter() + options['duration']
+
+        async def user(index, session):
+            rng = random.Random(options['seed'] * 1000 + index)
+            while time.perf_counter() < deadline:
+                scenario = rng.choices(scenarios, weights)[0]
+                await getattr(workload, scenario)(session, recorder, rng)
+
+        recorder.started_at = time.perf_counter()
+        await asyncio.gather(*(user(index, session) for index, session in enumerate(sessions)))
+        recorder.finished_at = time.perf_counter()
+        return recorder.summary()
+
+    def print_summary(self, kind, summary):
+        self.stdout.write(f"\n{kind.upper()}")
+        self.stdout.write(
+            f"{'url':<28} {'pet':>6} {'pet/s':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'consultas':>9} {'errores':>8}"
+        )
+        rows = list(summary['urls'].items()) + [('TOTAL', summary['total'])]
+        for name, result in rows:
+            queries = result.get('queries_avg')
+            self.stdout.write(
+                f"{name:<28} {result['requests']:>6} {result['rps']:>7.1f} {result['p50_ms']:>7.1f} "
+                f"{result['p95_ms']:>7.1f} {result['p99_ms']:>7.1f} "
+                f"{queries if queries is not None else 0:>9.1f} {result['errors']:>8}"
+            )
+
+    def compare(self, previous, current):
+        """Variación de p95 y peticiones por segundo respecto a otra ejecución"""
+        self.stdout.write(f"\nComparación con {previous.get('commit')} (negativo en p95 = mejora)")
+        for kind, summary in current['servers'].items():
+            before = previous.get('servers', {}).get(kind)
+            if not before:
+                continue
+            self.stdout.write(f"{kind.upper()}")
+            rows = [('TOTAL', summary['total'], before['total'])] + [
+                (name, result, before['urls'][name])
+                for name, result in summary['urls'].items() if name in before['urls']
+            ]
+            for name, now, then in rows:
+                self.stdout.write(
+                    f"  {name:<28} p95 {_change(then['p95_ms'], now['p95_ms']):>8} "
+                    f"pet/s {_change(then['rps'], now['rps']):>8}"
+                )
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return 'desconocido'
+
+
+def _change(before, after):
+    if not before:
+        return 'n/d'
+    return f"{(after - before) / before * 100:+.1f}%"
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from store.lite import page_weight
+
+
+class Command(BaseCommand):
+    help = (
+        "Informa el peso (HTML y recursos) de las páginas de la tienda en modo ligero y "
+        "completo, y falla si el modo ligero supera LITE_PAGE_BUDGETS"
+    )
+
+    def handle(self, *args, **options):
+        budgets = getattr(settings, 'LITE_PAGE_BUDGETS', {})
+        if not budgets:
+            raise CommandError("No hay presupuestos definidos en LITE_PAGE_BUDGETS")
+        client = Client()
+        failures = []
+        self.stdout.write(
+            f"{'página':<16} {'modo':<9} {'html':>9} {'html gz':>9} {'recursos':>9} {'total':>9} {'presupuesto':>12}"
+        )
+        for url_name, budget in budgets.items():
+            for mode, query in (('ligero', '?lite=1'), ('completo', '?lite=0')):
+                response = client.get(reverse(url_name) + query, HTTP_HOST='localhost')
+                if response.status_code != 200:
+                    raise CommandError(f"{url_name}: respuesta {response.status_code}")
+                weight = page_weight(response.content)
+                total, external = weight['total'], weight['external']
+                row = (
+                    f"{url_name:<16} {mode:<9} {weight['html']:>9} {weight['html_gzip']:>9} "
+                    f"{weight['resources']:>9} {total:>9}"
+                )
+                if mode == 'ligero':
+                    self.stdout.write(f"{row} {budget:>12}")
+                    if total > budget:
+                        failures.append(f"{url_name} pesa {total} bytes (presupuesto {budget})")
+                    if external:
+                        failures.append(f"{url_name} carga recursos externos: {', '.join(external)}")
+                else:
+                    extra = f" + {len(external)} externos" if external else ''
+                    self.stdout.write(f"{row} {'-':>12}{extra}")
+        if failures:
+            raise CommandError("Presupuesto de peso superado:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("Las páginas en modo ligero están dentro del presupuesto"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from store.models import CatalogChange
+
+
+class Command(BaseCommand):
+    help = (
+        "Compacta el registro de cambios del catálogo dejando solo la última entrada "
+        "de cada objeto (la sincronización siempre envía el estado actual)"
+    )
+
+    def handle(self, *args, **options):
+        deleted = CatalogChange.compact()
+        remaining = CatalogChange.objects.count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Entradas borradas: {deleted}. Quedan {remaining} (una por objeto)"
+        ))
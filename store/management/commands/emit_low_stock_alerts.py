@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from store.models import LowStockAlert
+from store.reports import replenishment_report
+
+
+class Command(BaseCommand):
+    help = "Genera alertas de stock bajo y muestra el reporte de reposición"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--report', action='store_true', help="Mostrar el reporte de reposición")
+        parser.add_argument('--days', type=int, default=30, help="Días de ventas para calcular la velocidad")
+        parser.add_argument('--lead-days', type=int, default=7, help="Días de cobertura a reponer")
+        parser.add_argument('--limit', type=int, default=50)
+
+    def handle(self, *args, **options):
+        created, resolved = LowStockAlert.emit()
+        self.stdout.write(self.style.SUCCESS(f"{created} alertas nuevas, {resolved} alertas resueltas"))
+
+        if options['report']:
+            self.stdout.write(f"{'código':<15} {'producto':<40} {'stock':>6} {'mín':>5} {'vend.':>6} {'/día':>6} {'pedir':>6}")
+            for row in replenishment_report(options['days'], options['lead_days'], options['limit']):
+                product = row['product']
+                self.stdout.write(
+                    f"{product.code:<15} {product.name[:40]:<40} {product.stock:>6} {product.min_stock:>5} "
+                    f"{row['units_sold']:>6} {row['velocity']:>6} {row['suggested_quantity']:>6}"
+                )
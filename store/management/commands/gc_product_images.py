@@ -0,0 +1,132 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from store.images import RENDITION_DIR
+from store.models import ImageBlob, Product
+from store.storage import BLOB_DIR, blob_digest, product_image_storage
+
+
+class Command(BaseCommand):
+    help = "Recalcula las referencias de las imágenes de productos y borra los archivos sin usar"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Mostrar lo que se borraría sin borrar nada")
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help="Horas que debe tener un archivo sin referencias antes de borrarlo (por defecto 24)",
+        )
+        parser.add_argument(
+            '--adopt', action='store_true',
+            help="Mover primero las imágenes antiguas (fuera de %s) al almacenamiento por contenido" % BLOB_DIR,
+        )
+
+    def handle(self, *args, **options):
+        self.storage = product_image_storage()
+        self.dry_run = options['dry_run']
+        if options['adopt']:
+            self.adopt()
+        references = self.recount()
+        removed, freed = self.sweep(references, time.time() - options['min_age'] * 3600)
+        prefix = "[simulación] " if self.dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{len(references)} archivos en uso, {removed} borrados ({freed / 1024:.0f} KB liberados)"
+        ))
+
+    def adopt(self):
+        """Guarda por contenido las imágenes subidas antes de este almacenamiento"""
+        legacy = (
+            Product.objects
+            .exclude(image='').exclude(image__isnull=True)
+            .exclude(image__startswith=BLOB_DIR + '/')
+            .values_list('id', 'image', 'image_renditions')
+        )
+        adopted = 0
+        for product_id, name, renditions in legacy.iterator():
+            if not self.storage.exists(name):
+                self.stderr.write(f"  Falta el archivo {name} (producto {product_id})")
+                continue
+            if self.dry_run:
+                adopted += 1
+                continue
+            with self.storage.open(name, 'rb') as source:
+                blob_name = self.storage.save(name, source)
+            if renditions and renditions.get('source') == name:
+                renditions['source'] = blob_name
+            # update() evita volver a disparar Product.save()
+            Product.objects.filter(pk=product_id, image=name).update(image=blob_name, image_renditions=renditions)
+            if not Product.objects.filter(image=name).exists():
+                self.storage.delete(name)
+            adopted += 1
+        self.stdout.write(f"{adopted} imágenes antiguas movidas al almacenamiento por contenido")
+
+    def recount(self):
+        """Ajusta ImageBlob.ref_count a los productos que realmente usan cada archivo"""
+        references = dict(
+            Product.objects
+            .filter(image__startswith=BLOB_DIR + '/')
+            .values('image')
+            .annotate(count=Count('id'))
+            .order_by()
+            .values_list('image', 'count')
+        )
+        known = dict(ImageBlob.objects.values_list('name', 'ref_count'))
+        fixed = 0
+        for name, count in known.items():
+            if references.get(name, 0) != count:
+                fixed += 1
+                if not self.dry_run:
+                    ImageBlob.objects.filter(name=name).update(ref_count=references.get(name, 0))
+        missing = [name for name in references if name not in known]
+        if missing and not self.dry_run:
+            blobs = []
+            for name in missing:
+                try:
+                    size = self.storage.size(name)
+                except OSError:
+                    size = None
+                blobs.append(ImageBlob(name=name, size=size, ref_count=references[name]))
+            ImageBlob.objects.bulk_create(blobs, ignore_conflicts=True)
+        if fixed or missing:
+            self.stdout.write(f"{fixed} contadores corregidos, {len(missing)} archivos registrados")
+        return references
+
+    def sweep(self, references, cutoff):
+        """Borra los archivos de BLOB_DIR sin referencias y anteriores a `cutoff`"""
+        root = self.storage.path(BLOB_DIR)
+        renditions = self.rendition_index()
+        used_digests = {blob_digest(name)[:20] for name in references}
+        removed = freed = 0
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.storage.location).replace(os.sep, '/')
+                if name in references or os.path.getmtime(path) > cutoff:
+                    continue
+                freed += os.path.getsize(path)
+                removed += 1
+                if self.dry_run:
+                    continue
+                os.remove(path)
+                if filename.endswith('.part'):
+                    continue
+                ImageBlob.objects.filter(name=name).delete()
+                # Las versiones redimensionadas se nombran con el hash del original
+                digest = blob_digest(name)[:20]
+                if digest in used_digests:
+                    continue
+                for rendition in renditions.get(digest, []):
+                    default_storage.delete(rendition)
+        return removed, freed
+
+    def rendition_index(self):
+        """Versiones redimensionadas agrupadas por el hash de su imagen original"""
+        if not default_storage.exists(RENDITION_DIR):
+            return {}
+        index = {}
+        for filename in default_storage.listdir(RENDITION_DIR)[1]:
+            index.setdefault(filename.split('-', 1)[0], []).append(f"{RENDITION_DIR}/{filename}")
+        return index
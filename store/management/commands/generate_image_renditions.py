@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from store.images import generate_renditions
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = "Genera las versiones redimensionadas (JPEG/WebP) de las imágenes de productos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Regenerar también las que ya existen")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True)
+        generated = 0
+        for product_id, image, renditions in products.values_list('id', 'image', 'image_renditions').iterator():
+            if not options['all'] and renditions and renditions.get('source') == image:
+                continue
+            if generate_renditions(product_id):
+                generated += 1
+        self.stdout.write(self.style.SUCCESS(f"{generated} imágenes procesadas"))
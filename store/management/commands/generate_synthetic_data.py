@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.synthetic import (
+    DEFAULT_CHUNK_SIZE, SYNTHETIC_PASSWORD, USERNAME_PREFIX, SyntheticDataError,
+    SyntheticDataGenerator, delete_synthetic_data, has_synthetic_data,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos reproducibles (productos, usuarios, carritos y órdenes) "
+        "con popularidad Zipf, varias monedas y tamaños de orden realistas"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help="Semilla (misma semilla, mismos datos)")
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=20000)
+        parser.add_argument(
+            '--carts', type=float, default=0.2,
+            help="Fracción de usuarios con un carrito abierto (por defecto 0.2)"
+        )
+        parser.add_argument('--days', type=int, default=365, help="Días de historial de órdenes")
+        parser.add_argument('--zipf', type=float, default=1.1, help="Exponente de la popularidad de Zipf")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            '--reset', action='store_true',
+            help="Borra antes los datos sintéticos de una ejecución anterior"
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size debe ser mayor que cero")
+        if not 0 <= options['carts'] <= 1:
+            raise CommandError("--carts debe estar entre 0 y 1")
+
+        if options['reset']:
+            try:
+                deleted, days = delete_synthetic_data()
+            except SyntheticDataError as e:
+                raise CommandError(str(e))
+            summary = ', '.join(f"{count} {name}" for name, count in deleted.items() if count)
+            self.stdout.write(f"Datos sintéticos anteriores borrados: {summary or 'ninguno'}")
+            if days:
+                self.stdout.write(f"Resúmenes de ventas recalculados para {days} días")
+        elif has_synthetic_data():
+            raise CommandError("Ya hay datos sintéticos; use --reset para regenerarlos")
+
+        def progress(report):
+            self.stdout.write(f"  {report}")
+
+        generator = SyntheticDataGenerator(
+            seed=options['seed'],
+            products=options['products'],
+            users=options['users'],
+            orders=options['orders'],
+            carts=options['carts'],
+            days=options['days'],
+            zipf=options['zipf'],
+            chunk_size=options['chunk_size'],
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+        report = generator.run()
+        self.stdout.write(self.style.SUCCESS(f"Datos generados: {report}"))
+        self.stdout.write(
+            f"Usuarios {USERNAME_PREFIX}<n> con contraseña '{SYNTHETIC_PASSWORD}'. "
+            "Ejecute rebuild_sales_rollups --days 365 para los informes de ventas."
+        )
@@ -0,0 +1,52 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.importers import DEFAULT_CHUNK_SIZE, ImportFileError, ProductImporter
+
+
+class Command(BaseCommand):
+    help = "Importa productos desde un archivo CSV o JSON Lines (crea o actualiza por código)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Archivo a importar")
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help="Formato del archivo (por defecto según la extensión)"
+        )
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            '--errors', default=None,
+            help="Archivo CSV donde escribir las filas rechazadas"
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        errors_path = options['errors'] or f"{path}.errores.csv"
+
+        def progress(report):
+            self.stdout.write(f"  {report}")
+
+        try:
+            source = open(path, newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir {path}: {e}")
+
+        try:
+            with source, open(errors_path, 'w', newline='', encoding='utf-8') as error_stream:
+                importer = ProductImporter(
+                    chunk_size=options['chunk_size'],
+                    error_stream=error_stream,
+                    progress=progress,
+                )
+                report = importer.run(source, file_format)
+        except ImportFileError as e:
+            os.remove(errors_path)
+            raise CommandError(f"Importación interrumpida: {e}. Aplicado hasta entonces: {e.report}")
+
+        self.stdout.write(self.style.SUCCESS(f"Importación completada: {report}"))
+        if report.rejected:
+            self.stdout.write(self.style.WARNING(f"Filas rechazadas guardadas en {errors_path}"))
+        else:
+            os.remove(errors_path)
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from store.reports import rebuild_sales
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Fecha inválida '{value}', use AAAA-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Recalcula las tablas de ventas diarias (DailySales/DailyProductSales) a partir de las órdenes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=2,
+            help="Número de días hacia atrás a recalcular, incluido hoy (por defecto 2)"
+        )
+        parser.add_argument('--since', help="Fecha inicial (AAAA-MM-DD), ignora --days")
+        parser.add_argument('--until', help="Fecha final incluida (AAAA-MM-DD), por defecto hoy")
+
+    def handle(self, *args, **options):
+        until = parse_date(options['until']) if options['until'] else timezone.localdate()
+        if options['since']:
+            since = parse_date(options['since'])
+        else:
+            since = until - timedelta(days=options['days'] - 1)
+        if since > until:
+            raise CommandError("La fecha inicial es posterior a la final")
+
+        day = since
+        while day <= until:
+            rows = rebuild_sales(day)
+            self.stdout.write(f"{day}: {rows} productos")
+            day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS("Resúmenes de ventas actualizados"))
@@ -0,0 +1,52 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = "Copia la base principal SQLite a las réplicas de lectura con la API de backup"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help="Repetir cada N segundos (por defecto una sola copia)",
+        )
+        parser.add_argument(
+            '--pages', type=int, default=1024,
+            help="Páginas copiadas por paso (entre pasos la principal queda libre para escribir)",
+        )
+
+    def handle(self, *args, **options):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            raise CommandError("No hay réplicas configuradas (variable de entorno DATABASE_REPLICAS)")
+        primary = connections['default'].settings_dict
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("La replicación por backup solo funciona con SQLite")
+
+        while True:
+            for alias in replicas:
+                start = time.perf_counter()
+                self.replicate(primary, connections[alias].settings_dict, options['pages'])
+                self.stdout.write(f"{alias}: copiada en {(time.perf_counter() - start) * 1000:.0f} ms")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def replicate(self, primary, replica, pages):
+        """
+        Copia por páginas a la réplica en uso. La réplica se escribe en una
+        sola transacción: sus lectores ven la copia anterior o la nueva, nunca
+        una a medias.
+        """
+        timeout = primary.get('OPTIONS', {}).get('timeout', 5)
+        source = sqlite3.connect(primary['NAME'], timeout=timeout)
+        target = sqlite3.connect(replica['NAME'], timeout=timeout)
+        try:
+            source.backup(target, pages=pages)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,45 @@
+import posixpath
+import re
+from pathlib import Path
+from urllib.parse import urljoin
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+CSS_URL_RE = re.compile(r"url\(['\"]?(?!data:)([^'\")?#]+)")
+
+
+class Command(BaseCommand):
+    help = "Descarga las librerías de VENDOR_ASSETS (y las fuentes que referencian) a static/"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Descargar aunque ya existan")
+        parser.add_argument('--timeout', type=int, default=30)
+
+    def handle(self, *args, **options):
+        target_dir = Path(settings.STATICFILES_DIRS[0])
+        for name, (local_path, cdn_url) in settings.VENDOR_ASSETS.items():
+            content = self.fetch(cdn_url, target_dir / local_path, options)
+            if local_path.endswith('.css'):
+                # Descargar también las fuentes e imágenes referenciadas por el CSS
+                for reference in sorted(set(CSS_URL_RE.findall(content.decode('utf-8')))):
+                    self.fetch(
+                        urljoin(cdn_url, reference),
+                        target_dir / posixpath.normpath(posixpath.join(posixpath.dirname(local_path), reference)),
+                        options,
+                    )
+        self.stdout.write(self.style.SUCCESS(f"Librerías copiadas en {target_dir / 'vendor'}"))
+
+    def fetch(self, url, path, options):
+        if path.exists() and not options['force']:
+            return path.read_bytes()
+        self.stdout.write(f"  {url}")
+        try:
+            with urlopen(url, timeout=options['timeout']) as response:
+                content = response.read()
+        except OSError as e:
+            raise CommandError(f"No se pudo descargar {url}: {e}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        return content
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill_currency_totals(apps, schema_editor):
+    """Genera el desglose por moneda de las órdenes existentes a partir de sus items"""
+    Currency = apps.get_model('store', 'Currency')
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    OrderCurrencyTotal = apps.get_model('store', 'OrderCurrencyTotal')
+
+    default_currency = Currency.objects.filter(is_default=True).first() or Currency.objects.first()
+    if default_currency is None:
+        return
+
+    currencies = Currency.objects.in_bulk()
+    created_at = dict(Order.objects.values_list('id', 'created_at'))
+    rows = (
+        OrderItem.objects
+        .values('order_id', 'product__currency_id')
+        .annotate(amount=Sum(F('quantity') * F('price')))
+        .order_by()
+    )
+    totals = []
+    for row in rows.iterator(chunk_size=2000):
+        currency = currencies[row['product__currency_id']]
+        amount = row['amount'] or Decimal('0')
+        settlement_amount = amount
+        if currency.pk != default_currency.pk and currency.exchange_rate > 0 and default_currency.exchange_rate > 0:
+            settlement_amount = amount * currency.exchange_rate / default_currency.exchange_rate
+        totals.append(OrderCurrencyTotal(
+            order_id=row['order_id'],
+            currency_id=currency.pk,
+            amount=amount,
+            settlement_amount=settlement_amount.quantize(Decimal('0.01')),
+            created_at=created_at[row['order_id']],
+        ))
+    OrderCurrencyTotal.objects.bulk_create(totals, batch_size=2000)
+    Order.objects.filter(settlement_currency__isnull=True).update(settlement_currency=default_currency)
+
+
+def reverse_func(apps, schema_editor):
+    """Función de reversión (la tabla se elimina con el modelo)"""
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_order_delivery_type_order_whatsapp_message_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='settlement_currency',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='store.currency', verbose_name='Moneda de Liquidación'),
+        ),
+        migrations.CreateModel(
+            name='OrderCurrencyTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Monto')),
+                ('settlement_amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Monto Liquidado')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('currency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.currency', verbose_name='Moneda')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='currency_totals', to='store.order', verbose_name='Orden')),
+            ],
+            options={
+                'verbose_name': 'Total por Moneda',
+                'verbose_name_plural': 'Totales por Moneda',
+                'indexes': [models.Index(fields=['currency', 'created_at'], name='store_octotal_cur_date_idx')],
+                'unique_together': {('order', 'currency')},
+            },
+        ),
+        migrations.RunPython(backfill_currency_totals, reverse_func),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_daily_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField(verbose_name='Stock al Alertar')),
+                ('min_stock', models.PositiveIntegerField(verbose_name='Stock Mínimo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creada')),
+                ('resolved_at', models.DateTimeField(blank=True, null=True, verbose_name='Resuelta')),
+            ],
+            options={
+                'verbose_name': 'Alerta de Stock Bajo',
+                'verbose_name_plural': 'Alertas de Stock Bajo',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='low_stock',
+            field=models.GeneratedField(db_persist=True, expression=models.Q(('stock__lte', models.F('min_stock'))), output_field=models.BooleanField(), verbose_name='Stock Bajo'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('low_stock', True)), fields=['is_active'], name='store_product_low_stock_idx'),
+        ),
+        migrations.AddField(
+            model_name='lowstockalert',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.product', verbose_name='Producto'),
+        ),
+        migrations.AddConstraint(
+            model_name='lowstockalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('resolved_at__isnull', True)), fields=('product',), name='store_lowstockalert_one_open'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_low_stock_alerts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceChangeBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(choices=[('percent', 'Porcentaje sobre el precio de venta'), ('amount', 'Monto fijo sobre el precio de venta'), ('margin', 'Margen objetivo sobre el precio de compra'), ('stock', 'Ajuste de stock')], max_length=10, verbose_name='Operación')),
+                ('value', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Valor')),
+                ('products_count', models.PositiveIntegerField(default=0, verbose_name='Productos')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('undone_at', models.DateTimeField(blank=True, null=True, verbose_name='Deshecho')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Ajuste Masivo',
+                'verbose_name_plural': 'Ajustes Masivos',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceChangeSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sale_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Precio de Venta')),
+                ('stock', models.PositiveIntegerField(verbose_name='Stock')),
+                ('new_sale_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Precio de Venta Nuevo')),
+                ('new_stock', models.PositiveIntegerField(blank=True, null=True, verbose_name='Stock Nuevo')),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='store.pricechangebatch', verbose_name='Ajuste')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Valor Anterior',
+                'verbose_name_plural': 'Valores Anteriores',
+                'unique_together': {('batch', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# Tabla -> (tipo de cambio, columnas cuyo cambio interesa a los clientes)
+TRACKED_TABLES = {
+    'store_product': ('product', [
+        'name', 'code', 'description', 'category_id', 'currency_id', 'sale_price',
+        'stock', 'is_active', 'is_featured', 'image',
+    ]),
+    'store_category': ('category', ['name', 'description']),
+    'store_currency': ('currency', ['code', 'name', 'symbol', 'exchange_rate', 'is_active', 'is_default']),
+}
+
+LOG_ROW = "INSERT INTO store_catalogchange (kind, object_id, changed_at) VALUES ('{kind}', {row}.id, strftime('%Y-%m-%d %H:%M:%f', 'now'))"
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, (kind, columns) in TRACKED_TABLES.items():
+        changed = ' OR '.join(f"OLD.{column} IS NOT NEW.{column}" for column in columns)
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_change_insert AFTER INSERT ON {table} "
+            f"BEGIN {LOG_ROW.format(kind=kind, row='NEW')}; END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_change_update AFTER UPDATE ON {table} WHEN {changed} "
+            f"BEGIN {LOG_ROW.format(kind=kind, row='NEW')}; END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_change_delete AFTER DELETE ON {table} "
+            f"BEGIN {LOG_ROW.format(kind=kind, row='OLD')}; END"
+        )
+        # Una entrada por fila existente: sincronizar desde 0 es una descarga completa
+        schema_editor.execute(
+            f"INSERT INTO store_catalogchange (kind, object_id, changed_at) "
+            f"SELECT '{kind}', id, strftime('%Y-%m-%d %H:%M:%f', 'now') FROM {table} ORDER BY id"
+        )
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in TRACKED_TABLES:
+        for event in ('insert', 'update', 'delete'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_change_{event}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_image_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Producto'), ('category', 'Categoría'), ('currency', 'Moneda')], max_length=10, verbose_name='Tipo')),
+                ('object_id', models.BigIntegerField(verbose_name='ID del Objeto')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+            ],
+            options={
+                'verbose_name': 'Cambio del Catálogo',
+                'verbose_name_plural': 'Cambios del Catálogo',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['kind', 'object_id', 'id'], name='store_catchange_object_idx')],
+            },
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_unit_cost(apps, schema_editor):
+    """Los items existentes toman el precio de compra actual: es el mejor dato disponible"""
+    OrderItem = apps.get_model('store', 'OrderItem')
+    Product = apps.get_model('store', 'Product')
+    OrderItem.objects.using(schema_editor.connection.alias).update(
+        unit_cost=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('purchase_price')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_request_profiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_cost',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True, verbose_name='Costo Unitario'),
+        ),
+        migrations.RunPython(backfill_unit_cost, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='unit_cost',
+            field=models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Costo Unitario'),
+        ),
+    ]
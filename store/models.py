@@ -1,11 +1,75 @@
-from django.db import models
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, models, transaction
+from django.db.models import (
+    BooleanField, Case, CharField, DecimalField, F, FloatField, Q, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Round
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from django.contrib.auth.models import User
 from decimal import Decimal
 
+from .cache import reference_cache
+from .storage import is_blob, product_image_storage
+
+# Imagen por defecto en línea (SVG 300x200) para no depender de un servicio externo
+PLACEHOLDER_IMAGE = (
+    "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' width='300' height='200' "
+    "viewBox='0 0 300 200'%3E%3Crect width='300' height='200' fill='%23cccccc'/%3E"
+    "%3Ctext x='150' y='105' font-family='sans-serif' font-size='18' fill='%23666666' "
+    "text-anchor='middle'%3ESin Imagen%3C/text%3E%3C/svg%3E"
+)
+
+class ReferenceQuerySet(models.QuerySet):
+    """
+    Escrituras masivas de datos de referencia. update() (que también usa
+    bulk_update) y bulk_create no emiten señales: invalidan aquí la caché.
+    """
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        reference_cache.invalidate_on_commit(self.model.CACHE_NAMESPACE, using=self.db)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        reference_cache.invalidate_on_commit(self.model.CACHE_NAMESPACE, using=self.db)
+        return created
+
+class OrderQuerySet(models.QuerySet):
+    """
+    Cambios masivos de órdenes. update() no emite post_save: si cambia el
+    estado, recalcula aquí los resúmenes de los días de las órdenes que
+    entran o salen de los estados excluidos.
+    """
+
+    def update(self, **kwargs):
+        if 'status' not in kwargs:
+            return super().update(**kwargs)
+        from .reports import EXCLUDED_STATUSES, rebuild_sales
+
+        status = kwargs['status']
+        affected = self
+        if isinstance(status, str):
+            if status in EXCLUDED_STATUSES:
+                affected = self.exclude(status__in=EXCLUDED_STATUSES)
+            else:
+                affected = self.filter(status__in=EXCLUDED_STATUSES)
+        days = list(affected.dates('created_at', 'day'))
+        rows = super().update(**kwargs)
+
+        def rebuild():
+            for day in days:
+                rebuild_sales(day)
+
+        if days:
+            transaction.on_commit(rebuild, using=self.db)
+        return rows
+
 class Currency(models.Model):
     """Modelo para manejar diferentes monedas"""
+    CACHE_NAMESPACE = 'currencies'
+
     code = models.CharField(max_length=3, unique=True, verbose_name="Código")
     name = models.CharField(max_length=50, verbose_name="Nombre")
     symbol = models.CharField(max_length=5, verbose_name="Símbolo")
@@ -20,6 +84,8 @@ class Currency(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ReferenceQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Moneda"
         verbose_name_plural = "Monedas"
@@ -36,15 +102,35 @@ class Currency(models.Model):
 
     @classmethod
     def get_default(cls):
-        """Obtiene la moneda por defecto"""
+        """Obtiene la moneda por defecto (cacheada, se invalida al guardar una moneda)"""
+        return reference_cache.get_or_set(cls.CACHE_NAMESPACE, 'default', cls._get_default_uncached)
+
+    @classmethod
+    def _get_default_uncached(cls):
         return cls.objects.filter(is_default=True).first() or cls.objects.first()
 
+    def convert(self, amount, target_currency):
+        """Convierte un monto de esta moneda a otra usando las tasas actuales"""
+        if not target_currency or target_currency.pk == self.pk:
+            return amount
+        
+        if self.exchange_rate > 0 and target_currency.exchange_rate > 0:
+            # Primero convertir a CUP, luego a la moneda objetivo
+            amount_in_cup = amount * self.exchange_rate
+            return amount_in_cup / target_currency.exchange_rate
+        
+        return amount
+
 class Category(models.Model):
+    CACHE_NAMESPACE = 'categories'
+
     name = models.CharField(max_length=100, verbose_name="Nombre")
     description = models.TextField(blank=True, verbose_name="Descripción")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ReferenceQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Categoría"
         verbose_name_plural = "Categorías"
@@ -53,6 +139,62 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def get_cached_list(cls):
+        """Todas las categorías (cacheadas, se invalidan al guardar o borrar una)"""
+        return reference_cache.get_or_set(cls.CACHE_NAMESPACE, 'all', lambda: list(cls.objects.all()))
+
+    @classmethod
+    async def aget_cached_list(cls):
+        """Versión async de get_cached_list"""
+        return await reference_cache.aget_or_set(cls.CACHE_NAMESPACE, 'all', lambda: list(cls.objects.all()))
+
+class ProductQuerySet(models.QuerySet):
+    """Consultas de productos con métricas calculadas en la base de datos"""
+
+    def update(self, **kwargs):
+        # update() no emite señales: contar aquí las referencias a las imágenes
+        if 'image' not in kwargs:
+            return super().update(**kwargs)
+        image = kwargs['image']
+        current = (image if isinstance(image, str) else getattr(image, 'name', '')) or ''
+        previous = list(self.values_list('image', flat=True))
+        rows = super().update(**kwargs)
+        for name in previous:
+            if (name or '') != current:
+                ImageBlob.release(name)
+                ImageBlob.acquire(current)
+        return rows
+
+    def with_profit_margin(self):
+        """Anota el margen de ganancia (%) calculado en SQL"""
+        # En coma flotante: SQLite guarda los decimales enteros como INTEGER y
+        # la división entre ellos sería entera (16 sobre 15 daría 6 en vez de 6.67)
+        margin = Round(
+            Cast(F('sale_price') - F('purchase_price'), FloatField()) * Value(100.0)
+            / Cast(F('purchase_price'), FloatField()),
+            2,
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+        return self.annotate(margin_pct=Case(
+            When(purchase_price__gt=0, then=margin),
+            default=Value(Decimal('0')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ))
+
+    def with_stock_status(self):
+        """Anota el estado del stock: 'out', 'low' u 'ok'"""
+        return self.annotate(stock_state=Case(
+            When(stock=0, then=Value('out')),
+            When(stock__lte=F('min_stock'), then=Value('low')),
+            default=Value('ok'),
+            output_field=CharField(max_length=3),
+        ))
+
+    def low_stock(self):
+        """Productos con stock igual o inferior al mínimo (usa el índice de low_stock)"""
+        return self.filter(low_stock=True)
+
 class Product(models.Model):
     name = models.CharField(max_length=200, verbose_name="Nombre del Producto")
     description = models.TextField(verbose_name="Descripción")
@@ -83,9 +225,28 @@ class Product(models.Model):
     # Inventario
     stock = models.PositiveIntegerField(default=0, verbose_name="Stock Disponible")
     min_stock = models.PositiveIntegerField(default=5, verbose_name="Stock Mínimo")
+    # Calculado por la base de datos en cada cambio de stock, e indexado
+    low_stock = models.GeneratedField(
+        expression=Q(stock__lte=F('min_stock')),
+        output_field=BooleanField(),
+        db_persist=True,
+        verbose_name="Stock Bajo"
+    )
     
     # Imagen del producto
-    image = models.ImageField(upload_to='products/', blank=True, null=True, verbose_name="Imagen")
+    image = models.ImageField(
+        upload_to='products/',
+        storage=product_image_storage,
+        blank=True,
+        null=True,
+        verbose_name="Imagen"
+    )
+    image_renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Versiones de la Imagen"
+    )
     
     # Estado del producto
     is_active = models.BooleanField(default=True, verbose_name="Activo")
@@ -95,14 +256,37 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['-created_at']
+        indexes = [
+            # Índice parcial: solo contiene los productos con stock bajo
+            models.Index(
+                fields=['is_active'],
+                condition=Q(low_stock=True),
+                name='store_product_low_stock_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.code}"
 
+    def save(self, *args, **kwargs):
+        # Las referencias a cada archivo de imagen se cuentan en store/signals.py
+        super().save(*args, **kwargs)
+        # Generar las versiones redimensionadas si la imagen cambió (sin cargarla si se difirió)
+        if (
+            'image' not in self.get_deferred_fields()
+            and self.image
+            and self.image_renditions.get('source') != self.image.name
+        ):
+            from .images import schedule_renditions
+            product_id = self.pk
+            transaction.on_commit(lambda: schedule_renditions(product_id))
+
     @property
     def profit_margin(self):
         """Calcula el margen de ganancia"""
@@ -122,41 +306,73 @@ class Product(models.Model):
 
     def get_price_in_currency(self, target_currency):
         """Convierte el precio de venta a otra moneda"""
-        if not target_currency or target_currency == self.currency:
-            return self.sale_price
-        
-        # Convertir usando las tasas de cambio
-        cup_rate = self.currency.exchange_rate
-        target_rate = target_currency.exchange_rate
-        
-        if cup_rate > 0 and target_rate > 0:
-            # Primero convertir a CUP, luego a la moneda objetivo
-            price_in_cup = self.sale_price * cup_rate
-            return price_in_cup / target_rate
-        
-        return self.sale_price
+        return self.currency.convert(self.sale_price, target_currency)
 
     def get_purchase_price_in_currency(self, target_currency):
         """Convierte el precio de compra a otra moneda"""
-        if not target_currency or target_currency == self.currency:
-            return self.purchase_price
-        
-        # Convertir usando las tasas de cambio
-        cup_rate = self.currency.exchange_rate
-        target_rate = target_currency.exchange_rate
-        
-        if cup_rate > 0 and target_rate > 0:
-            # Primero convertir a CUP, luego a la moneda objetivo
-            price_in_cup = self.purchase_price * cup_rate
-            return price_in_cup / target_rate
-        
-        return self.purchase_price
+        return self.currency.convert(self.purchase_price, target_currency)
 
-    def get_image_url(self):
-        """Obtiene la URL de la imagen o una imagen de placeholder"""
+    def get_image_url(self, width=None):
+        """Obtiene la URL de la imagen (o de su versión más cercana a `width`) o un placeholder"""
         if self.image and hasattr(self.image, 'url'):
+            rendition = self.get_rendition(width) if width else None
+            if rendition:
+                return default_storage.url(rendition['jpg'])
             return self.image.url
-        return "https://via.placeholder.com/300x200/cccccc/666666?text=Sin+Imagen"
+        return PLACEHOLDER_IMAGE
+
+    def get_rendition(self, width):
+        """Versión más pequeña que cubre `width` píxeles (o la mayor disponible)"""
+        sizes = self.image_renditions.get('sizes') if self.image_renditions else None
+        if not sizes or self.image_renditions.get('source') != self.image.name:
+            return None
+        available = sorted(sizes.values(), key=lambda rendition: rendition['width'])
+        for rendition in available:
+            if rendition['width'] >= width:
+                return rendition
+        return available[-1]
+
+    def get_image_srcset(self, extension='jpg'):
+        """Valor del atributo srcset con todas las versiones en un formato"""
+        if not self.get_rendition(0):
+            return ''
+        return ', '.join(
+            f"{default_storage.url(rendition[extension])} {rendition['width']}w"
+            for rendition in sorted(self.image_renditions['sizes'].values(), key=lambda r: r['width'])
+        )
+
+    @property
+    def image_srcset(self):
+        return self.get_image_srcset('jpg')
+
+    @property
+    def image_webp_srcset(self):
+        return self.get_image_srcset('webp')
+
+    @property
+    def card_image(self):
+        """Versión para las tarjetas de producto (~320px)"""
+        return self._image_info(320)
+
+    @property
+    def detail_image(self):
+        """Versión para la página de detalle (~640px)"""
+        return self._image_info(640)
+
+    @property
+    def thumbnail_image(self):
+        """Versión para miniaturas (~160px)"""
+        return self._image_info(160)
+
+    def _image_info(self, width):
+        rendition = self.get_rendition(width) if self.image else None
+        if rendition:
+            return {
+                'url': default_storage.url(rendition['jpg']),
+                'width': rendition['width'],
+                'height': rendition['height'],
+            }
+        return {'url': self.get_image_url(), 'width': 300, 'height': 200}
 
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Usuario")
@@ -172,8 +388,52 @@ class Cart(models.Model):
 
     @property
     def total(self):
-        """Calcula el total del carrito"""
-        return sum(item.subtotal for item in self.cartitem_set.all())
+        """Calcula el total del carrito en la moneda por defecto"""
+        return self.total_in(Currency.get_default())
+
+    def totals_by_currency(self):
+        """
+        Subtotales del carrito agrupados por moneda en una sola consulta.
+        Devuelve una lista de tuplas (moneda, monto).
+        """
+        rows = (
+            self.cartitem_set
+            .values(
+                'product__currency',
+                'product__currency__code',
+                'product__currency__name',
+                'product__currency__symbol',
+                'product__currency__exchange_rate',
+            )
+            .annotate(amount=Sum(
+                F('quantity') * F('product__sale_price'),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ))
+            .order_by('product__currency__code')
+        )
+        return [
+            (
+                Currency(
+                    id=row['product__currency'],
+                    code=row['product__currency__code'],
+                    name=row['product__currency__name'],
+                    symbol=row['product__currency__symbol'],
+                    exchange_rate=row['product__currency__exchange_rate'],
+                ),
+                row['amount'] or Decimal('0'),
+            )
+            for row in rows
+        ]
+
+    def total_in(self, settlement_currency, totals=None):
+        """Total del carrito convertido a la moneda de liquidación"""
+        if totals is None:
+            totals = self.totals_by_currency()
+        total = sum(
+            (currency.convert(amount, settlement_currency) for currency, amount in totals),
+            Decimal('0'),
+        )
+        return total.quantize(Decimal('0.01'))
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, verbose_name="Carrito")
@@ -214,6 +474,13 @@ class Order(models.Model):
     order_number = models.CharField(max_length=20, unique=True, verbose_name="Número de Orden")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Estado")
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Total")
+    settlement_currency = models.ForeignKey(
+        Currency,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Moneda de Liquidación"
+    )
     
     # Información de entrega
     delivery_type = models.CharField(
@@ -233,10 +500,16 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Orden"
         verbose_name_plural = "Órdenes"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='store_order_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='store_order_status_date_idx'),
+        ]
 
     def __str__(self):
         return f"Orden {self.order_number}"
@@ -255,6 +528,15 @@ class Order(models.Model):
         for item in self.orderitem_set.all():
             items_text += f"- {item.quantity}x {item.product.name} - {item.product.currency.symbol}{item.price}\n"
         
+        totals_text = ""
+        for line in self.currency_totals.select_related('currency'):
+            totals_text += f"Subtotal {line.currency.code}: {line.currency.symbol}{line.amount}\n"
+        
+        if self.settlement_currency:
+            total_text = f"{self.settlement_currency.symbol}{self.total_amount} {self.settlement_currency.code}"
+        else:
+            total_text = f"{self.total_amount}"
+        
         if self.delivery_type == 'delivery':
             delivery_info = f"\n🚚 DIRECCIÓN DE ENVÍO:\n{self.shipping_address}"
         else:
@@ -267,7 +549,8 @@ CLIENTE:
 Teléfono: {self.phone}
 
 PRODUCTOS:
-{items_text}TOTAL: {self.total_amount}
+{items_text}
+{totals_text}TOTAL: {total_text}
 {delivery_info}
 
 NOTAS:
@@ -276,11 +559,18 @@ NOTAS:
 FECHA: {self.created_at.strftime('%d/%m/%Y %H:%M')}"""
         return message
 
+    def totals_by_currency(self):
+        """Desglose del total de la orden por moneda"""
+        return self.currency_totals.select_related('currency')
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, verbose_name="Orden")
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="Producto")
     quantity = models.PositiveIntegerField(verbose_name="Cantidad")
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Precio Unitario")
+    # Precio de compra del producto al vender: los reportes de ganancia no
+    # cambian cuando después se actualiza el costo del producto
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Costo Unitario")
 
     class Meta:
         verbose_name = "Item de Orden"
@@ -289,9 +579,335 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity}x {self.product.name}"
 
+    def save(self, *args, **kwargs):
+        if self.unit_cost is None:
+            self.unit_cost = self.product.purchase_price
+        super().save(*args, **kwargs)
+
     @property
     def subtotal(self):
         """Calcula el subtotal del item"""
         if self.price:
             return self.quantity * self.price
         return 0
+
+class OrderCurrencyTotal(models.Model):
+    """Desglose compacto del total de una orden por moneda"""
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='currency_totals',
+        verbose_name="Orden"
+    )
+    currency = models.ForeignKey(Currency, on_delete=models.CASCADE, verbose_name="Moneda")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Monto")
+    # Monto convertido a la moneda de liquidación con la tasa del momento
+    settlement_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        verbose_name="Monto Liquidado"
+    )
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Fecha")
+
+    class Meta:
+        verbose_name = "Total por Moneda"
+        verbose_name_plural = "Totales por Moneda"
+        unique_together = ['order', 'currency']
+        indexes = [
+            models.Index(fields=['currency', 'created_at'], name='store_octotal_cur_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.order.order_number}: {self.currency.symbol}{self.amount}"
+
+    @classmethod
+    def create_for_order(cls, order, totals, settlement_currency):
+        """Guarda el desglose por moneda de una orden en un solo INSERT"""
+        return cls.objects.bulk_create([
+            cls(
+                order=order,
+                currency=currency,
+                amount=amount,
+                settlement_amount=currency.convert(amount, settlement_currency).quantize(Decimal('0.01')),
+                created_at=order.created_at,
+            )
+            for currency, amount in totals
+        ])
+
+    @classmethod
+    def revenue_by_currency(cls, start=None, end=None):
+        """Ingresos agregados por moneda en un rango de fechas"""
+        queryset = cls.objects.exclude(order__status='cancelled')
+        if start:
+            queryset = queryset.filter(created_at__gte=start)
+        if end:
+            queryset = queryset.filter(created_at__lt=end)
+        return (
+            queryset
+            .values('currency__code', 'currency__symbol')
+            .annotate(revenue=Sum('amount'), settlement_revenue=Sum('settlement_amount'))
+            .order_by('currency__code')
+        )
+
+class DailySales(models.Model):
+    """Resumen diario de ventas por moneda (tabla pre-agregada)"""
+    date = models.DateField(verbose_name="Fecha")
+    currency = models.ForeignKey(Currency, on_delete=models.CASCADE, verbose_name="Moneda")
+    orders = models.PositiveIntegerField(default=0, verbose_name="Órdenes")
+    units = models.PositiveIntegerField(default=0, verbose_name="Unidades")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Ingresos")
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Costo")
+
+    class Meta:
+        verbose_name = "Venta Diaria"
+        verbose_name_plural = "Ventas Diarias"
+        ordering = ['-date', 'currency']
+        unique_together = ['date', 'currency']
+
+    def __str__(self):
+        return f"{self.date} {self.currency.code}: {self.revenue}"
+
+    @property
+    def margin(self):
+        """Ganancia bruta del día"""
+        return self.revenue - self.cost
+
+class DailyProductSales(models.Model):
+    """Resumen diario de ventas por producto, con su categoría y moneda"""
+    date = models.DateField(verbose_name="Fecha")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="Producto")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name="Categoría")
+    currency = models.ForeignKey(Currency, on_delete=models.CASCADE, verbose_name="Moneda")
+    units = models.PositiveIntegerField(default=0, verbose_name="Unidades")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Ingresos")
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Costo")
+
+    class Meta:
+        verbose_name = "Venta Diaria por Producto"
+        verbose_name_plural = "Ventas Diarias por Producto"
+        ordering = ['-date']
+        unique_together = ['date', 'product']
+        indexes = [
+            models.Index(fields=['date', 'category'], name='store_dps_date_cat_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product.code}: {self.units}"
+
+    @property
+    def margin(self):
+        """Ganancia bruta del día"""
+        return self.revenue - self.cost
+
+class LowStockAlert(models.Model):
+    """Alerta de reposición para un producto con stock bajo"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="Producto")
+    stock = models.PositiveIntegerField(verbose_name="Stock al Alertar")
+    min_stock = models.PositiveIntegerField(verbose_name="Stock Mínimo")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Creada")
+    resolved_at = models.DateTimeField(null=True, blank=True, verbose_name="Resuelta")
+
+    class Meta:
+        verbose_name = "Alerta de Stock Bajo"
+        verbose_name_plural = "Alertas de Stock Bajo"
+        ordering = ['-created_at']
+        constraints = [
+            # Solo una alerta abierta por producto
+            models.UniqueConstraint(
+                fields=['product'],
+                condition=Q(resolved_at__isnull=True),
+                name='store_lowstockalert_one_open',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name}: {self.stock}/{self.min_stock}"
+
+    @classmethod
+    def open_for(cls, product):
+        """Abre una alerta para el producto si no tiene una pendiente"""
+        return cls.objects.bulk_create(
+            [cls(product=product, stock=product.stock, min_stock=product.min_stock)],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def emit(cls):
+        """
+        Abre alertas para los productos activos con stock bajo y cierra las
+        de productos ya repuestos. Solo recorre el índice de low_stock.
+        """
+        pending = (
+            Product.objects
+            .filter(low_stock=True, is_active=True)
+            .exclude(id__in=cls.objects.filter(resolved_at__isnull=True).values('product_id'))
+            .values_list('id', 'stock', 'min_stock')
+        )
+        created = cls.objects.bulk_create(
+            [cls(product_id=pk, stock=stock, min_stock=min_stock) for pk, stock, min_stock in pending],
+            ignore_conflicts=True,
+        )
+        resolved = cls.objects.filter(
+            Q(product__low_stock=False) | Q(product__is_active=False),
+            resolved_at__isnull=True,
+        ).update(resolved_at=timezone.now())
+        return len(created), resolved
+
+class PriceChangeBatch(models.Model):
+    """Ajuste masivo de precios o stock, con copia de los valores anteriores"""
+    OPERATION_CHOICES = [
+        ('percent', 'Porcentaje sobre el precio de venta'),
+        ('amount', 'Monto fijo sobre el precio de venta'),
+        ('margin', 'Margen objetivo sobre el precio de compra'),
+        ('stock', 'Ajuste de stock'),
+    ]
+
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES, verbose_name="Operación")
+    value = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Valor")
+    products_count = models.PositiveIntegerField(default=0, verbose_name="Productos")
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Usuario")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+    undone_at = models.DateTimeField(null=True, blank=True, verbose_name="Deshecho")
+
+    class Meta:
+        verbose_name = "Ajuste Masivo"
+        verbose_name_plural = "Ajustes Masivos"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_operation_display()} {self.value} ({self.products_count} productos)"
+
+class PriceChangeSnapshot(models.Model):
+    """Valores de un producto antes (y después) de un ajuste masivo"""
+    batch = models.ForeignKey(
+        PriceChangeBatch,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        verbose_name="Ajuste"
+    )
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="Producto")
+    sale_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Precio de Venta")
+    stock = models.PositiveIntegerField(verbose_name="Stock")
+    # Valor del campo ajustado justo después del ajuste (para deshacerlo sin pisar cambios posteriores)
+    new_sale_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Precio de Venta Nuevo"
+    )
+    new_stock = models.PositiveIntegerField(null=True, blank=True, verbose_name="Stock Nuevo")
+
+    class Meta:
+        verbose_name = "Valor Anterior"
+        verbose_name_plural = "Valores Anteriores"
+        unique_together = ['batch', 'product']
+
+    def __str__(self):
+        return f"{self.product_id}: {self.sale_price} / {self.stock}"
+
+class ImageBlob(models.Model):
+    """Archivo de imagen único (por contenido) y cuántos productos lo usan"""
+    name = models.CharField(max_length=255, unique=True, verbose_name="Archivo")
+    size = models.PositiveBigIntegerField(null=True, blank=True, verbose_name="Tamaño (bytes)")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="Referencias")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Creado")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Actualizado")
+
+    class Meta:
+        verbose_name = "Archivo de Imagen"
+        verbose_name_plural = "Archivos de Imagen"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['ref_count', 'updated_at'], name='store_imageblob_gc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
+
+    @classmethod
+    def acquire(cls, name):
+        """Suma una referencia al archivo, registrándolo si es nuevo"""
+        if not is_blob(name):
+            return
+        now = timezone.now()
+        if cls.objects.filter(name=name).update(ref_count=F('ref_count') + 1, updated_at=now):
+            return
+        try:
+            size = product_image_storage().size(name)
+        except OSError:
+            size = None
+        try:
+            with transaction.atomic():
+                cls.objects.create(name=name, size=size, ref_count=1)
+        except IntegrityError:
+            # Otro proceso registró el archivo al mismo tiempo
+            cls.objects.filter(name=name).update(ref_count=F('ref_count') + 1, updated_at=now)
+
+    @classmethod
+    def release(cls, name):
+        """Resta una referencia; el archivo se borra luego con gc_product_images"""
+        if not is_blob(name):
+            return
+        cls.objects.filter(name=name, ref_count__gt=0).update(
+            ref_count=F('ref_count') - 1,
+            updated_at=timezone.now(),
+        )
+
+class CatalogChange(models.Model):
+    """
+    Registro de cambios del catálogo para la sincronización incremental.
+    Lo llenan triggers de la base de datos (ver store/triggers.py), así que
+    también recoge los update() masivos, las importaciones y los borrados.
+    """
+    KIND_CHOICES = [
+        ('product', 'Producto'),
+        ('category', 'Categoría'),
+        ('currency', 'Moneda'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name="Tipo")
+    object_id = models.BigIntegerField(verbose_name="ID del Objeto")
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name="Fecha")
+
+    class Meta:
+        verbose_name = "Cambio del Catálogo"
+        verbose_name_plural = "Cambios del Catálogo"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['kind', 'object_id', 'id'], name='store_catchange_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} {self.object_id}"
+
+    @classmethod
+    def compact(cls):
+        """
+        Borra las entradas reemplazadas por otra posterior del mismo objeto.
+        La sincronización envía el estado actual, así que basta con la última.
+        """
+        latest = cls.objects.values('kind', 'object_id').annotate(latest=models.Max('id')).values('latest')
+        return cls.objects.exclude(id__in=latest).delete()[0]
+
+
+class SlowQuery(models.Model):
+    """
+    Sin tabla: da acceso en el admin al registro de consultas lentas, que
+    vive en la memoria del proceso (ver cuba_ecommerce.slowqueries).
+    """
+
+    class Meta:
+        managed = False
+        verbose_name = "Consulta Lenta"
+        verbose_name_plural = "Consultas Lentas"
+        default_permissions = ('view',)
+
+
+class RequestProfile(models.Model):
+    """
+    Sin tabla: da acceso en el admin a los perfiles de peticiones guardados
+    en disco (ver cuba_ecommerce.profiling).
+    """
+
+    class Meta:
+        managed = False
+        verbose_name = "Perfil de Petición"
+        verbose_name_plural = "Perfiles de Peticiones"
+        default_permissions = ('view',)
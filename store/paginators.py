@@ -0,0 +1,50 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Por debajo de este número de filas se usa el COUNT exacto
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+def estimate_table_rows(model, using='default'):
+    """
+    Estima el número de filas de la tabla de un modelo sin recorrerla.
+    Devuelve None si el motor no ofrece una estimación.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            row = cursor.fetchone()
+            return int(row[0]) if row and row[0] >= 0 else None
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+            row = cursor.fetchone()
+            return int(row[0]) if row and row[0] is not None else None
+        if connection.vendor == 'sqlite':
+            # MAX(rowid) se resuelve con una búsqueda en el índice de la tabla
+            cursor.execute(f'SELECT MAX(rowid) FROM "{table}"')
+            row = cursor.fetchone()
+            return int(row[0] or 0)
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginador que evita el COUNT(*) completo en tablas grandes sin filtros,
+    usando la estimación del motor de base de datos.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimate_table_rows(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate > ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
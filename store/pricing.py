@@ -0,0 +1,155 @@
+"""
+Ajustes masivos de precios y stock.
+
+Cada ajuste se aplica con un único UPDATE basado en expresiones F() sobre el
+conjunto filtrado, después de copiar los valores anteriores a
+PriceChangeSnapshot con un INSERT ... SELECT para poder deshacerlo. Tras el
+UPDATE se copian también los valores nuevos: al deshacer, el stock se
+corrige con el movimiento inverso (sin perder las ventas posteriores) y los
+precios que se cambiaron después del ajuste no se tocan.
+"""
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.db.models import DecimalField, Exists, F, OuterRef, Subquery, Value
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from .models import PriceChangeBatch, PriceChangeSnapshot, Product
+
+PRICE_FIELD = DecimalField(max_digits=10, decimal_places=2)
+
+OPERATION_FIELDS = {
+    'percent': 'sale_price',
+    'amount': 'sale_price',
+    'margin': 'sale_price',
+    'stock': 'stock',
+}
+
+
+def adjustment_expression(operation, value):
+    """Expresión SQL con el nuevo valor del campo afectado por la operación"""
+    if operation == 'percent':
+        factor = Value(Decimal('1') + Decimal(value) / 100, output_field=PRICE_FIELD)
+        expression = Round(F('sale_price') * factor, 2, output_field=PRICE_FIELD)
+    elif operation == 'amount':
+        expression = F('sale_price') + Value(Decimal(value), output_field=PRICE_FIELD)
+    elif operation == 'margin':
+        factor = Value(Decimal('1') + Decimal(value) / 100, output_field=PRICE_FIELD)
+        expression = Round(F('purchase_price') * factor, 2, output_field=PRICE_FIELD)
+    elif operation == 'stock':
+        return Greatest(F('stock') + Value(int(value)), Value(0))
+    else:
+        raise ValueError(f"Operación desconocida: {operation}")
+    return Greatest(expression, Value(Decimal('0'), output_field=PRICE_FIELD), output_field=PRICE_FIELD)
+
+
+def _target(queryset):
+    """Queryset limpio de productos a partir de cualquier selección"""
+    return Product.objects.using(queryset.db).filter(pk__in=queryset.order_by().values('pk'))
+
+
+def preview_adjustment(queryset, operation, value, limit=50):
+    """Muestra (sin guardar) los valores anteriores y nuevos de una parte de la selección"""
+    field = OPERATION_FIELDS[operation]
+    target = _target(queryset)
+    rows = (
+        target
+        .annotate(new_value=adjustment_expression(operation, value))
+        .order_by('code')
+        .values('id', 'code', 'name', field, 'new_value')[:limit]
+    )
+    return {
+        'field': field,
+        'count': target.count(),
+        'rows': [
+            {
+                'id': row['id'],
+                'code': row['code'],
+                'name': row['name'],
+                'old_value': row[field],
+                'new_value': (
+                    Decimal(row['new_value']).quantize(Decimal('0.01'))
+                    if field == 'sale_price' else row['new_value']
+                ),
+            }
+            for row in rows
+        ],
+    }
+
+
+def _snapshot(batch, target):
+    """Copia los valores actuales con un INSERT ... SELECT"""
+    connection = connections[target.db]
+    quote = connection.ops.quote_name
+    ids_sql, ids_params = target.values('pk').query.sql_with_params()
+    product_table = quote(Product._meta.db_table)
+    sql = (
+        f"INSERT INTO {quote(PriceChangeSnapshot._meta.db_table)} "
+        f"({quote('batch_id')}, {quote('product_id')}, {quote('sale_price')}, {quote('stock')}) "
+        f"SELECT %s, {product_table}.{quote('id')}, {product_table}.{quote('sale_price')}, "
+        f"{product_table}.{quote('stock')} FROM {product_table} "
+        f"WHERE {product_table}.{quote('id')} IN ({ids_sql})"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [batch.pk, *ids_params])
+        return cursor.rowcount
+
+
+def apply_adjustment(queryset, operation, value, user=None):
+    """Aplica el ajuste a toda la selección y devuelve el PriceChangeBatch creado"""
+    field = OPERATION_FIELDS[operation]
+    target = _target(queryset)
+    with transaction.atomic(using=target.db):
+        batch = PriceChangeBatch.objects.using(target.db).create(
+            operation=operation,
+            value=value,
+            user=user,
+        )
+        _snapshot(batch, target)
+        batch.products_count = target.update(**{
+            field: adjustment_expression(operation, value),
+            'updated_at': timezone.now(),
+        })
+        batch.save(update_fields=['products_count'])
+        current = Product.objects.using(target.db).filter(pk=OuterRef('product_id')).values(field)[:1]
+        PriceChangeSnapshot.objects.using(target.db).filter(batch=batch).update(**{
+            f'new_{field}': Subquery(current),
+        })
+    return batch
+
+
+def undo_adjustment(batch):
+    """
+    Deshace el ajuste con un único UPDATE y devuelve (restaurados, omitidos).
+
+    El stock recibe el movimiento inverso al del ajuste; los precios vuelven
+    al valor anterior solo si nadie los cambió después (los demás se omiten).
+    Un ajuste ya deshecho devuelve (0, 0).
+    """
+    field = OPERATION_FIELDS[batch.operation]
+    snapshots = PriceChangeSnapshot.objects.filter(batch=batch, **{f'new_{field}__isnull': False})
+    now = timezone.now()
+    with transaction.atomic():
+        # Marcar el ajuste como deshecho solo si no lo estaba: dos peticiones
+        # simultáneas no pueden deshacerlo dos veces
+        if not PriceChangeBatch.objects.filter(pk=batch.pk, undone_at__isnull=True).update(undone_at=now):
+            return 0, 0
+        batch.undone_at = now
+        total = PriceChangeSnapshot.objects.filter(batch=batch).count()
+        if field == 'stock':
+            delta = snapshots.filter(product_id=OuterRef('pk')).annotate(
+                delta=F('new_stock') - F('stock'),
+            ).values('delta')[:1]
+            restored = Product.objects.filter(pk__in=snapshots.values('product_id')).update(
+                stock=Greatest(F('stock') - Subquery(delta), Value(0)),
+                updated_at=now,
+            )
+        else:
+            previous = snapshots.filter(product_id=OuterRef('pk')).values('sale_price')[:1]
+            unchanged = snapshots.filter(product_id=OuterRef('pk'), new_sale_price=OuterRef('sale_price'))
+            restored = Product.objects.filter(Exists(unchanged)).update(
+                sale_price=Subquery(previous),
+                updated_at=now,
+            )
+    return restored, total - restored
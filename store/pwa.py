@@ -0,0 +1,99 @@
+"""
+Modo aplicación web progresiva (PWA): manifiesto, service worker y página
+sin conexión.
+
+El service worker se sirve desde la raíz para que controle todo el sitio.
+Su versión es un hash de su propio contenido, que incluye las URLs del
+armazón precacheado: en producción esas URLs llevan el hash de cada
+estático (ManifestStaticFilesStorage), así que un despliegue que cambia un
+estático publica un service worker nuevo y descarta las cachés viejas.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render, resolve_url
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.cache import add_never_cache_headers, get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
+
+from .context_processors import vendor_assets
+
+PWA_THEME_COLOR = '#1e3a8a'
+PWA_MAX_PAGES = 100
+PWA_MAX_IMAGES = 300
+VERSION_PLACEHOLDER = '__PWA_VERSION__'
+
+
+def precache_urls():
+    """Armazón de la aplicación: página sin conexión, icono y librerías locales"""
+    urls = [reverse('pwa_offline'), staticfiles_storage.url('pwa/icon.svg')]
+    for url in vendor_assets(None)['vendor'].values():
+        # Las librerías servidas desde un CDN no se precachean: sin red fallaría la instalación
+        if url.startswith(settings.STATIC_URL):
+            urls.append(url)
+    return urls
+
+
+@require_safe
+def service_worker(request):
+    script = render_to_string('pwa/sw.js', {
+        'version': VERSION_PLACEHOLDER,
+        'precache_urls': json.dumps(precache_urls()),
+        'offline_url': reverse('pwa_offline'),
+        'login_url': resolve_url(settings.LOGIN_URL),
+        'csrf_url': reverse('pwa_csrf_token'),
+        'static_url': settings.STATIC_URL,
+        'media_url': settings.MEDIA_URL,
+        'max_pages': PWA_MAX_PAGES,
+        'max_images': PWA_MAX_IMAGES,
+    })
+    version = hashlib.md5(script.encode()).hexdigest()[:12]
+    script = script.replace(VERSION_PLACEHOLDER, version)
+
+    etag = f'"{version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(script, content_type='application/javascript; charset=utf-8')
+    response['ETag'] = etag
+    # El navegador debe comprobar siempre si hay una versión nueva
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_safe
+def manifest(request):
+    icon = staticfiles_storage.url('pwa/icon.svg')
+    response = JsonResponse({
+        'name': 'Cuba E-Commerce',
+        'short_name': 'Cuba Shop',
+        'lang': 'es',
+        'start_url': reverse('home'),
+        'scope': '/',
+        'display': 'standalone',
+        'background_color': '#ffffff',
+        'theme_color': PWA_THEME_COLOR,
+        'icons': [{'src': icon, 'sizes': 'any', 'type': 'image/svg+xml', 'purpose': 'any maskable'}],
+    }, content_type='application/manifest+json', json_dumps_params={'ensure_ascii': False})
+    patch_cache_control(response, public=True, max_age=60 * 60)
+    return response
+
+
+@require_safe
+def offline(request):
+    return render(request, 'pwa/offline.html', {'theme_color': PWA_THEME_COLOR})
+
+
+@require_safe
+def csrf_token(request):
+    """
+    Token CSRF vigente, para que el service worker reenvíe la cola sin
+    conexión con el de la sesión actual y no con el de cuando se encoló.
+    """
+    response = JsonResponse({'token': get_token(request)})
+    add_never_cache_headers(response)
+    return response
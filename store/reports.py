@@ -0,0 +1,211 @@
+"""
+Mantenimiento y consulta de las tablas de ventas pre-agregadas.
+
+Las órdenes se suman a DailySales/DailyProductSales al hacer checkout, y
+rebuild_sales() recalcula días completos a partir de OrderItem para
+corregir desvíos (órdenes canceladas, cambios hechos desde el admin).
+Cancelar o reactivar una orden recalcula su día automáticamente (señal en
+store/signals.py, o OrderQuerySet.update en los cambios masivos). El costo
+sale de OrderItem.unit_cost, el precio de compra guardado al vender.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Currency, DailyProductSales, DailySales, OrderItem, Product
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+EXCLUDED_STATUSES = ['cancelled']
+
+
+def _day_bounds(day):
+    """Inicio y fin (exclusivo) de un día local como datetimes con zona"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _product_aggregates(items):
+    """Agrupa items de orden por producto en una sola consulta"""
+    return (
+        items
+        .values('product_id', 'product__category_id', 'product__currency_id')
+        .annotate(
+            units=Sum('quantity'),
+            revenue=Sum(F('quantity') * F('price'), output_field=MONEY),
+            cost=Sum(F('quantity') * F('unit_cost'), output_field=MONEY),
+        )
+        .order_by()
+    )
+
+
+def _increment(model, lookup, values, defaults=None):
+    """Suma valores a una fila de resumen creándola si no existe"""
+    increments = {field: F(field) + value for field, value in values.items()}
+    if model.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **values, **(defaults or {}))
+    except IntegrityError:
+        # Otra petición creó la fila al mismo tiempo
+        model.objects.filter(**lookup).update(**increments)
+
+
+def record_order_sales(order):
+    """Suma una orden recién creada a las tablas de resumen"""
+    if order.status in EXCLUDED_STATUSES:
+        return
+    day = timezone.localdate(order.created_at)
+    per_currency = {}
+    with transaction.atomic():
+        for row in _product_aggregates(OrderItem.objects.filter(order=order)):
+            values = {'units': row['units'], 'revenue': row['revenue'], 'cost': row['cost']}
+            _increment(
+                DailyProductSales,
+                {'date': day, 'product_id': row['product_id']},
+                values,
+                defaults={
+                    'category_id': row['product__category_id'],
+                    'currency_id': row['product__currency_id'],
+                },
+            )
+            totals = per_currency.setdefault(
+                row['product__currency_id'],
+                {'units': 0, 'revenue': Decimal('0'), 'cost': Decimal('0')},
+            )
+            for field, value in values.items():
+                totals[field] += value
+        for currency_id, totals in per_currency.items():
+            _increment(
+                DailySales,
+                {'date': day, 'currency_id': currency_id},
+                {'orders': 1, **totals},
+            )
+
+
+def rebuild_sales(day):
+    """Recalcula por completo los resúmenes de un día a partir de OrderItem"""
+    start, end = _day_bounds(day)
+    items = OrderItem.objects.filter(
+        order__created_at__gte=start,
+        order__created_at__lt=end,
+    ).exclude(order__status__in=EXCLUDED_STATUSES)
+
+    product_rows = []
+    per_currency = {}
+    for row in _product_aggregates(items):
+        product_rows.append(DailyProductSales(
+            date=day,
+            product_id=row['product_id'],
+            category_id=row['product__category_id'],
+            currency_id=row['product__currency_id'],
+            units=row['units'],
+            revenue=row['revenue'],
+            cost=row['cost'],
+        ))
+        totals = per_currency.setdefault(
+            row['product__currency_id'],
+            DailySales(date=day, currency_id=row['product__currency_id'], revenue=0, cost=0),
+        )
+        totals.units += row['units']
+        totals.revenue += row['revenue']
+        totals.cost += row['cost']
+
+    order_counts = (
+        items
+        .values('product__currency_id')
+        .annotate(orders=Count('order_id', distinct=True))
+        .order_by()
+    )
+    for row in order_counts:
+        per_currency[row['product__currency_id']].orders = row['orders']
+
+    with transaction.atomic():
+        DailyProductSales.objects.filter(date=day).delete()
+        DailySales.objects.filter(date=day).delete()
+        DailyProductSales.objects.bulk_create(product_rows, batch_size=1000)
+        DailySales.objects.bulk_create(per_currency.values())
+    return len(product_rows)
+
+
+def period_start(months):
+    """Primer día del mes que abre un período de `months` meses hasta hoy"""
+    today = timezone.localdate()
+    month_index = today.year * 12 + today.month - 1 - (months - 1)
+    return today.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+
+def monthly_sales(months=12):
+    """Ventas mensuales por moneda leídas solo de DailySales"""
+    since = period_start(months)
+    rows = (
+        DailySales.objects
+        .filter(date__gte=since)
+        .annotate(month=TruncMonth('date'))
+        .values('month', 'currency_id')
+        .annotate(
+            orders=Sum('orders'),
+            units=Sum('units'),
+            revenue=Sum('revenue'),
+            cost=Sum('cost'),
+        )
+        .order_by('month', 'currency_id')
+    )
+    currencies = Currency.objects.in_bulk()
+    result = []
+    for row in rows:
+        row['currency'] = currencies.get(row['currency_id'])
+        row['margin'] = row['revenue'] - row['cost']
+        result.append(row)
+    return result
+
+
+def category_sales(since):
+    """Ventas por categoría y moneda desde una fecha, leídas de DailyProductSales"""
+    return (
+        DailyProductSales.objects
+        .filter(date__gte=since)
+        .values('category__name', 'currency__code')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'), cost=Sum('cost'))
+        .order_by('currency__code', '-revenue')
+    )
+
+
+def replenishment_report(days=30, lead_days=7, limit=None):
+    """
+    Productos con stock bajo ordenados por velocidad de venta.
+
+    La velocidad se calcula con los OrderItem de los últimos `days` días. La
+    cantidad sugerida cubre `lead_days` días de ventas más el stock mínimo.
+    """
+    since = timezone.now() - timedelta(days=days)
+    recent_sales = Q(
+        orderitem__order__created_at__gte=since,
+    ) & ~Q(orderitem__order__status__in=EXCLUDED_STATUSES)
+    products = (
+        Product.objects
+        .filter(low_stock=True, is_active=True)
+        .select_related('category')
+        .annotate(units_sold=Sum('orderitem__quantity', filter=recent_sales, default=0))
+        .order_by('-units_sold', 'stock')
+    )
+    if limit:
+        products = products[:limit]
+
+    report = []
+    for product in products:
+        velocity = Decimal(product.units_sold) / days
+        days_of_cover = (Decimal(product.stock) / velocity).quantize(Decimal('0.1')) if velocity else None
+        suggested = max(int(velocity * lead_days + product.min_stock - product.stock + 1), 0)
+        report.append({
+            'product': product,
+            'units_sold': product.units_sold,
+            'velocity': velocity.quantize(Decimal('0.01')),
+            'days_of_cover': days_of_cover,
+            'suggested_quantity': suggested,
+        })
+    return report
@@ -0,0 +1,89 @@
+"""
+Invalidación de la caché de datos de referencia, recálculo de ventas al
+cambiar el estado de una orden y cuenta de referencias a las imágenes de
+productos.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import reference_cache
+from .models import Category, Currency, ImageBlob, Order, Product
+from .reports import EXCLUDED_STATUSES, rebuild_sales
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Currency)
+def invalidate_reference_data(sender, using, **kwargs):
+    reference_cache.invalidate_on_commit(sender.CACHE_NAMESPACE, using=using)
+
+
+@receiver(post_init, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    # Sin consultar si el estado se difirió (only/defer)
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Order)
+def rebuild_sales_on_status_change(sender, instance, created, **kwargs):
+    """Una orden que se cancela (o se reactiva) deja de contar (o vuelve a contar) en los resúmenes de su día"""
+    previous = instance._loaded_status
+    instance._loaded_status = instance.status
+    if created or previous is None or (previous in EXCLUDED_STATUSES) == (instance.status in EXCLUDED_STATUSES):
+        return
+    day = timezone.localdate(instance.created_at)
+    transaction.on_commit(lambda: rebuild_sales(day))
+
+
+def _image_name(value):
+    if isinstance(value, str):
+        return value
+    return getattr(value, 'name', None) or ''
+
+
+@receiver(post_init, sender=Product)
+def remember_product_image(sender, instance, **kwargs):
+    # None si la imagen se difirió: su valor anterior no se conoce
+    if 'image' in instance.__dict__:
+        instance._loaded_image = _image_name(instance.__dict__['image'])
+    else:
+        instance._loaded_image = None
+
+
+@receiver(pre_save, sender=Product)
+def find_previous_image(sender, instance, update_fields, **kwargs):
+    """
+    Imagen que el producto tenía en la base antes de guardarlo. Se consulta
+    solo si no se conoce (producto creado con un pk existente o imagen
+    diferida y asignada después): guardar el stock no cuesta un SELECT.
+    """
+    if update_fields is not None and 'image' not in update_fields:
+        instance._previous_image = None
+        return
+    if instance._state.adding:
+        previous = None if instance.pk else ''
+    else:
+        previous = instance._loaded_image
+    if previous is None:
+        previous = Product.objects.filter(pk=instance.pk).values_list('image', flat=True).first() or ''
+    instance._previous_image = previous
+
+
+@receiver(post_save, sender=Product)
+def count_image_references(sender, instance, **kwargs):
+    previous = instance._previous_image
+    if previous is None:
+        return
+    current = instance.image.name if instance.image else ''
+    instance._loaded_image = current
+    if previous != current:
+        ImageBlob.release(previous)
+        ImageBlob.acquire(current)
+
+
+@receiver(post_delete, sender=Product)
+def release_product_image(sender, instance, **kwargs):
+    """También cubre los delete() masivos y los borrados en cascada (por ejemplo, de la categoría)"""
+    if instance.image:
+        ImageBlob.release(instance.image.name)
@@ -0,0 +1,70 @@
+"""
+Almacenamiento de imágenes de productos direccionado por contenido.
+
+Cada archivo subido se guarda una sola vez bajo un nombre derivado del
+SHA-256 de su contenido (calculado mientras se escribe), de modo que la
+misma foto usada por varios productos ocupa un solo archivo en disco y una
+sola URL en la caché del navegador. ImageBlob lleva la cuenta de cuántos
+productos usan cada archivo.
+"""
+import hashlib
+import os
+import tempfile
+from django.core.files.storage import FileSystemStorage
+
+BLOB_DIR = 'products/blobs'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage que nombra cada archivo por el hash de su contenido"""
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre definitivo se decide en _save a partir del contenido
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        temp_dir = self.path(BLOB_DIR)
+        os.makedirs(temp_dir, exist_ok=True)
+
+        # Escribir a un temporal calculando el hash por bloques
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    output.write(chunk)
+            hexdigest = digest.hexdigest()
+            blob_name = f"{BLOB_DIR}/{hexdigest[:2]}/{hexdigest[2:]}{extension}"
+            blob_path = self.path(blob_name)
+            if os.path.exists(blob_path):
+                os.remove(temp_path)
+                # Renovar la fecha para que gc_product_images no lo borre mientras se usa
+                os.utime(blob_path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, blob_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return blob_name
+
+
+def is_blob(name):
+    """Indica si un nombre de archivo pertenece al almacenamiento por contenido"""
+    return bool(name) and name.startswith(BLOB_DIR + '/')
+
+
+def blob_digest(name):
+    """SHA-256 de un blob a partir de su nombre"""
+    directory, filename = name[len(BLOB_DIR) + 1:].split('/', 1)
+    return directory + os.path.splitext(filename)[0]
+
+
+def product_image_storage():
+    """Almacenamiento de Product.image (callable para no fijar rutas en las migraciones)"""
+    return ContentAddressedStorage()
@@ -0,0 +1,480 @@
+"""
+Generador de datos sintéticos a escala de producción.
+
+Con la misma semilla y los mismos tamaños produce siempre los mismos datos.
+La popularidad de los productos sigue una ley de Zipf (pocos productos
+concentran la mayoría de las ventas), los precios se reparten entre varias
+monedas y el tamaño de las órdenes decae geométricamente.
+
+Las filas se insertan con bulk_create en bloques, cada uno en su propia
+transacción, y en SQLite los índices secundarios se eliminan durante la
+carga y se recrean al final, que es mucho más rápido que mantenerlos fila
+a fila.
+"""
+import random
+import time
+from array import array
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import (
+    Cart, CartItem, Category, Currency, DailyProductSales, ImageBlob, LowStockAlert, Order,
+    OrderCurrencyTotal, OrderItem, PriceChangeSnapshot, Product,
+)
+from .reports import rebuild_sales
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Prefijos que identifican las filas sintéticas (para poder borrarlas con --reset).
+# Las órdenes se identifican por su usuario: el prefijo de su número solo las
+# distingue a simple vista (un número real también podría empezar por SYN)
+PRODUCT_CODE_PREFIX = 'SYN-'
+ORDER_NUMBER_PREFIX = 'SYN'
+USERNAME_PREFIX = 'synth_'
+SYNTHETIC_PASSWORD = 'synth-password'
+
+# (código, nombre, símbolo, tasa vs CUP, peso en el catálogo, precio mediano)
+CURRENCIES = [
+    ('CUP', 'Peso Cubano', '₱', Decimal('1.0000'), 60, 900),
+    ('USD', 'Dólar Estadounidense', '$', Decimal('0.0417'), 25, 35),
+    ('EUR', 'Euro', '€', Decimal('0.0385'), 10, 30),
+    ('MXN', 'Peso Mexicano', '$', Decimal('0.7692'), 3, 600),
+    ('CAD', 'Dólar Canadiense', 'C$', Decimal('0.0308'), 2, 45),
+]
+
+CATEGORIES = [
+    'Electrónicos', 'Ropa y Accesorios', 'Hogar y Jardín', 'Deportes',
+    'Libros y Educación', 'Alimentos', 'Bebidas', 'Aseo Personal',
+    'Ferretería', 'Juguetes', 'Mascotas', 'Farmacia',
+]
+
+PRODUCT_NOUNS = [
+    'arroz', 'café', 'aceite', 'frijoles', 'azúcar', 'jabón', 'champú', 'camiseta',
+    'pantalón', 'zapatos', 'mochila', 'teléfono', 'cargador', 'audífonos', 'ventilador',
+    'olla', 'sartén', 'lámpara', 'libro', 'cuaderno', 'balón', 'bicicleta', 'taladro',
+    'martillo', 'muñeca', 'pienso', 'vitaminas', 'refresco', 'cerveza', 'galletas',
+]
+PRODUCT_ADJECTIVES = [
+    'premium', 'clásico', 'económico', 'familiar', 'compacto', 'deluxe', 'básico',
+    'profesional', 'infantil', 'grande', 'mini', 'ecológico', 'importado', 'nacional',
+]
+PRODUCT_BRANDS = [
+    'Cubita', 'Serrano', 'Havana', 'Caribe', 'Tropical', 'Varadero', 'Siboney',
+    'Mambo', 'Ceiba', 'Tínima', 'Guamá', 'Bucanero',
+]
+
+FIRST_NAMES = [
+    'Ana', 'Carlos', 'María', 'José', 'Yaima', 'Osmel', 'Dayana', 'Yoandry',
+    'Lisandra', 'Raúl', 'Marta', 'Alejandro', 'Yusimí', 'Ernesto', 'Idalmis', 'Pedro',
+]
+LAST_NAMES = [
+    'Pérez', 'González', 'Rodríguez', 'Hernández', 'García', 'Martínez', 'López',
+    'Díaz', 'Fernández', 'Sánchez', 'Ramírez', 'Castillo', 'Suárez', 'Morales',
+]
+MUNICIPALITIES = [
+    'Plaza de la Revolución', 'Centro Habana', 'Habana Vieja', 'Playa', 'Cerro',
+    'Diez de Octubre', 'Marianao', 'Boyeros', 'Santiago de Cuba', 'Camagüey',
+]
+
+ORDER_STATUS_WEIGHTS = {
+    'delivered': 70, 'shipped': 8, 'processing': 6, 'pending': 8, 'cancelled': 8,
+}
+
+
+class GenerationReport:
+    """Filas creadas por tabla y tiempo empleado"""
+
+    def __init__(self):
+        self.counts = {}
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def add(self, name, count):
+        self.counts[name] = self.counts.get(name, 0) + count
+
+    @property
+    def rows(self):
+        return sum(self.counts.values())
+
+    def __str__(self):
+        detail = ', '.join(f"{count} {name}" for name, count in self.counts.items())
+        rate = self.rows / self.elapsed if self.elapsed else 0
+        return f"{detail} en {self.elapsed:.1f}s ({rate:.0f} filas/s)"
+
+
+class ZipfSampler:
+    """Elige índices 0..n-1 con probabilidad proporcional a 1 / rango^s"""
+
+    def __init__(self, n, exponent, rng):
+        # El rango de cada índice se baraja para que los más vendidos no sean los primeros creados
+        ranks = list(range(1, n + 1))
+        rng.shuffle(ranks)
+        self.cumulative = list(accumulate(1 / rank ** exponent for rank in ranks))
+        self.total = self.cumulative[-1]
+        self.rng = rng
+
+    def sample(self):
+        return bisect(self.cumulative, self.rng.random() * self.total)
+
+
+@contextmanager
+def historical_dates(*models):
+    """
+    Permite fijar created_at/updated_at en bulk_create: mientras dura el bloque
+    los campos auto_now y auto_now_add de los modelos dados no se sobrescriben.
+    """
+    changed = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                changed.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+@contextmanager
+def deferred_indexes(*models):
+    """
+    Elimina los índices secundarios no únicos de las tablas durante el bloque
+    y los recrea al salir (solo SQLite; en otros motores no hace nada).
+    Los índices únicos se conservan para no perder sus garantías.
+    """
+    if connection.vendor != 'sqlite':
+        yield []
+        return
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            f"AND tbl_name IN ({', '.join(['%s'] * len(tables))})",
+            tables,
+        )
+        indexes = [
+            (name, sql) for name, sql in cursor.fetchall()
+            if not sql.upper().startswith('CREATE UNIQUE')
+        ]
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+    try:
+        yield [name for name, _ in indexes]
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+            cursor.execute("ANALYZE")
+
+
+def _raw_delete(queryset):
+    """DELETE con subconsulta, sin cargar las filas ni recorrer las cascadas en Python"""
+    model = queryset.model
+    sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)} "
+            f"WHERE {connection.ops.quote_name(model._meta.pk.column)} IN ({sql})",
+            params,
+        )
+        return cursor.rowcount
+
+
+class SyntheticDataError(Exception):
+    """Los datos sintéticos no se pueden borrar sin tocar datos reales"""
+
+
+def delete_synthetic_data():
+    """
+    Borra las filas sintéticas y las que dependen de ellas, de hijas a
+    padres, y recalcula los resúmenes de ventas de los días afectados.
+    Devuelve el número de filas borradas por modelo y el de días recalculados.
+
+    Si alguna orden real incluye productos sintéticos no borra nada y lanza
+    SyntheticDataError: borrar esos items alteraría órdenes de clientes.
+    """
+    products = Product.objects.filter(code__startswith=PRODUCT_CODE_PREFIX)
+    users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+    # Todas las órdenes sintéticas son de usuarios sintéticos
+    orders = Order.objects.filter(user__in=users)
+    carts = Cart.objects.filter(user__in=users)
+    steps = [
+        OrderItem.objects.filter(order__in=orders),
+        OrderCurrencyTotal.objects.filter(order__in=orders),
+        CartItem.objects.filter(cart__in=carts) | CartItem.objects.filter(product__in=products),
+        DailyProductSales.objects.filter(product__in=products),
+        LowStockAlert.objects.filter(product__in=products),
+        PriceChangeSnapshot.objects.filter(product__in=products),
+        orders,
+        carts,
+        products,
+        # Los usuarios sintéticos no tienen grupos, permisos ni entradas del admin
+        users,
+    ]
+    deleted = {}
+    with transaction.atomic():
+        real_orders = list(
+            Order.objects.filter(orderitem__product__in=products)
+            .exclude(user__in=users)
+            .order_by('created_at')
+            .values_list('order_number', flat=True)
+            .distinct()[:6]
+        )
+        if real_orders:
+            examples = ', '.join(real_orders[:5]) + (', ...' if len(real_orders) > 5 else '')
+            raise SyntheticDataError(
+                f"Hay órdenes reales con productos sintéticos ({examples}): "
+                "no se borró nada"
+            )
+        days = list(orders.dates('created_at', 'day'))
+        # _raw_delete no emite post_delete: liberar aquí las imágenes de los productos
+        for name in products.exclude(image='').exclude(image__isnull=True).values_list('image', flat=True):
+            ImageBlob.release(name)
+        for queryset in steps:
+            deleted[queryset.model._meta.verbose_name_plural] = _raw_delete(queryset)
+        for day in days:
+            rebuild_sales(day)
+    return deleted, len(days)
+
+
+def has_synthetic_data():
+    return (
+        Product.objects.filter(code__startswith=PRODUCT_CODE_PREFIX).exists()
+        or User.objects.filter(username__startswith=USERNAME_PREFIX).exists()
+    )
+
+
+class SyntheticDataGenerator:
+    """
+    Crea catálogo, usuarios, carritos y órdenes sintéticos.
+
+    Los productos se guardan en memoria solo como arreglos compactos (id,
+    precio en centavos, moneda), lo que permite generar millones de órdenes
+    sin volver a consultar el catálogo.
+    """
+
+    def __init__(self, seed=42, products=10000, users=1000, orders=20000, carts=0.2,
+                 days=365, zipf=1.1, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+        self.rng = random.Random(seed)
+        self.sizes = {'products': products, 'users': users, 'orders': orders}
+        self.cart_ratio = carts
+        self.days = days
+        self.zipf = zipf
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.now = timezone.now()
+        self.report = GenerationReport()
+
+    def run(self):
+        """Genera todos los datos y devuelve un GenerationReport"""
+        self.currencies = self.ensure_currencies()
+        self.settlement = Currency.get_default()
+        self.categories = self.ensure_categories()
+        with historical_dates(Product, Order), deferred_indexes(
+            Product, User, Cart, CartItem, Order, OrderItem, OrderCurrencyTotal,
+        ):
+            self.create_products()
+            self.create_users()
+            self.create_carts()
+            self.create_orders()
+        self.report.finished_at = time.perf_counter()
+        return self.report
+
+    def ensure_currencies(self):
+        """Crea las monedas que falten y devuelve {código: moneda}"""
+        existing = {currency.code: currency for currency in Currency.objects.all()}
+        for code, name, symbol, rate, _, _ in CURRENCIES:
+            if code not in existing:
+                existing[code] = Currency.objects.create(
+                    code=code, name=name, symbol=symbol, exchange_rate=rate,
+                    is_default=(code == 'CUP' and not any(c.is_default for c in existing.values())),
+                )
+        return existing
+
+    def ensure_categories(self):
+        existing = {category.name: category.pk for category in Category.objects.all()}
+        for name in CATEGORIES:
+            if name not in existing:
+                existing[name] = Category.objects.create(name=name).pk
+        return [existing[name] for name in CATEGORIES]
+
+    def random_date(self):
+        """Fecha en los últimos `days` días, con más actividad en los recientes"""
+        age = self.days * (1 - self.rng.random() ** 0.7)
+        return self.now - timedelta(days=age)
+
+    def insert(self, name, objects):
+        """Inserta un bloque en su propia transacción"""
+        with transaction.atomic():
+            created = type(objects[0]).objects.bulk_create(objects, batch_size=self.chunk_size)
+        self.report.add(name, len(created))
+        if self.progress:
+            self.progress(self.report)
+        return created
+
+    def chunks(self, total):
+        for start in range(0, total, self.chunk_size):
+            yield start, min(start + self.chunk_size, total)
+
+    def create_products(self):
+        rng = self.rng
+        currencies = [(self.currencies[row[0]], row[4], row[5]) for row in CURRENCIES]
+        currency_weights = [weight for _, weight, _ in currencies]
+        self.product_ids = array('q')
+        self.product_cents = array('q')
+        self.product_cost_cents = array('q')
+        self.product_currency = array('q')
+        for start, end in self.chunks(self.sizes['products']):
+            chunk = []
+            for number in range(start, end):
+                currency, _, median = rng.choices(currencies, currency_weights)[0]
+                sale_price = Decimal(max(round(median * rng.lognormvariate(0, 0.8), 2), 0.5)).quantize(Decimal('0.01'))
+                created_at = self.random_date()
+                chunk.append(Product(
+                    name=(
+                        f"{rng.choice(PRODUCT_NOUNS).capitalize()} {rng.choice(PRODUCT_BRANDS)} "
+                        f"{rng.choice(PRODUCT_ADJECTIVES)} {number}"
+                    ),
+                    description="Producto generado para pruebas de rendimiento",
+                    code=f"{PRODUCT_CODE_PREFIX}{number:08d}",
+                    category_id=rng.choice(self.categories),
+                    currency=currency,
+                    purchase_price=(sale_price * Decimal(rng.uniform(0.55, 0.9))).quantize(Decimal('0.01')),
+                    sale_price=sale_price,
+                    stock=int(rng.expovariate(1 / 60)),
+                    min_stock=5,
+                    is_active=rng.random() > 0.03,
+                    is_featured=rng.random() < 0.01,
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+            for product in self.insert('productos', chunk):
+                self.product_ids.append(product.pk)
+                self.product_cents.append(int(product.sale_price * 100))
+                self.product_cost_cents.append(int(product.purchase_price * 100))
+                self.product_currency.append(product.currency_id)
+        self.popularity = ZipfSampler(len(self.product_ids), self.zipf, rng) if self.product_ids else None
+
+    def create_users(self):
+        rng = self.rng
+        # Un solo hash para todos: calcularlo por usuario dominaría el tiempo de carga
+        password = make_password(SYNTHETIC_PASSWORD)
+        self.user_ids = array('q')
+        for start, end in self.chunks(self.sizes['users']):
+            chunk = []
+            for number in range(start, end):
+                joined = self.random_date()
+                chunk.append(User(
+                    username=f"{USERNAME_PREFIX}{number}",
+                    email=f"{USERNAME_PREFIX}{number}@example.com",
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    password=password,
+                    date_joined=joined,
+                ))
+            self.user_ids.extend(user.pk for user in self.insert('usuarios', chunk))
+
+    def basket(self):
+        """Productos y cantidades de una compra: [(índice de producto, cantidad)]"""
+        rng = self.rng
+        # Tamaño geométrico: la mayoría compra 1-3 productos distintos, pocos más de 10
+        size = min(1 + int(rng.expovariate(1 / 2.2)), 40)
+        lines = {}
+        for _ in range(size):
+            index = self.popularity.sample()
+            lines[index] = lines.get(index, 0) + (1 if rng.random() < 0.7 else rng.randint(2, 6))
+        return list(lines.items())
+
+    def create_carts(self):
+        if not self.user_ids or self.popularity is None:
+            return
+        user_ids = [user_id for user_id in self.user_ids if self.rng.random() < self.cart_ratio]
+        for start, end in self.chunks(len(user_ids)):
+            carts = self.insert('carritos', [Cart(user_id=user_id) for user_id in user_ids[start:end]])
+            items = [
+                CartItem(cart=cart, product_id=self.product_ids[index], quantity=quantity)
+                for cart in carts
+                for index, quantity in self.basket()
+            ]
+            self.insert('items de carrito', items)
+
+    def create_orders(self):
+        if not self.user_ids or self.popularity is None:
+            return
+        rng = self.rng
+        currencies = {currency.pk: currency for currency in self.currencies.values()}
+        statuses = list(ORDER_STATUS_WEIGHTS)
+        status_weights = list(ORDER_STATUS_WEIGHTS.values())
+        for start, end in self.chunks(self.sizes['orders']):
+            orders = []
+            baskets = []
+            for number in range(start, end):
+                basket = self.basket()
+                totals = {}
+                for index, quantity in basket:
+                    currency_id = self.product_currency[index]
+                    totals[currency_id] = totals.get(currency_id, 0) + self.product_cents[index] * quantity
+                totals = [
+                    (currencies[currency_id], Decimal(cents) / 100)
+                    for currency_id, cents in sorted(totals.items())
+                ]
+                total_amount = sum(
+                    (currency.convert(amount, self.settlement) for currency, amount in totals),
+                    Decimal('0'),
+                )
+                delivery = rng.random() < 0.4
+                created_at = self.random_date()
+                orders.append(Order(
+                    user_id=rng.choice(self.user_ids),
+                    order_number=f"{ORDER_NUMBER_PREFIX}{number:09d}",
+                    status=rng.choices(statuses, status_weights)[0],
+                    total_amount=total_amount.quantize(Decimal('0.01')),
+                    settlement_currency=self.settlement,
+                    delivery_type='delivery' if delivery else 'pickup',
+                    shipping_address=(
+                        f"Calle {rng.randint(1, 300)} #{rng.randint(1, 999)}, {rng.choice(MUNICIPALITIES)}"
+                        if delivery else ''
+                    ),
+                    phone=f"53{rng.randint(50000000, 59999999)}",
+                    whatsapp_sent=True,
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+                baskets.append((basket, totals))
+
+            orders = self.insert('órdenes', orders)
+            items = []
+            currency_totals = []
+            for order, (basket, totals) in zip(orders, baskets):
+                for index, quantity in basket:
+                    items.append(OrderItem(
+                        order=order,
+                        product_id=self.product_ids[index],
+                        quantity=quantity,
+                        price=Decimal(self.product_cents[index]) / 100,
+                        unit_cost=Decimal(self.product_cost_cents[index]) / 100,
+                    ))
+                for currency, amount in totals:
+                    currency_totals.append(OrderCurrencyTotal(
+                        order=order,
+                        currency=currency,
+                        amount=amount,
+                        settlement_amount=currency.convert(amount, self.settlement).quantize(Decimal('0.01')),
+                        created_at=order.created_at,
+                    ))
+            self.insert('items de orden', items)
+            self.insert('totales por moneda', currency_totals)
@@ -1,3 +1,1203 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.management.base import SystemCheckError
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from cuba_ecommerce.logs import JsonFormatter, QueueFileHandler, SamplingFilter
+from cuba_ecommerce.metrics import Registry, RequestMetrics
+from cuba_ecommerce.profiling import ProfileStore, make_token
+from cuba_ecommerce.routers import PIN_COOKIE, PrimaryReplicaRouter, ReplicaPinMiddleware
+from cuba_ecommerce import slowqueries
+from cuba_ecommerce.slowqueries import SlowQueryLog, normalize_sql
+
+from .cache import reference_cache
+from .exports import order_item_rows
+from .importers import ImportFileError, ProductImporter
+from .lite import page_weight
+from .loadtest import Recorder, Response as LoadResponse
+from .pricing import apply_adjustment, undo_adjustment
+from .reports import rebuild_sales, replenishment_report
+from .synthetic import SyntheticDataError, SyntheticDataGenerator, delete_synthetic_data
+from .triggers import ensure_triggers, missing_triggers
+from .models import (
+    Cart, CartItem, Category, Currency, DailySales, ImageBlob, LowStockAlert, Order, OrderCurrencyTotal,
+    PriceChangeBatch, Product,
+)
+
+
+def create_catalog():
+    """Moneda (la CUP que crean las migraciones) y categoría mínimas para crear productos"""
+    currency, _ = Currency.objects.get_or_create(code='CUP', defaults={'name': 'Peso cubano', 'symbol': '$'})
+    category = Category.objects.create(name='General')
+    return currency, category
+
+
+def create_product(currency, category, code='P-1', purchase_price='10.00', sale_price='15.00', stock=10, **kwargs):
+    return Product.objects.create(
+        name=kwargs.pop('name', f"Producto {code}"),
+        description="Producto de prueba",
+        code=code,
+        category=category,
+        currency=currency,
+        purchase_price=Decimal(purchase_price),
+        sale_price=Decimal(sale_price),
+        stock=stock,
+        **kwargs,
+    )
+
+
+class CurrencyTotalsTests(TestCase):
+    def setUp(self):
+        self.cup, self.category = create_catalog()
+        self.xts = Currency.objects.create(code='XTS', name='Prueba', symbol='T', exchange_rate=Decimal('300'))
+        self.user = User.objects.create_user('cliente')
+        self.cart = Cart.objects.create(user=self.user)
+        for code, currency, price, quantity in (('A', self.cup, '15.00', 2), ('B', self.xts, '10.00', 2), ('C', self.xts, '1.50', 1)):
+            product = create_product(currency, self.category, code=code, sale_price=price)
+            CartItem.objects.create(cart=self.cart, product=product, quantity=quantity)
+
+    def test_cart_totals_are_grouped_by_currency(self):
+        totals = [(currency.code, amount) for currency, amount in self.cart.totals_by_currency()]
+        self.assertEqual(totals, [('CUP', Decimal('30.00')), ('XTS', Decimal('21.50'))])
+        self.assertEqual(self.cart.total_in(self.cup), Decimal('6480.00'))
+
+    def test_order_keeps_the_breakdown_and_reports_skip_cancelled_orders(self):
+        for status in ('pending', 'cancelled'):
+            order = Order.objects.create(
+                user=self.user, total_amount=self.cart.total_in(self.cup), phone='5', status=status,
+            )
+            OrderCurrencyTotal.create_for_order(order, self.cart.totals_by_currency(), self.cup)
+        breakdown = {
+            total.currency.code: (total.amount, total.settlement_amount)
+            for total in Order.objects.get(status='pending').totals_by_currency()
+        }
+        self.assertEqual(breakdown, {
+            'CUP': (Decimal('30.00'), Decimal('30.00')),
+            'XTS': (Decimal('21.50'), Decimal('6450.00')),
+        })
+        revenue = {row['currency__code']: row['settlement_revenue'] for row in OrderCurrencyTotal.revenue_by_currency()}
+        self.assertEqual(revenue, {'CUP': Decimal('30.00'), 'XTS': Decimal('6450.00')})
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        currency, category = create_catalog()
+        user = User.objects.create_user('cliente')
+        self.orders = []
+        for number, status in enumerate(['pending', 'cancelled', 'delivered']):
+            order = Order.objects.create(user=user, total_amount=Decimal('30.00'), phone='5', status=status)
+            for code in ('A', 'B'):
+                product = Product.objects.filter(code=f"{code}{number}").first() or create_product(
+                    currency, category, code=f"{code}{number}",
+                )
+                order.orderitem_set.create(product=product, quantity=number + 1, price=Decimal('15.00'))
+            self.orders.append(order)
+
+    def test_rows_stream_one_line_per_item_with_a_constant_number_of_queries(self):
+        with self.assertNumQueries(1):
+            rows = list(order_item_rows(chunk_size=2))
+        self.assertEqual(rows[0][:3], ['orden', 'fecha', 'estado'])
+        self.assertEqual(len(rows), 7)
+        self.assertEqual([row[0] for row in rows[1:3]], [self.orders[0].order_number] * 2)
+
+    def test_filters_by_status_and_selection(self):
+        rows = list(order_item_rows(status='cancelled'))
+        self.assertEqual({row[0] for row in rows[1:]}, {self.orders[1].order_number})
+        rows = list(order_item_rows(orders=Order.objects.filter(pk=self.orders[2].pk)))
+        self.assertEqual([row[-2] for row in rows[1:]], [3, 3])
+
+    def test_admin_action_and_command_write_the_same_csv(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', None)
+        self.client.force_login(admin_user)
+        response = self.client.post(reverse('admin:store_order_changelist'), {
+            'action': 'export_as_csv',
+            '_selected_action': [order.pk for order in self.orders],
+        })
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        from_admin = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'ordenes.csv')
+            call_command('export_orders', output=path)
+            with open(path, newline='', encoding='utf-8') as file:
+                from_command = list(csv.reader(file))
+        self.assertEqual(len(from_admin), 7)
+        self.assertEqual(from_admin, from_command)
+
+
+class ProfitMarginTests(TestCase):
+    def setUp(self):
+        self.currency, self.category = create_catalog()
+
+    def margin(self, product):
+        return Product.objects.with_profit_margin().get(pk=product.pk).margin_pct
+
+    def test_whole_prices_are_not_divided_as_integers(self):
+        product = create_product(self.currency, self.category, purchase_price='15', sale_price='16')
+        self.assertEqual(self.margin(product), Decimal('6.67'))
+
+    def test_negative_and_zero_purchase_price(self):
+        loss = create_product(self.currency, self.category, code='P-2', purchase_price='20', sale_price='15')
+        free = create_product(self.currency, self.category, code='P-3', purchase_price='0', sale_price='5')
+        self.assertEqual(self.margin(loss), Decimal('-25.00'))
+        self.assertEqual(self.margin(free), Decimal('0'))
+
+    def test_ordering_matches_python_margin(self):
+        products = [
+            create_product(self.currency, self.category, code='A', purchase_price='15', sale_price='16'),
+            create_product(self.currency, self.category, code='B', purchase_price='15', sale_price='17'),
+            create_product(self.currency, self.category, code='C', purchase_price='3', sale_price='3.10'),
+        ]
+        ordered = list(
+            Product.objects.with_profit_margin().order_by('margin_pct').values_list('code', flat=True)
+        )
+        expected = [product.code for product in sorted(products, key=lambda product: product.profit_margin)]
+        self.assertEqual(ordered, expected)
+
+
+class ProductImporterTests(TestCase):
+    def setUp(self):
+        self.currency, self.category = create_catalog()
+
+    def run_import(self, content, file_format='csv'):
+        errors = io.StringIO()
+        report = ProductImporter(error_stream=errors).run(io.StringIO(content), file_format)
+        return report, errors.getvalue()
+
+    def jsonl(self, *records):
+        return ''.join(json.dumps(record) + '\n' for record in records)
+
+    def row(self, code, **fields):
+        return {
+            'code': code, 'name': f"Producto {code}", 'category': 'General', 'currency': 'CUP',
+            'purchase_price': '10', 'sale_price': '12', **fields,
+        }
+
+    def test_invalid_numbers_reject_the_row_only(self):
+        report, errors = self.run_import(
+            "code,name,category,currency,purchase_price,sale_price\n"
+            "A,Uno,General,CUP,NaN,5\n"
+            "B,Dos,General,CUP,1e30,5\n"
+            "C,Tres,General,CUP,-1,5\n"
+            "D,Cuatro,General,CUP,abc,5\n"
+            "E,Cinco,General,CUP,Infinity,5\n"
+            "F,Seis,General,CUP,10,12.5\n"
+        )
+        self.assertEqual((report.rows, report.created, report.rejected), (6, 1, 5))
+        self.assertEqual(list(Product.objects.values_list('code', flat=True)), ['F'])
+        self.assertIn('demasiado grande', errors)
+        self.assertIn('positivo', errors)
+
+    def test_unknown_references_and_missing_fields(self):
+        report, errors = self.run_import(self.jsonl(
+            self.row('A', category='Otra'),
+            self.row('B', currency='XXX'),
+            {'code': 'C', 'name': 'Sin precios', 'category': 'General', 'currency': 'CUP'},
+        ) + 'no es json\n', 'jsonl')
+        self.assertEqual((report.created, report.rejected), (0, 4))
+        self.assertIn('categoría desconocida', errors)
+        self.assertIn('moneda desconocida', errors)
+        self.assertIn('purchase_price: campo obligatorio', errors)
+        self.assertIn('JSON inválido', errors)
+
+    def test_invalid_optional_fields_and_limits(self):
+        report, errors = self.run_import(self.jsonl(
+            self.row('A', stock=10 ** 20),
+            self.row('B', stock='1.5'),
+            self.row('C', is_active='quizás'),
+            self.row('D' * 51),
+            self.row('E', purchase_price=float('nan')),
+            [1, 2],
+        ), 'jsonl')
+        self.assertEqual((report.created, report.rejected), (0, 6))
+        for message in ('entero demasiado grande', 'entero inválido', 'booleano inválido',
+                        'máximo 50 caracteres', 'número inválido', 'objeto JSON'):
+            self.assertIn(message, errors)
+
+    def latin1_file(self):
+        return (
+            "code,name,category,currency,purchase_price,sale_price\n"
+            "A,Uno,General,CUP,10,12\n"
+            "B,Café con leche,General,CUP,10,12\n"
+        ).encode('latin-1')
+
+    def test_unreadable_files_stop_with_an_import_file_error(self):
+        stream = io.TextIOWrapper(io.BytesIO(self.latin1_file()), encoding='utf-8-sig', newline='')
+        with self.assertRaisesMessage(ImportFileError, 'UTF-8'):
+            ProductImporter().run(stream, 'csv')
+        huge = "code,name,category,currency,purchase_price,sale_price\nA,\"" + 'x' * 200000 + "\",General,CUP,1,1\n"
+        with self.assertRaisesMessage(ImportFileError, 'CSV mal formado'):
+            ProductImporter().run(io.StringIO(huge), 'csv')
+
+    def test_command_reports_unreadable_files_and_removes_the_error_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'productos.csv')
+            with open(path, 'wb') as file:
+                file.write(self.latin1_file())
+            with self.assertRaisesMessage(CommandError, 'UTF-8'):
+                call_command('import_products', path, stdout=io.StringIO())
+            self.assertEqual(os.listdir(directory), ['productos.csv'])
+
+    def test_admin_reports_unreadable_files_and_removes_the_error_report(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', None)
+        self.client.force_login(admin_user)
+        with tempfile.TemporaryDirectory() as directory, self.settings(PRODUCT_IMPORT_DIR=directory):
+            response = self.client.post(
+                reverse('admin:store_product_import'),
+                {'file': SimpleUploadedFile('productos.csv', self.latin1_file())},
+                follow=True,
+            )
+            self.assertEqual(os.listdir(directory), [])
+        self.assertContains(response, 'Importación interrumpida')
+
+    def test_updates_only_touch_the_fields_of_each_row(self):
+        create_product(self.currency, self.category, code='A', stock=7, min_stock=2)
+        create_product(self.currency, self.category, code='B', stock=8, min_stock=3)
+        report, errors = self.run_import(self.jsonl(
+            self.row('A', stock=1),
+            self.row('B', min_stock=9),
+            self.row('C'),
+            self.row('D', stock=4),
+        ), 'jsonl')
+        self.assertEqual((report.created, report.updated, report.rejected), (2, 2, 0), errors)
+        stock = dict(Product.objects.values_list('code', 'stock'))
+        min_stock = dict(Product.objects.values_list('code', 'min_stock'))
+        self.assertEqual(stock, {'A': 1, 'B': 8, 'C': 0, 'D': 4})
+        self.assertEqual(min_stock['A'], 2)
+        self.assertEqual(min_stock['B'], 9)
+        self.assertEqual(Product.objects.get(code='B').sale_price, Decimal('12.00'))
+
+
+class VendorAssetCheckTests(TestCase):
+    def test_deploy_check_fails_until_the_assets_are_vendored(self):
+        with tempfile.TemporaryDirectory() as static_dir:
+            assets = {'bootstrap_css': ('vendor/bootstrap.min.css', 'https://cdn.example/bootstrap.min.css')}
+            with override_settings(STATICFILES_DIRS=[static_dir], VENDOR_ASSETS=assets):
+                with self.assertRaisesMessage(SystemCheckError, 'store.E001'):
+                    call_command('check', deploy=True, tags=['staticfiles'])
+                os.makedirs(os.path.join(static_dir, 'vendor'))
+                with open(os.path.join(static_dir, 'vendor', 'bootstrap.min.css'), 'w') as output:
+                    output.write('body{}')
+                call_command('check', deploy=True, tags=['staticfiles'], stdout=io.StringIO())
+
+
+def image_upload(name='foto.png', size=(400, 200), mode='RGBA', image_format='PNG'):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f"image/{image_format.lower()}")
+
+
+class ProductImageTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+        self.currency, self.category = create_catalog()
+
+    def test_renditions_are_generated_after_the_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = create_product(self.currency, self.category, image=image_upload())
+        product.refresh_from_db()
+
+        renditions = product.image_renditions
+        self.assertEqual(renditions['source'], product.image.name)
+        # Sin ampliar: el ancho de 640 no se genera para una imagen de 400
+        self.assertEqual(sorted(renditions['sizes']), ['160', '320'])
+        self.assertEqual(renditions['sizes']['160']['height'], 80)
+        for rendition in renditions['sizes'].values():
+            for extension in ('jpg', 'webp'):
+                self.assertTrue(os.path.exists(os.path.join(self.media.name, rendition[extension])))
+        self.assertEqual(product.get_rendition(200)['width'], 320)
+        self.assertIn('160w', product.get_image_srcset('webp'))
+
+    def test_oversized_images_are_logged_without_failing_the_save(self):
+        from PIL import Image
+
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            with self.assertLogs('store.images', 'ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    product = create_product(self.currency, self.category, image=image_upload(size=(100, 100)))
+        product.refresh_from_db()
+        self.assertEqual(product.image_renditions, {})
+        self.assertTrue(product.image)
+
+    def references(self):
+        return dict(ImageBlob.objects.values_list('name', 'ref_count'))
+
+    def test_identical_uploads_share_one_counted_file(self):
+        first = create_product(self.currency, self.category, code='A', image=image_upload('a.png'))
+        second = create_product(self.currency, self.category, code='B', image=image_upload('b.png'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.references(), {first.image.name: 2})
+
+        # Guardar otros campos no vuelve a leer la imagen anterior
+        with self.assertNumQueries(1):
+            second.stock = 3
+            second.save()
+        second = Product.objects.defer('image').get(pk=second.pk)
+        second.stock = 4
+        with self.assertNumQueries(1):
+            second.save()
+        self.assertEqual(self.references(), {first.image.name: 2})
+
+        second.image = image_upload('c.png', size=(300, 300))
+        second.save()
+        self.assertEqual(self.references(), {first.image.name: 1, second.image.name: 1})
+
+    def test_bulk_updates_and_deletions_release_references(self):
+        shared = create_product(self.currency, self.category, code='A', image=image_upload()).image.name
+        create_product(self.currency, self.category, code='B', image=image_upload())
+        other_category = Category.objects.create(name='Hogar')
+        other = create_product(self.currency, other_category, code='C', image=image_upload(size=(300, 300)))
+
+        Product.objects.filter(code='B').update(image=other.image.name)
+        self.assertEqual(self.references(), {shared: 1, other.image.name: 2})
+
+        Product.objects.filter(code__in=['A', 'B']).delete()
+        self.assertEqual(self.references(), {shared: 0, other.image.name: 1})
+
+        other_category.delete()
+        self.assertEqual(self.references(), {shared: 0, other.image.name: 0})
+
+
+class LowStockAlertTests(TestCase):
+    def setUp(self):
+        self.currency, self.category = create_catalog()
+        self.user = User.objects.create_user('cliente')
+
+    def sell(self, product, quantity, days_ago=0):
+        order = Order.objects.create(user=self.user, total_amount=Decimal('1.00'), phone='5')
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        order.orderitem_set.create(product=product, quantity=quantity, price=product.sale_price)
+        return order
+
+    def test_low_stock_follows_bulk_updates(self):
+        product = create_product(self.currency, self.category, stock=10, min_stock=5)
+        Product.objects.filter(pk=product.pk).update(stock=5)
+        self.assertTrue(Product.objects.get(pk=product.pk).low_stock)
+        Product.objects.filter(pk=product.pk).update(min_stock=2)
+        self.assertFalse(Product.objects.filter(low_stock=True).exists())
+
+    def test_emit_opens_one_alert_per_product_and_resolves_restocked_ones(self):
+        low = create_product(self.currency, self.category, code='A', stock=1)
+        create_product(self.currency, self.category, code='B', stock=50)
+        create_product(self.currency, self.category, code='C', stock=0, is_active=False)
+        LowStockAlert.open_for(low)
+
+        self.assertEqual(LowStockAlert.emit(), (0, 0))
+        self.assertEqual(LowStockAlert.objects.get().product, low)
+
+        Product.objects.filter(pk=low.pk).update(stock=20)
+        self.assertEqual(LowStockAlert.emit(), (0, 1))
+        Product.objects.filter(pk=low.pk).update(stock=0)
+        self.assertEqual(LowStockAlert.emit(), (1, 0))
+        self.assertEqual(LowStockAlert.objects.filter(resolved_at__isnull=True).count(), 1)
+
+    def test_report_ranks_by_recent_sales_and_suggests_quantities(self):
+        slow = create_product(self.currency, self.category, code='LENTO', stock=2, min_stock=5)
+        fast = create_product(self.currency, self.category, code='RAPIDO', stock=4, min_stock=5)
+        self.sell(slow, 3)
+        self.sell(fast, 30)
+        self.sell(slow, 100, days_ago=60)
+        cancelled = self.sell(fast, 100)
+        Order.objects.filter(pk=cancelled.pk).update(status='cancelled')
+
+        rows = replenishment_report(days=30, lead_days=7)
+
+        self.assertEqual([row['product'].code for row in rows], ['RAPIDO', 'LENTO'])
+        self.assertEqual(rows[0]['units_sold'], 30)
+        self.assertEqual(rows[0]['velocity'], Decimal('1.00'))
+        self.assertEqual(rows[0]['suggested_quantity'], 9)
+        self.assertEqual(rows[1]['units_sold'], 3)
+
+    def test_command_emits_and_prints_the_report(self):
+        create_product(self.currency, self.category, code='BAJO', stock=1)
+        out = io.StringIO()
+        call_command('emit_low_stock_alerts', report=True, stdout=out)
+        self.assertIn('1 alertas nuevas', out.getvalue())
+        self.assertIn('BAJO', out.getvalue())
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.currency, self.category = create_catalog()
+        self.product = create_product(self.currency, self.category, stock=5)
+        self.user = User.objects.create_user('cliente', password='clave-segura')
+        self.client.force_login(self.user)
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+
+    def checkout(self):
+        return self.client.post(reverse('checkout'), {'phone': '55555555', 'delivery_type': 'pickup'})
+
+    def test_checkout_decrements_stock_and_records_sales(self):
+        self.checkout()
+        order = Order.objects.get()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+        self.assertEqual(DailySales.objects.get().orders, 1)
+        self.assertFalse(Cart.objects.exists())
+        self.assertEqual(order.orderitem_set.get().quantity, 2)
+
+    def test_failure_rolls_back_the_whole_checkout(self):
+        with mock.patch('store.views.record_order_sales', side_effect=RuntimeError('fallo')):
+            self.checkout()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+        self.assertFalse(Order.objects.exists())
+        self.assertTrue(CartItem.objects.exists())
+
+    def test_cancelling_an_order_rebuilds_its_day(self):
+        self.checkout()
+        order = Order.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = 'cancelled'
+            order.save()
+        self.assertFalse(DailySales.objects.exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = 'pending'
+            order.save()
+        self.assertEqual(DailySales.objects.get().orders, 1)
+
+    def test_rebuilt_cost_uses_the_purchase_price_of_the_sale(self):
+        self.checkout()
+        Product.objects.filter(pk=self.product.pk).update(purchase_price=Decimal('12.00'))
+        rebuild_sales(timezone.localdate())
+        self.assertEqual(Order.objects.get().orderitem_set.get().unit_cost, Decimal('10.00'))
+        self.assertEqual(DailySales.objects.get().cost, Decimal('20.00'))
+
+    def test_bulk_status_changes_rebuild_the_day(self):
+        self.checkout()
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.update(status='cancelled')
+        self.assertFalse(DailySales.objects.exists())
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            # Sin cruzar los estados excluidos no hay nada que recalcular
+            Order.objects.update(status='cancelled')
+        self.assertEqual(callbacks, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.update(status='processing')
+        self.assertEqual(DailySales.objects.get().orders, 1)
+
+    def test_admin_cancel_action_rebuilds_the_day(self):
+        self.checkout()
+        admin_user = User.objects.create_superuser('admin', None, 'clave-segura')
+        self.client.force_login(admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:store_order_changelist'), {
+                'action': 'mark_as_cancelled',
+                '_selected_action': [Order.objects.get().pk],
+            })
+        self.assertEqual(Order.objects.get().status, 'cancelled')
+        self.assertFalse(DailySales.objects.exists())
+
+
+class PriceAdjustmentUndoTests(TestCase):
+    def setUp(self):
+        self.currency, self.category = create_catalog()
+        self.first = create_product(self.currency, self.category, code='A', sale_price='10.00', stock=10)
+        self.second = create_product(self.currency, self.category, code='B', sale_price='20.00', stock=2)
+
+    def values(self, field):
+        return dict(Product.objects.values_list('code', field))
+
+    def test_stock_undo_keeps_later_movements(self):
+        batch = apply_adjustment(Product.objects.all(), 'stock', Decimal('5'))
+        Product.objects.filter(code='A').update(stock=12)
+        self.assertEqual(undo_adjustment(batch), (2, 0))
+        self.assertEqual(self.values('stock'), {'A': 7, 'B': 2})
+
+    def test_stock_undo_of_a_clamped_decrease(self):
+        batch = apply_adjustment(Product.objects.all(), 'stock', Decimal('-5'))
+        self.assertEqual(self.values('stock'), {'A': 5, 'B': 0})
+        undo_adjustment(batch)
+        self.assertEqual(self.values('stock'), {'A': 10, 'B': 2})
+
+    def test_price_undo_skips_prices_changed_afterwards(self):
+        batch = apply_adjustment(Product.objects.all(), 'percent', Decimal('10'))
+        self.assertEqual(self.values('sale_price'), {'A': Decimal('11.00'), 'B': Decimal('22.00')})
+        Product.objects.filter(code='B').update(sale_price=Decimal('25.00'))
+        self.assertEqual(undo_adjustment(batch), (1, 1))
+        self.assertEqual(self.values('sale_price'), {'A': Decimal('10.00'), 'B': Decimal('25.00')})
+
+    def test_a_batch_is_undone_only_once(self):
+        batch = apply_adjustment(Product.objects.all(), 'stock', Decimal('5'))
+        stale = PriceChangeBatch.objects.get(pk=batch.pk)
+        self.assertEqual(undo_adjustment(batch), (2, 0))
+        self.assertEqual(undo_adjustment(stale), (0, 0))
+        self.assertEqual(self.values('stock'), {'A': 10, 'B': 2})
+
+
+class ReferenceCacheInvalidationTests(TestCase):
+    def setUp(self):
+        reference_cache.backend.clear()
+        reference_cache.local.clear()
+        self.currency, self.category = create_catalog()
+
+    def test_queryset_update_invalidates_currencies(self):
+        other = Currency.objects.create(code='XTS', name='Prueba', symbol='T', exchange_rate=300)
+        with self.captureOnCommitCallbacks(execute=True):
+            Currency.objects.update(is_default=False)
+            Currency.objects.filter(pk=self.currency.pk).update(is_default=True)
+        self.assertEqual(Currency.get_default(), self.currency)
+        with self.captureOnCommitCallbacks(execute=True):
+            Currency.objects.bulk_update([Currency(pk=other.pk, is_default=True)], ['is_default'])
+            Currency.objects.filter(pk=self.currency.pk).update(is_default=False)
+        self.assertEqual(Currency.get_default(), other)
+
+    def test_invalidation_waits_for_the_commit(self):
+        self.assertEqual([category.name for category in Category.get_cached_list()], ['General'])
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                Category.objects.create(name='Hogar')
+                Category.objects.bulk_create([Category(name='Jardín')])
+            # Sin confirmar todavía: la caché sigue con la lista anterior
+            self.assertEqual(len(Category.get_cached_list()), 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(Category.get_cached_list()), 3)
+
+
+class SyntheticDataResetTests(TestCase):
+    def test_reset_keeps_real_orders_and_rebuilds_their_days(self):
+        currency, category = create_catalog()
+        product = create_product(currency, category)
+        user = User.objects.create_user('cliente')
+        # Un número real (8 caracteres aleatorios) puede empezar por SYN
+        order = Order.objects.create(user=user, order_number='SYN4K2QZ', total_amount=Decimal('30.00'), phone='5')
+        order.orderitem_set.create(product=product, quantity=2, price=Decimal('15.00'))
+        SyntheticDataGenerator(seed=1, products=20, users=5, orders=30, days=3).run()
+        for day in Order.objects.dates('created_at', 'day'):
+            rebuild_sales(day)
+        self.assertGreater(DailySales.objects.count(), 1)
+
+        deleted, days = delete_synthetic_data()
+
+        self.assertEqual(list(Order.objects.values_list('order_number', flat=True)), ['SYN4K2QZ'])
+        self.assertGreater(days, 0)
+        self.assertEqual(deleted['Órdenes'], 30)
+        sales = DailySales.objects.get()
+        self.assertEqual((sales.orders, sales.units, sales.revenue), (1, 2, Decimal('30.00')))
+
+    def test_reset_refuses_when_real_orders_use_synthetic_products(self):
+        create_catalog()
+        SyntheticDataGenerator(seed=1, products=5, users=2, orders=4, days=2).run()
+        synthetic = Product.objects.filter(code__startswith='SYN-').first()
+        user = User.objects.create_user('cliente')
+        order = Order.objects.create(user=user, total_amount=Decimal('15.00'), phone='5')
+        order.orderitem_set.create(product=synthetic, quantity=1, price=Decimal('15.00'))
+
+        with self.assertRaisesMessage(SyntheticDataError, order.order_number):
+            delete_synthetic_data()
+        with self.assertRaisesMessage(CommandError, order.order_number):
+            call_command('generate_synthetic_data', reset=True, products=1, users=1, orders=1)
+        self.assertEqual(order.orderitem_set.count(), 1)
+        self.assertEqual(Order.objects.count(), 5)
+
+
+class CatalogApiTests(TestCase):
+    def setUp(self):
+        self.currency, self.category = create_catalog()
+        self.products = [create_product(self.currency, self.category, code=f"API-{n}") for n in range(5)]
+        create_product(self.currency, self.category, code='INACTIVO', is_active=False)
+
+    def get(self, name='api_product_list', args=(), **params):
+        return self.client.get(reverse(name, args=args), params)
+
+    def test_only_the_requested_fields_are_returned(self):
+        rows = self.get(fields='price, code').json()['results']
+        self.assertEqual(rows[0], {'code': 'API-0', 'price': '15.00'})
+        self.assertEqual(list(self.get().json()['results'][0]), [
+            'id', 'code', 'name', 'category', 'currency', 'price', 'stock',
+        ])
+        response = self.get(fields='code,purchase_price')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('purchase_price', response.json()['error'])
+
+        detail = self.get('api_product_detail', [self.products[0].pk], fields='name').json()
+        self.assertEqual(detail, {'name': 'Producto API-0'})
+        self.assertEqual(self.get('api_product_detail', [999999]).status_code, 404)
+
+    def test_keyset_pagination_follows_next(self):
+        codes = []
+        data = self.get(limit=2, fields='code')
+        pages = 0
+        while True:
+            data = data.json()
+            codes += [row['code'] for row in data['results']]
+            pages += 1
+            if not data['next']:
+                break
+            self.assertIn('fields=code', data['next'])
+            data = self.client.get(data['next'])
+        self.assertEqual(pages, 3)
+        self.assertEqual(codes, [f"API-{n}" for n in range(5)])
+        self.assertEqual(self.get(limit=0).status_code, 400)
+        self.assertEqual(self.get(after='x').status_code, 400)
+
+    def test_unchanged_responses_are_not_modified(self):
+        response = self.get()
+        etag = response['ETag']
+        self.assertIn('max-age=60', response['Cache-Control'])
+
+        response = self.client.get(reverse('api_product_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        Product.objects.filter(pk=self.products[0].pk).update(stock=1)
+        response = self.client.get(reverse('api_product_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class CatalogSyncTests(TestCase):
+    def setUp(self):
+        self.currency, self.category = create_catalog()
+        self.first = create_product(self.currency, self.category, code='A')
+        self.second = create_product(self.currency, self.category, code='B')
+
+    def sync(self, since=0, **params):
+        response = self.client.get(reverse('api_catalog_changes'), {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def full_sync(self):
+        data = self.sync()
+        products = {row['code'] for row in data['products']}
+        while data['more']:
+            data = self.sync(data['cursor'])
+            products |= {row['code'] for row in data['products']}
+        return data['cursor'], products
+
+    def test_full_sync_then_only_changes(self):
+        cursor, products = self.full_sync()
+        self.assertEqual(products, {'A', 'B'})
+        self.assertEqual(self.sync(cursor)['products'], [])
+
+        Product.objects.filter(pk=self.first.pk).update(sale_price=Decimal('99.00'))
+        data = self.sync(cursor)
+        self.assertEqual([row['code'] for row in data['products']], ['A'])
+        self.assertGreater(data['cursor'], cursor)
+        self.assertEqual(self.sync(data['cursor'])['products'], [])
+
+    def test_pages_follow_the_cursor(self):
+        cursor, _ = self.full_sync()
+        Product.objects.update(stock=1)
+        first = self.sync(cursor, limit=1)
+        self.assertTrue(first['more'])
+        second = self.sync(first['cursor'], limit=1)
+        self.assertFalse(second['more'])
+        codes = [row['code'] for row in first['products'] + second['products']]
+        self.assertEqual(sorted(codes), ['A', 'B'])
+
+    def test_deleted_and_inactive_products_are_tombstones(self):
+        cursor, _ = self.full_sync()
+        first_id, second_id = self.first.pk, self.second.pk
+        self.first.delete()
+        Product.objects.filter(pk=second_id).update(is_active=False)
+        data = self.sync(cursor)
+        self.assertEqual(data['products'], [])
+        self.assertEqual(data['deleted']['products'], [first_id, second_id])
+        # Una descarga completa no envía lápidas
+        self.assertEqual(self.full_sync()[1], set())
+        self.assertEqual(self.sync()['deleted']['products'], [])
+
+    def test_cursor_past_the_log_asks_for_a_reset(self):
+        cursor, _ = self.full_sync()
+        self.assertEqual(self.sync(cursor + 1000), {'reset': True, 'cursor': 0, 'more': False})
+
+    def test_triggers_dropped_by_a_migration_are_recreated(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER store_product_change_update")
+        self.assertEqual(missing_triggers(connection), ['store_product_change_update'])
+        ensure_triggers(sender=None, using='default', verbosity=0)
+        self.assertEqual(missing_triggers(connection), [])
+        cursor, _ = self.full_sync()
+        Product.objects.filter(pk=self.second.pk).update(name='Otro nombre')
+        self.assertEqual([row['code'] for row in self.sync(cursor)['products']], ['B'])
+
+
+class LitePageWeightTests(TestCase):
+    def setUp(self):
+        currency, category = create_catalog()
+        # Páginas llenas: más productos (y destacados) de los que caben en una
+        for number in range(60):
+            create_product(
+                currency, category, code=f"L-{number:03d}", is_featured=number % 2 == 0,
+                name=f"Producto con un nombre bastante largo para la prueba {number}",
+            )
+
+    def test_lite_pages_fit_their_budget(self):
+        for url_name in ('home', 'product_list'):
+            with self.subTest(url_name):
+                budget = settings.LITE_PAGE_BUDGETS[url_name]
+                response = self.client.get(reverse(url_name), {'lite': '1'})
+                self.assertEqual(response.status_code, 200)
+                weight = page_weight(response.content)
+                self.assertEqual(weight['external'], [])
+                self.assertLessEqual(weight['total'], budget)
+                # Que la página ligera de verdad pese menos que la completa
+                full = page_weight(self.client.get(reverse(url_name), {'lite': '0'}).content)
+                self.assertLess(weight['html'], full['html'])
+
+    def test_only_pages_with_a_lite_version_vary_on_save_data(self):
+        response = self.client.get(reverse('product_list'), HTTP_SAVE_DATA='on')
+        self.assertIn('Save-Data', response['Vary'])
+        for url_name in ('api_product_list', 'pwa_manifest', 'service_worker'):
+            with self.subTest(url_name):
+                response = self.client.get(reverse(url_name))
+                self.assertNotIn('Save-Data', response.get('Vary', ''))
+
+
+class OfflineQueueCsrfTests(TestCase):
+    def setUp(self):
+        currency, category = create_catalog()
+        self.product = create_product(currency, category)
+        self.user = User.objects.create_user('cliente', password='clave-segura')
+        self.client = self.client_class(enforce_csrf_checks=True)
+
+    def test_replayed_actions_use_the_current_token(self):
+        script = self.client.get(reverse('service_worker')).content.decode()
+        self.assertIn(f"const CSRF_URL = '{reverse('pwa_csrf_token')}';", script)
+
+        stale = self.client.get(reverse('pwa_csrf_token')).json()['token']
+        self.client.post(reverse('login'), {
+            'username': 'cliente', 'password': 'clave-segura', 'csrfmiddlewaretoken': stale,
+        })
+        # Iniciar sesión rota el token: el encolado antes ya no sirve
+        url = reverse('add_to_cart', args=[self.product.pk])
+        self.assertEqual(self.client.post(url, {'csrfmiddlewaretoken': stale, 'quantity': 1}).status_code, 403)
+
+        response = self.client.get(reverse('pwa_csrf_token'))
+        self.assertIn('no-store', response['Cache-Control'])
+        token = response.json()['token']
+        response = self.client.post(url, {'csrfmiddlewaretoken': token, 'quantity': 1})
+        self.assertRedirects(response, reverse('cart'), fetch_redirect_response=False)
+
+
+class SessionPersistenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cliente', password='clave-segura')
+
+    def stored_session(self):
+        return Session.objects.get(session_key=self.client.session.session_key).get_decoded()
+
+    def test_login_survives_a_cache_flush(self):
+        self.client.login(username='cliente', password='clave-segura')
+        self.assertEqual(self.stored_session()[SESSION_KEY], str(self.user.pk))
+        cache.clear()
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_other_changes_wait_for_the_write_behind_window(self):
+        self.client.login(username='cliente', password='clave-segura')
+        session = self.client.session
+        session['visto'] = True
+        session.save()
+        self.assertNotIn('visto', self.stored_session())
+        self.assertTrue(self.client.session['visto'])
+
+    async def test_async_login_is_written_through(self):
+        await self.async_client.aforce_login(self.user)
+        session_key = self.async_client.cookies[settings.SESSION_COOKIE_NAME].value
+        stored = await Session.objects.aget(session_key=session_key)
+        self.assertEqual(stored.get_decoded()[SESSION_KEY], str(self.user.pk))
+
+
+class PersistentConnectionTests(TestCase):
+    def conn_max_age(self, module):
+        code = (
+            f"import {module}\n"
+            "from django.conf import settings\n"
+            "print(sorted({db['CONN_MAX_AGE'] for db in settings.DATABASES.values()}))"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='cuba_ecommerce.settings', DATABASE_REPLICAS='1')
+        env.pop('DJANGO_SERVER_INTERFACE', None)
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, check=True,
+        )
+        return result.stdout.strip()
+
+    def test_connections_persist_only_under_wsgi(self):
+        self.assertEqual(self.conn_max_age('cuba_ecommerce.wsgi'), '[600]')
+        self.assertEqual(self.conn_max_age('cuba_ecommerce.asgi'), '[0]')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def handle(self, request, writes=()):
+        """Pasa la petición por ReplicaPinMiddleware y devuelve las bases de lectura vistas por la vista"""
+        seen = {}
+
+        def view(request):
+            seen['product'] = self.router.db_for_read(Product)
+            seen['cart'] = self.router.db_for_read(Cart)
+            for model in writes:
+                self.router.db_for_write(model)
+            return HttpResponse()
+
+        return seen, ReplicaPinMiddleware(view)(request)
+
+    def test_catalog_reads_of_safe_requests_go_to_a_replica(self):
+        seen, response = self.handle(self.factory.get('/'))
+        self.assertEqual(seen, {'product': 'replica1', 'cart': 'default'})
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        seen, _ = self.handle(self.factory.post('/'))
+        self.assertEqual(seen['product'], 'default')
+        # Fuera de una petición se lee de la principal
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+
+    def test_only_writes_the_client_reads_back_pin_the_primary(self):
+        _, response = self.handle(self.factory.get('/'), writes=[Session, User])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        _, response = self.handle(self.factory.post('/'), writes=[CartItem])
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 5)
+        self.assertTrue(cookie['httponly'])
+
+    def test_pin_lasts_until_the_cookie_expires(self):
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        seen, _ = self.handle(request)
+        self.assertEqual(seen['product'], 'default')
+        # Vencido el max-age el navegador ya no envía la cookie
+        seen, _ = self.handle(self.factory.get('/'))
+        self.assertEqual(seen['product'], 'replica1')
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.currency, self.category = create_catalog()
+        self.product = create_product(self.currency, self.category, code='MANGO-1', name='Mango', is_featured=True)
+        create_product(self.currency, self.category, code='PINA-1', name='Piña')
+        create_product(self.currency, self.category, code='OCULTO', name='Mango viejo', is_active=False)
+        self.user = User.objects.create_user('cliente', password='clave-segura')
+
+    async def test_catalog_pages_render_under_asgi(self):
+        response = await self.async_client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product.code for product in response.context['featured_products']], ['MANGO-1'])
+
+        response = await self.async_client.get(reverse('product_list'), {'search': 'mango'})
+        self.assertEqual([product.code for product in response.context['products']], ['MANGO-1'])
+        self.assertEqual(response.context['products'].paginator.count, 1)
+
+        response = await self.async_client.get(reverse('product_detail', args=[self.product.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product.code for product in response.context['related_products']], ['PINA-1'])
+        hidden = await Product.objects.aget(code='OCULTO')
+        response = await self.async_client.get(reverse('product_detail', args=[hidden.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_templates_see_the_logged_in_user(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('home'))
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_autocomplete_is_cached_and_skips_inactive_products(self):
+        url = reverse('product_autocomplete')
+        self.assertEqual(self.client.get(url, {'q': 'm'}).json(), {'results': []})
+        results = self.client.get(url, {'q': 'mAn'}).json()['results']
+        self.assertEqual([row['code'] for row in results], ['MANGO-1'])
+        self.assertEqual(results[0]['price'], f"{self.currency.symbol}15.00")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, {'q': 'man'}).json()['results'], results)
+
+    async def test_cart_count(self):
+        response = await self.async_client.get(reverse('cart_count'))
+        self.assertEqual(response.status_code, 302)
+        cart = await Cart.objects.acreate(user=self.user)
+        await CartItem.objects.acreate(cart=cart, product=self.product, quantity=3)
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('cart_count'))
+        self.assertEqual(response.json(), {'count': 1})
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        currency, category = create_catalog()
+        create_product(currency, category)
+
+    def test_responses_carry_server_timing(self):
+        response = self.client.get(reverse('product_list'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ consultas", tpl;dur=[\d.]+$')
+        self.assertNotIn('desc="0 consultas"', timing)
+
+    def test_histograms_are_cumulative(self):
+        registry = Registry()
+        metrics = RequestMetrics()
+        metrics.queries = 3
+        for duration in (0.004, 0.02, 3):
+            registry.observe('tienda:"lista"', 'GET', 200, duration, metrics)
+        text = registry.render()
+        labels = 'view="tienda:\\"lista\\"",method="GET"'
+        self.assertIn(f'django_request_duration_seconds_bucket{{{labels},le="0.005"}} 1', text)
+        self.assertIn(f'django_request_duration_seconds_bucket{{{labels},le="0.025"}} 2', text)
+        self.assertIn(f'django_request_duration_seconds_bucket{{{labels},le="2.5"}} 2', text)
+        self.assertIn(f'django_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3', text)
+        self.assertIn(f'django_request_queries_bucket{{{labels},le="5"}} 3', text)
+        self.assertIn(f'django_responses_total{{{labels},status="200"}} 3', text)
+
+    @override_settings(METRICS_TOKEN='secreto')
+    def test_endpoint_is_for_staff_or_the_token(self):
+        url = reverse('metrics')
+        self.client.get(reverse('product_list'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('view="product_list",method="GET"', response.content.decode())
+        self.assertIn('refcache_lookups_total{result="miss"}', response.content.decode())
+
+        self.client.force_login(User.objects.create_user('personal', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class StorefrontBenchmarkTests(TestCase):
+    def test_redirects_count_as_errors_unless_expected(self):
+        recorder = Recorder(lambda path: path)
+        cart = LoadResponse(302, [('location', '/cart/')], b'')
+        product = LoadResponse(302, [('location', '/product/7/')], b'')
+        page = LoadResponse(200, [('server-timing', 'db;dur=1.0;desc="4 consultas"')], b'')
+        recorder.record('/add/', cart, 0.01, expect_redirect='/cart/')
+        # Sin stock: add_to_cart vuelve al producto
+        recorder.record('/add/', product, 0.01, expect_redirect='/cart/')
+        recorder.record('/add/', page, 0.01, expect_redirect='/cart/')
+        # Checkout fallido: redirige al carrito en vez de mostrar la orden
+        recorder.record('/checkout/', cart, 0.01)
+        recorder.record('/checkout/', page, 0.01)
+        recorder.record('/checkout/', LoadResponse(500, [], b''), 0.01)
+        recorder.record('/checkout/', None, 0.01)
+
+        self.assertEqual(recorder.entries['/add/']['errors'], 2)
+        self.assertEqual(len(recorder.entries['/add/']['latencies']), 1)
+        self.assertEqual(recorder.entries['/checkout/']['errors'], 3)
+        self.assertEqual(recorder.entries['/checkout/']['queries'], [4])
+
+    def test_refuses_to_run_on_a_configured_or_existing_database(self):
+        with self.assertRaisesMessage(CommandError, 'base configurada'):
+            call_command(
+                'bench_storefront', servers='wsgi', database_file=connection.settings_dict['NAME'],
+            )
+        with tempfile.NamedTemporaryFile(suffix='.sqlite3') as existing:
+            with self.assertRaisesMessage(CommandError, 'ya existe'):
+                call_command('bench_storefront', servers='wsgi', database_file=existing.name)
+        with self.assertRaises(CommandError):
+            call_command('bench_storefront', servers='wsgi')
+
+
+def log_record(message='hola', level=logging.INFO, **extra):
+    return logging.makeLogRecord({
+        'name': 'prueba', 'levelno': level, 'levelname': logging.getLevelName(level), 'msg': message, **extra,
+    })
+
+
+class LoggingPipelineTests(SimpleTestCase):
+    def test_json_lines_carry_the_request_id_and_extra_fields(self):
+        try:
+            raise ValueError('fallo')
+        except ValueError:
+            record = log_record('pedido %s', args=('A1',), request_id='req-12345678', status=500,
+                                exc_info=sys.exc_info())
+        data = json.loads(JsonFormatter().format(record))
+        self.assertEqual(data['message'], 'pedido A1')
+        self.assertEqual(data['level'], 'INFO')
+        self.assertEqual(data['request_id'], 'req-12345678')
+        self.assertEqual(data['status'], 500)
+        self.assertIn('ValueError: fallo', data['exception'])
+        self.assertTrue(data['time'].endswith('+00:00'))
+
+    def test_sampling_keeps_or_drops_whole_requests(self):
+        sampler = SamplingFilter(rate=0.5)
+        request_ids = [f"peticion-{number:04d}" for number in range(200)]
+        kept = [rid for rid in request_ids if sampler.filter(log_record(request_id=rid))]
+        self.assertTrue(0 < len(kept) < len(request_ids))
+        for rid in request_ids:
+            decisions = {sampler.filter(log_record(f"mensaje {n}", request_id=rid)) for n in range(5)}
+            self.assertEqual(decisions, {rid in kept})
+        # Los avisos y errores no se muestrean
+        self.assertTrue(SamplingFilter(rate=0).filter(log_record(level=logging.WARNING, request_id='x' * 8)))
+        self.assertFalse(SamplingFilter(rate=0).filter(log_record(request_id='x' * 8)))
+
+    def test_a_full_queue_drops_records_and_reports_how_many(self):
+        with tempfile.TemporaryDirectory() as directory:
+            handler = QueueFileHandler(os.path.join(directory, 'logs', 'app.log'), queue_size=2)
+            # Sin el hilo de fondo la cola no se vacía
+            handler.listener.stop()
+            handler.listener = None
+            self.addCleanup(handler.file_handler.close)
+            for number in range(5):
+                handler.emit(log_record(f"mensaje {number}"))
+            self.assertEqual(handler.dropped, 3)
+
+            self.assertEqual(handler.queue.get_nowait().msg, 'mensaje 0')
+            self.assertEqual(handler.queue.get_nowait().msg, 'mensaje 1')
+            handler.emit(log_record('mensaje 5'))
+            notice = handler.queue.get_nowait()
+            self.assertEqual((notice.levelname, notice.dropped), ('WARNING', 3))
+            self.assertEqual(handler.queue.get_nowait().msg, 'mensaje 5')
+            self.assertEqual(handler.dropped, 0)
+
+    def test_requests_get_an_id(self):
+        response = self.client.get(reverse('pwa_manifest'), HTTP_X_REQUEST_ID='proxy-1234abcd')
+        self.assertEqual(response['X-Request-ID'], 'proxy-1234abcd')
+        response = self.client.get(reverse('pwa_manifest'), HTTP_X_REQUEST_ID='no válido')
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+
+class ProfilingTokenTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(PROFILING={'DIR': directory.name, 'SAMPLE_EVERY': 0})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.store = ProfileStore(directory.name, 100)
+        self.staff = User.objects.create_user('personal', password='clave-segura', is_staff=True)
+        self.token = make_token(self.staff)
+
+    def get(self, user=None):
+        if user is not None:
+            self.client.force_login(user)
+        return self.client.get(reverse('product_list'), HTTP_X_PROFILE=self.token)
+
+    def test_token_is_only_honoured_for_the_staff_member_who_made_it(self):
+        self.get()
+        self.get(User.objects.create_user('otro', is_staff=True))
+        self.assertEqual(self.store.list(), [])
+        self.get(self.staff)
+        [profile] = self.store.list()
+        self.assertEqual(profile['trigger'], f"token:{self.staff.pk}")
+
+    def test_token_stops_working_when_the_user_leaves_the_staff(self):
+        User.objects.filter(pk=self.staff.pk).update(is_staff=False)
+        self.get(self.staff)
+        self.assertEqual(self.store.list(), [])
+
+    def test_a_failed_save_does_not_break_the_response(self):
+        with mock.patch.object(ProfileStore, 'save', side_effect=OSError('disco lleno')):
+            with self.assertLogs('cuba_ecommerce.profiling', 'ERROR'):
+                response = self.get(self.staff)
+        self.assertEqual(response.status_code, 200)
+
+
+def slow_entry(fingerprint, duration_ms=150.0, view='store:home'):
+    return {
+        'time': timezone.now(),
+        'duration_ms': duration_ms,
+        'fingerprint': fingerprint,
+        'normalized': f"SELECT {fingerprint}",
+        'view': view,
+    }
+
+
+class SlowQueryLogTests(SimpleTestCase):
+    def test_literals_and_in_lists_are_normalized(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM p WHERE name = 'O''Brien' AND price > 12.50 AND id IN (%s, %s, %s)"),
+            "SELECT * FROM p WHERE name = ? AND price > ? AND id IN (...)",
+        )
+        # Listas de IN de distinta longitud dan la misma huella
+        self.assertEqual(
+            normalize_sql('SELECT * FROM p WHERE id IN (1, 2)'),
+            normalize_sql('SELECT *\n  FROM p WHERE id IN (7,8,9,10)'),
+        )
+
+    def test_numbers_inside_identifiers_are_kept(self):
+        self.assertEqual(normalize_sql('SELECT t1.col2 FROM store_t1 t1 LIMIT 21'), 'SELECT t1.col2 FROM store_t1 t1 LIMIT ?')
+
+    def test_the_ring_buffer_keeps_the_latest_entries(self):
+        log = SlowQueryLog(max_entries=3, max_fingerprints=10)
+        for index in range(5):
+            log.record(slow_entry('a', duration_ms=index))
+        fingerprints, entries = log.summary()
+        self.assertEqual([entry['duration_ms'] for entry in entries], [4, 3, 2])
+        # Los totales por huella cuentan también las entradas desalojadas
+        self.assertEqual(fingerprints[0]['count'], 5)
+
+    def test_the_fingerprint_with_least_total_time_is_evicted(self):
+        log = SlowQueryLog(max_entries=10, max_fingerprints=2)
+        self.assertTrue(log.record(slow_entry('a', duration_ms=500)))
+        self.assertTrue(log.record(slow_entry('b', duration_ms=100)))
+        self.assertFalse(log.record(slow_entry('a', duration_ms=500)))
+        self.assertTrue(log.record(slow_entry('c', duration_ms=200)))
+        fingerprints, _ = log.summary()
+        self.assertEqual([stats['fingerprint'] for stats in fingerprints], ['a', 'c'])
+
+    def test_resize_keeps_the_most_recent_entries(self):
+        log = SlowQueryLog(max_entries=5, max_fingerprints=10)
+        for index in range(5):
+            log.record(slow_entry('a', duration_ms=index))
+        log.resize(2, 10)
+        self.assertEqual([entry['duration_ms'] for entry in log.summary()[1]], [4, 3])
+
+
+class SlowQueryRecordingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.currency, cls.category = create_catalog()
+        create_product(cls.currency, cls.category, code='A-1')
+
+    def setUp(self):
+        slowqueries.slow_query_log.clear()
+        self.addCleanup(slowqueries.slow_query_log.clear)
+        self.assertIn(slowqueries.record_slow_query, connection.execute_wrappers)
+
+    def recorded(self):
+        _, entries = slowqueries.slow_query_log.summary()
+        return [entry for entry in entries if 'store_product' in entry['sql']]
+
+    def test_the_threshold_is_read_on_every_query(self):
+        with override_settings(SLOW_QUERY_LOG={'THRESHOLD_MS': 60_000}):
+            list(Product.objects.filter(code='A-1'))
+        self.assertEqual(self.recorded(), [])
+        with override_settings(SLOW_QUERY_LOG={'THRESHOLD_MS': 0, 'EXPLAIN': False}):
+            list(Product.objects.filter(code='A-1'))
+        self.assertEqual(len(self.recorded()), 1)
+
+    def test_the_plan_is_captured_once_per_fingerprint(self):
+        with override_settings(SLOW_QUERY_LOG={'THRESHOLD_MS': 0}), \
+                mock.patch.object(slowqueries, 'explain', return_value='SCAN store_product') as explain:
+            for code in ('A-1', 'B-2', 'C-3'):
+                list(Product.objects.filter(code=code))
+        product_plans = [call for call in explain.call_args_list if 'store_product' in call.args[1]]
+        self.assertEqual(len(product_plans), 1)
+        self.assertEqual(len(self.recorded()), 3)
+        fingerprints, _ = slowqueries.slow_query_log.summary()
+        stats = next(stats for stats in fingerprints if 'store_product' in stats['sql'])
+        self.assertEqual((stats['count'], stats['plan']), (3, 'SCAN store_product'))
@@ -0,0 +1,69 @@
+"""
+Triggers de SQLite que llenan CatalogChange (registro de cambios para la
+sincronización incremental).
+
+La migración 0013 los creó por primera vez, pero en SQLite cualquier
+migración que rehaga una de las tablas (AlterField, RemoveField...) la copia
+a una tabla nueva y los triggers se pierden sin aviso. Por eso se vuelven a
+crear, si faltan, después de cada `migrate` (señal post_migrate).
+"""
+from django.db import connections
+
+# Tabla -> (tipo de cambio, columnas cuyo cambio interesa a los clientes)
+TRACKED_TABLES = {
+    'store_product': ('product', [
+        'name', 'code', 'description', 'category_id', 'currency_id', 'sale_price',
+        'stock', 'is_active', 'is_featured', 'image',
+    ]),
+    'store_category': ('category', ['name', 'description']),
+    'store_currency': ('currency', ['code', 'name', 'symbol', 'exchange_rate', 'is_active', 'is_default']),
+}
+
+LOG_ROW = "INSERT INTO store_catalogchange (kind, object_id, changed_at) VALUES ('{kind}', {row}.id, strftime('%Y-%m-%d %H:%M:%f', 'now'))"
+
+
+def trigger_statements():
+    """{nombre del trigger: CREATE TRIGGER IF NOT EXISTS ...}"""
+    statements = {}
+    for table, (kind, columns) in TRACKED_TABLES.items():
+        changed = ' OR '.join(f"OLD.{column} IS NOT NEW.{column}" for column in columns)
+        statements[f"{table}_change_insert"] = (
+            f"CREATE TRIGGER IF NOT EXISTS {table}_change_insert AFTER INSERT ON {table} "
+            f"BEGIN {LOG_ROW.format(kind=kind, row='NEW')}; END"
+        )
+        statements[f"{table}_change_update"] = (
+            f"CREATE TRIGGER IF NOT EXISTS {table}_change_update AFTER UPDATE ON {table} WHEN {changed} "
+            f"BEGIN {LOG_ROW.format(kind=kind, row='NEW')}; END"
+        )
+        statements[f"{table}_change_delete"] = (
+            f"CREATE TRIGGER IF NOT EXISTS {table}_change_delete AFTER DELETE ON {table} "
+            f"BEGIN {LOG_ROW.format(kind=kind, row='OLD')}; END"
+        )
+    return statements
+
+
+def missing_triggers(connection):
+    """Triggers que faltan en la base (vacío fuera de SQLite o sin las tablas)"""
+    if connection.vendor != 'sqlite':
+        return []
+    tables = connection.introspection.table_names()
+    if 'store_catalogchange' not in tables or not set(TRACKED_TABLES) <= set(tables):
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {name for (name,) in cursor.fetchall()}
+    return [name for name in trigger_statements() if name not in existing]
+
+
+def ensure_triggers(sender, using, verbosity=1, stdout=None, **kwargs):
+    """Receptor de post_migrate: recrea los triggers que una migración haya borrado"""
+    connection = connections[using]
+    missing = missing_triggers(connection)
+    if not missing:
+        return
+    statements = trigger_statements()
+    with connection.cursor() as cursor:
+        for name in missing:
+            cursor.execute(statements[name])
+    if verbosity >= 1 and stdout is not None:
+        stdout.write(f"  Triggers de CatalogChange recreados: {', '.join(missing)}\n")
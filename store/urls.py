@@ -1,9 +1,10 @@
 from django.urls import path
-from . import views
+from . import api, pwa, views
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('products/', views.product_list, name='product_list'),
+    path('products/autocomplete/', views.product_autocomplete, name='product_autocomplete'),
     path('product/<int:product_id>/', views.product_detail, name='product_detail'),
     path('product/<int:product_id>/add-to-cart/', views.add_to_cart, name='add_to_cart'),
     path('cart/', views.cart, name='cart'),
@@ -13,4 +14,15 @@ urlpatterns = [
     path('checkout/', views.checkout, name='checkout'),
     path('orders/', views.order_list, name='order_list'),
     path('order/<int:order_id>/', views.order_detail, name='order_detail'),
+    # API JSON del catálogo (solo lectura)
+    path('api/products/', api.product_list, name='api_product_list'),
+    path('api/products/<int:product_id>/', api.product_detail, name='api_product_detail'),
+    path('api/categories/', api.category_list, name='api_category_list'),
+    path('api/currencies/', api.currency_list, name='api_currency_list'),
+    path('api/sync/', api.catalog_changes, name='api_catalog_changes'),
+    # Aplicación web progresiva
+    path('sw.js', pwa.service_worker, name='service_worker'),
+    path('manifest.webmanifest', pwa.manifest, name='pwa_manifest'),
+    path('offline/', pwa.offline, name='pwa_offline'),
+    path('offline/csrf-token/', pwa.csrf_token, name='pwa_csrf_token'),
 ] 
\ No newline at end of file
@@ -1,29 +1,53 @@
-from django.shortcuts import render, get_object_or_404, redirect
+import hashlib
+
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F, Q
 from django.core.paginator import Paginator
+from django.core.cache import cache
 from django.http import JsonResponse
-from .models import Product, Category, Cart, CartItem, Order, OrderItem
+from django.urls import reverse
+from .models import (
+    Product, Category, Cart, CartItem, Order, OrderItem, Currency, OrderCurrencyTotal, LowStockAlert,
+)
+from .lite import lite_template
+from .reports import record_order_sales
 from urllib.parse import quote
 from django.conf import settings
 
-def home(request):
+AUTOCOMPLETE_MIN_LENGTH = 2
+AUTOCOMPLETE_LIMIT = 8
+AUTOCOMPLETE_CACHE_SECONDS = 60
+
+async def _load_user(request):
+    """
+    Carga el usuario (y la sesión) sin bloquear el bucle de eventos, para que
+    las plantillas no hagan consultas síncronas al usar `user`.
+    """
+    request.user = await request.auser()
+    return request.user
+
+async def home(request):
     """Vista principal de la tienda"""
-    featured_products = Product.objects.filter(is_featured=True, is_active=True)[:6]
-    latest_products = Product.objects.filter(is_active=True).order_by('-created_at')[:8]
-    categories = Category.objects.all()[:6]
+    await _load_user(request)
+    products = Product.objects.filter(is_active=True).select_related('category')
+    featured_products = [product async for product in products.filter(is_featured=True)[:6]]
+    latest_products = [product async for product in products.order_by('-created_at')[:8]]
+    categories = (await Category.aget_cached_list())[:6]
     
     context = {
         'featured_products': featured_products,
         'latest_products': latest_products,
         'categories': categories,
     }
-    return render(request, 'store/home.html', context)
+    return render(request, lite_template(request, 'store/home.html'), context)
 
-def product_list(request):
+async def product_list(request):
     """Lista de productos con filtros"""
-    products = Product.objects.filter(is_active=True)
+    await _load_user(request)
+    products = Product.objects.filter(is_active=True).select_related('category')
     category_id = request.GET.get('category')
     search_query = request.GET.get('search')
     sort_by = request.GET.get('sort', 'name')
@@ -50,12 +74,13 @@ def product_list(request):
     else:
         products = products.order_by('name')
     
-    # Paginación
+    # Paginación: el total y la página se consultan con el ORM async
     paginator = Paginator(products, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator.count = await products.acount()
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = [product async for product in page_obj.object_list]
     
-    categories = Category.objects.all()
+    categories = await Category.aget_cached_list()
     
     context = {
         'products': page_obj,
@@ -64,21 +89,54 @@ def product_list(request):
         'search_query': search_query,
         'sort_by': sort_by,
     }
-    return render(request, 'store/product_list.html', context)
+    return render(request, lite_template(request, 'store/product_list.html'), context)
 
-def product_detail(request, product_id):
+async def product_detail(request, product_id):
     """Detalle de un producto"""
-    product = get_object_or_404(Product, id=product_id, is_active=True)
-    related_products = Product.objects.filter(
-        category=product.category, 
-        is_active=True
-    ).exclude(id=product.id)[:4]
+    await _load_user(request)
+    product = await aget_object_or_404(
+        Product.objects.select_related('category'), id=product_id, is_active=True
+    )
+    related_products = [
+        related async for related in Product.objects.filter(
+            category=product.category_id,
+            is_active=True
+        ).select_related('category').exclude(id=product.id)[:4]
+    ]
     
     context = {
         'product': product,
         'related_products': related_products,
     }
-    return render(request, 'store/product_detail.html', context)
+    return render(request, lite_template(request, 'store/product_detail.html'), context)
+
+async def product_autocomplete(request):
+    """Sugerencias de búsqueda de productos (AJAX)"""
+    query = request.GET.get('q', '').strip()
+    if len(query) < AUTOCOMPLETE_MIN_LENGTH:
+        return JsonResponse({'results': []})
+    
+    cache_key = 'autocomplete:' + hashlib.md5(query.lower().encode()).hexdigest()
+    results = await cache.aget(cache_key)
+    if results is None:
+        rows = (
+            Product.objects
+            .filter(Q(name__icontains=query) | Q(code__istartswith=query), is_active=True)
+            .order_by('name')
+            .values('id', 'name', 'code', 'sale_price', 'currency__symbol')[:AUTOCOMPLETE_LIMIT]
+        )
+        results = [
+            {
+                'id': row['id'],
+                'name': row['name'],
+                'code': row['code'],
+                'price': f"{row['currency__symbol']}{row['sale_price']}",
+                'url': reverse('product_detail', args=[row['id']]),
+            }
+            async for row in rows
+        ]
+        await cache.aset(cache_key, results, AUTOCOMPLETE_CACHE_SECONDS)
+    return JsonResponse({'results': results})
 
 @login_required
 def add_to_cart(request, product_id):
@@ -113,28 +171,32 @@ def add_to_cart(request, product_id):
 @login_required
 def cart(request):
     """Vista del carrito"""
+    settlement_currency = Currency.get_default()
     try:
         cart = Cart.objects.get(user=request.user)
-        items = cart.cartitem_set.all()
+        items = cart.cartitem_set.select_related('product__currency')
+        totals = cart.totals_by_currency()
+        total = cart.total_in(settlement_currency, totals)
     except Cart.DoesNotExist:
         cart = None
         items = []
+        totals = []
+        total = 0
     
     context = {
         'cart': cart,
         'items': items,
+        'totals': totals,
+        'total': total,
+        'settlement_currency': settlement_currency,
     }
     return render(request, 'store/cart.html', context)
 
 @login_required
-def cart_count(request):
+async def cart_count(request):
     """Vista para obtener el contador del carrito (AJAX)"""
-    try:
-        cart = Cart.objects.get(user=request.user)
-        count = cart.cartitem_set.count()
-    except Cart.DoesNotExist:
-        count = 0
-    
+    user = await request.auser()
+    count = await CartItem.objects.filter(cart__user=user).acount()
     return JsonResponse({'count': count})
 
 @login_required
@@ -192,36 +254,51 @@ def checkout(request):
             return redirect('cart')
         
         try:
-            # Crear la orden
-            order = Order.objects.create(
-                user=request.user,
-                total_amount=cart.total,
-                delivery_type=delivery_type,
-                shipping_address=shipping_address,
-                phone=phone,
-                notes=notes
-            )
-            
-            # Crear los items de la orden
-            for item in cart.cartitem_set.all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    quantity=item.quantity,
-                    price=item.product.sale_price
+            # La orden, sus items, el stock y los resúmenes se guardan juntos o no se guarda nada
+            with transaction.atomic():
+                # Totales por moneda en una sola consulta agrupada
+                settlement_currency = Currency.get_default()
+                totals = cart.totals_by_currency()
+                
+                # Crear la orden
+                order = Order.objects.create(
+                    user=request.user,
+                    total_amount=cart.total_in(settlement_currency, totals),
+                    settlement_currency=settlement_currency,
+                    delivery_type=delivery_type,
+                    shipping_address=shipping_address,
+                    phone=phone,
+                    notes=notes
                 )
+                OrderCurrencyTotal.create_for_order(order, totals, settlement_currency)
                 
-                # Actualizar stock
-                item.product.stock -= item.quantity
-                item.product.save()
-            
-            # Generar mensaje de WhatsApp
-            whatsapp_message = order.generate_whatsapp_message()
-            order.whatsapp_message = whatsapp_message
-            order.save()
-            
-            # Limpiar el carrito
-            cart.delete()
+                # Crear los items de la orden
+                for item in cart.cartitem_set.select_related('product'):
+                    product = item.product
+                    OrderItem.objects.create(
+                        order=order,
+                        product=product,
+                        quantity=item.quantity,
+                        price=product.sale_price,
+                        unit_cost=product.purchase_price
+                    )
+                    
+                    # Actualizar stock en la base de datos, sin pisar otras compras simultáneas
+                    Product.objects.filter(pk=product.pk).update(stock=F('stock') - item.quantity)
+                    product.refresh_from_db(fields=['stock'])
+                    if product.is_low_stock:
+                        LowStockAlert.open_for(product)
+                
+                # Actualizar los resúmenes de ventas
+                record_order_sales(order)
+                
+                # Generar mensaje de WhatsApp
+                whatsapp_message = order.generate_whatsapp_message()
+                order.whatsapp_message = whatsapp_message
+                order.save()
+                
+                # Limpiar el carrito
+                cart.delete()
             
             # Crear URL de WhatsApp usando la configuración
             whatsapp_number = getattr(settings, 'WHATSAPP_NUMBER', '5351234567')
@@ -237,14 +314,24 @@ def checkout(request):
             messages.error(request, f'Error al procesar la orden: {str(e)}')
             return redirect('cart')
     
+    settlement_currency = Currency.get_default()
+    totals = cart.totals_by_currency()
     return render(request, 'store/checkout.html', {
-        'cart': cart
+        'cart': cart,
+        'totals': totals,
+        'total': cart.total_in(settlement_currency, totals),
+        'settlement_currency': settlement_currency,
     })
 
 @login_required
 def order_list(request):
     """Lista de órdenes del usuario"""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    orders = (
+        Order.objects
+        .filter(user=request.user)
+        .select_related('settlement_currency')
+        .order_by('-created_at')
+    )
     
     context = {
         'orders': orders,
@@ -254,9 +341,13 @@ def order_list(request):
 @login_required
 def order_detail(request, order_id):
     """Detalle de una orden"""
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = get_object_or_404(
+        Order.objects.select_related('settlement_currency'), id=order_id, user=request.user
+    )
     
     context = {
         'order': order,
+        'items': order.orderitem_set.select_related('product__currency'),
+        'totals': order.totals_by_currency(),
     }
     return render(request, 'store/order_detail.html', context)
@@ -0,0 +1,304 @@
+// Service worker de Cuba E-Commerce (generado por store.pwa.service_worker)
+const VERSION = '{{ version }}';
+const SHELL_CACHE = `shell-${VERSION}`;
+const PAGES_CACHE = `pages-${VERSION}`;
+const IMAGES_CACHE = 'images';
+const STATIC_CACHE = `static-${VERSION}`;
+const PRECACHE_URLS = {{ precache_urls|safe }};
+const OFFLINE_URL = '{{ offline_url }}';
+const LOGIN_URL = '{{ login_url }}';
+const CSRF_URL = '{{ csrf_url }}';
+const MAX_PAGES = {{ max_pages }};
+const MAX_IMAGES = {{ max_images }};
+
+// Páginas del catálogo: se sirven de la caché y se actualizan en segundo plano
+const CATALOG_PAGES = [/^\/$/, /^\/products\/$/, /^\/product\/\d+\/$/];
+// Páginas personales: primero la red, la copia guardada solo sin conexión
+const PERSONAL_PAGES = [/^\/cart\/$/, /^\/orders\/$/, /^\/order\/\d+\/$/];
+// Acciones del carrito que se pueden encolar sin conexión
+const QUEUEABLE_ACTIONS = [
+    /^\/product\/\d+\/add-to-cart\/$/,
+    /^\/cart\/update\/\d+\/$/,
+    /^\/cart\/remove\/\d+\/$/,
+];
+
+const matches = (patterns, path) => patterns.some((pattern) => pattern.test(path));
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then((cache) => cache.addAll(PRECACHE_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    const current = [SHELL_CACHE, PAGES_CACHE, IMAGES_CACHE, STATIC_CACHE];
+    event.waitUntil(
+        caches.keys()
+            .then((keys) => Promise.all(
+                keys.filter((key) => !current.includes(key)).map((key) => caches.delete(key))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+    if (request.method === 'POST' && matches(QUEUEABLE_ACTIONS, url.pathname)) {
+        event.respondWith(postOrQueue(request));
+        return;
+    }
+    if (request.method !== 'GET') {
+        // Login, logout, checkout...: las páginas guardadas pueden mostrar otro usuario o stock viejo
+        event.waitUntil(caches.delete(PAGES_CACHE));
+        return;
+    }
+    if (url.pathname.startsWith('{{ static_url }}')) {
+        event.respondWith(cacheFirst(request, STATIC_CACHE));
+    } else if (url.pathname.startsWith('{{ media_url }}')) {
+        event.respondWith(staleWhileRevalidate(event, IMAGES_CACHE, MAX_IMAGES));
+    } else if (request.mode === 'navigate' && matches(CATALOG_PAGES, url.pathname)) {
+        event.respondWith(staleWhileRevalidate(event, PAGES_CACHE, MAX_PAGES));
+    } else if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(request, matches(PERSONAL_PAGES, url.pathname)));
+    }
+});
+
+async function cacheFirst(request, cacheName) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        const cache = await caches.open(cacheName);
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function staleWhileRevalidate(event, cacheName, maxEntries) {
+    const request = event.request;
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+    const update = fetch(request)
+        .then(async (response) => {
+            // Las redirecciones (p. ej. al login) no se guardan
+            if (response.ok && !response.redirected) {
+                await cache.put(request, response.clone());
+                await trim(cache, maxEntries);
+            }
+            return response;
+        });
+    if (cached) {
+        event.waitUntil(update.catch(() => null));
+        return cached;
+    }
+    return update.catch(() => offlineResponse(request));
+}
+
+async function networkFirst(request, keepCopy) {
+    try {
+        const response = await fetch(request);
+        if (keepCopy && response.ok && !response.redirected) {
+            const cache = await caches.open(PAGES_CACHE);
+            await cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        return (keepCopy && await caches.match(request)) || offlineResponse(request);
+    }
+}
+
+async function offlineResponse(request) {
+    if (request.mode === 'navigate') {
+        return (await caches.match(OFFLINE_URL)) || Response.error();
+    }
+    return Response.error();
+}
+
+async function trim(cache, maxEntries) {
+    // Las claves se devuelven en orden de inserción: se borran las más antiguas
+    const keys = await cache.keys();
+    await Promise.all(keys.slice(0, Math.max(keys.length - maxEntries, 0)).map((key) => cache.delete(key)));
+}
+
+// --- Cola de acciones del carrito sin conexión (IndexedDB) ---
+
+function openQueue() {
+    return new Promise((resolve, reject) => {
+        const open = indexedDB.open('offline-queue', 1);
+        open.onupgradeneeded = () => open.result.createObjectStore('requests', {autoIncrement: true});
+        open.onsuccess = () => resolve(open.result);
+        open.onerror = () => reject(open.error);
+    });
+}
+
+async function withStore(mode, callback) {
+    const db = await openQueue();
+    return new Promise((resolve, reject) => {
+        const transaction = db.transaction('requests', mode);
+        const result = callback(transaction.objectStore('requests'));
+        transaction.oncomplete = () => resolve(result && 'result' in result ? result.result : undefined);
+        transaction.onerror = () => reject(transaction.error);
+    });
+}
+
+async function postOrQueue(request) {
+    const copy = request.clone();
+    try {
+        return await fetch(request);
+    } catch (error) {
+        // El cuerpo se lee antes de abrir la transacción (IndexedDB no admite esperas dentro)
+        const entry = {
+            url: copy.url,
+            body: await copy.text(),
+            contentType: copy.headers.get('Content-Type'),
+            queuedAt: Date.now(),
+        };
+        await withStore('readwrite', (store) => store.add(entry));
+        await notify({type: 'queued', pending: await pendingCount()});
+        if (self.registration.sync) {
+            await self.registration.sync.register('replay-cart').catch(() => null);
+        }
+        // Volver a la página desde la que se envió el formulario (servida desde la caché)
+        const back = copy.referrer.startsWith(self.location.origin) ? copy.referrer : '/';
+        return Response.redirect(back, 303);
+    }
+}
+
+async function pendingCount() {
+    return withStore('readonly', (store) => store.count());
+}
+
+// Reenvío en curso: los eventos sync y message no deben reenviar la cola dos veces a la vez
+let replaying = null;
+
+function replayQueue() {
+    if (!replaying) {
+        replaying = replayEntries().finally(() => {
+            replaying = null;
+        });
+    }
+    return replaying;
+}
+
+async function queuedKeys() {
+    return withStore('readonly', (store) => store.getAllKeys());
+}
+
+function claimEntry(key) {
+    // Se saca de la cola antes de enviarla: si otro service worker la reenvía a la vez, no la encuentra
+    return withStore('readwrite', (store) => {
+        const request = store.get(key);
+        request.onsuccess = () => {
+            if (request.result !== undefined) {
+                store.delete(key);
+            }
+        };
+        return request;
+    });
+}
+
+function requeueEntry(key, value) {
+    return withStore('readwrite', (store) => store.put(value, key));
+}
+
+async function currentCsrfToken() {
+    // El service worker no puede leer la cookie csrftoken: se la pide al servidor
+    const response = await fetch(CSRF_URL, {credentials: 'same-origin', cache: 'no-store'});
+    return (await response.json()).token;
+}
+
+function withCsrfToken(value, token) {
+    // El token guardado en el cuerpo es el de cuando se encoló: tras volver a
+    // iniciar sesión ya no es válido y Django respondería 403
+    if (!(value.contentType || '').startsWith('application/x-www-form-urlencoded')) {
+        return value.body;
+    }
+    const body = new URLSearchParams(value.body);
+    body.set('csrfmiddlewaretoken', token);
+    return body.toString();
+}
+
+async function replayEntries() {
+    let sent = 0;
+    let failed = 0;
+    let loginRequired = false;
+    const keys = await queuedKeys();
+    if (!keys.length) {
+        return;
+    }
+    let token;
+    try {
+        token = await currentCsrfToken();
+    } catch (error) {
+        // Todavía sin conexión: se reintenta más tarde
+        return;
+    }
+    for (const key of keys) {
+        const value = await claimEntry(key);
+        if (value === undefined) {
+            continue;
+        }
+        let response;
+        try {
+            response = await fetch(value.url, {
+                method: 'POST',
+                body: withCsrfToken(value, token),
+                headers: {'Content-Type': value.contentType, 'X-CSRFToken': token},
+                credentials: 'same-origin',
+            });
+        } catch (error) {
+            // Todavía sin conexión: se reintenta más tarde
+            await requeueEntry(key, value);
+            break;
+        }
+        if (response.redirected && new URL(response.url).pathname === LOGIN_URL) {
+            // La sesión caducó: la acción se conserva hasta que el usuario vuelva a entrar
+            await requeueEntry(key, value);
+            loginRequired = true;
+            break;
+        }
+        // Las vistas del carrito responden con una redirección (ya seguida) a la página del carrito
+        if (response.ok) {
+            sent += 1;
+        } else {
+            failed += 1;
+        }
+    }
+    if (sent || failed) {
+        await caches.delete(PAGES_CACHE);
+    }
+    if (sent || failed || loginRequired) {
+        await notify({type: 'replayed', sent, failed, loginRequired, pending: await pendingCount()});
+    }
+}
+
+async function notify(message) {
+    const clients = await self.clients.matchAll({includeUncontrolled: true});
+    clients.forEach((client) => client.postMessage(message));
+}
+
+self.addEventListener('sync', (event) => {
+    if (event.tag === 'replay-cart') {
+        event.waitUntil(replayQueue());
+    }
+});
+
+self.addEventListener('message', (event) => {
+    if (event.data === 'replay') {
+        event.waitUntil(replayQueue());
+    } else if (event.data === 'logout') {
+        // Las páginas guardadas y la cola pertenecen al usuario que sale
+        event.waitUntil(Promise.all([
+            caches.delete(PAGES_CACHE),
+            withStore('readwrite', (store) => store.clear()),
+        ]));
+    }
+});